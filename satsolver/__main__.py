@@ -0,0 +1,3 @@
+from satsolver.cli import main
+
+main()
@@ -0,0 +1,474 @@
+/*
+ * Compiled propagation and conflict analysis for CompactInstance.
+ *
+ * Optional: setup.py builds it where a C compiler is available, and
+ * satsolver.compact falls back to its pure-Python code otherwise. Both
+ * functions follow the Python code step for step (CompactInstance.propagate
+ * and ImplicationGraph.first_uip), so a search makes the same decisions,
+ * learns the same clauses and finds the same models with or without it.
+ *
+ * They work on the instance's own buffers: `values` (array of signed char
+ * per literal code), `lits`, `offsets`, `levels` and `trail` (arrays of
+ * int), and its `watches`, `binaries` and `reasons` lists.
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <stdlib.h>
+#include <string.h>
+
+typedef struct {
+    PyObject *values, *lits, *offsets, *levels, *trail;
+    PyObject *watches, *binaries, *reasons, *trail_lim;
+    Py_buffer values_buf, lits_buf, offsets_buf, levels_buf;
+    int acquired;
+} Instance;
+
+static int get_buffer(PyObject *obj, Py_buffer *view, const char *format,
+                      int writable, const char *name)
+{
+    if (PyObject_GetBuffer(obj, view, PyBUF_FORMAT |
+                           (writable ? PyBUF_WRITABLE : 0)) < 0)
+        return -1;
+    if (view->format == NULL || strcmp(view->format, format) != 0) {
+        PyErr_Format(PyExc_TypeError, "%s must be an array('%s')", name,
+                     format);
+        PyBuffer_Release(view);
+        return -1;
+    }
+    return 0;
+}
+
+static void release(Instance *inst)
+{
+    Py_buffer *bufs[] = {&inst->values_buf, &inst->lits_buf,
+                         &inst->offsets_buf, &inst->levels_buf};
+    int i;
+    for (i = 0; i < inst->acquired; i++)
+        PyBuffer_Release(bufs[i]);
+    inst->acquired = 0;
+    Py_CLEAR(inst->values);
+    Py_CLEAR(inst->lits);
+    Py_CLEAR(inst->offsets);
+    Py_CLEAR(inst->levels);
+    Py_CLEAR(inst->trail);
+    Py_CLEAR(inst->watches);
+    Py_CLEAR(inst->binaries);
+    Py_CLEAR(inst->reasons);
+    Py_CLEAR(inst->trail_lim);
+}
+
+static int acquire(PyObject *obj, Instance *inst)
+{
+    memset(inst, 0, sizeof(*inst));
+    if (!(inst->values = PyObject_GetAttrString(obj, "values")) ||
+        !(inst->lits = PyObject_GetAttrString(obj, "lits")) ||
+        !(inst->offsets = PyObject_GetAttrString(obj, "offsets")) ||
+        !(inst->levels = PyObject_GetAttrString(obj, "levels")) ||
+        !(inst->trail = PyObject_GetAttrString(obj, "trail")) ||
+        !(inst->watches = PyObject_GetAttrString(obj, "watches")) ||
+        !(inst->binaries = PyObject_GetAttrString(obj, "binaries")) ||
+        !(inst->reasons = PyObject_GetAttrString(obj, "reasons")) ||
+        !(inst->trail_lim = PyObject_GetAttrString(obj, "trail_lim")))
+        goto fail;
+    if (!PyList_Check(inst->watches) || !PyList_Check(inst->binaries) ||
+        !PyList_Check(inst->reasons)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "watches, binaries and reasons must be lists");
+        goto fail;
+    }
+    if (get_buffer(inst->values, &inst->values_buf, "b", 1, "values") < 0)
+        goto fail;
+    inst->acquired++;
+    if (get_buffer(inst->lits, &inst->lits_buf, "i", 1, "lits") < 0)
+        goto fail;
+    inst->acquired++;
+    if (get_buffer(inst->offsets, &inst->offsets_buf, "i", 0, "offsets") < 0)
+        goto fail;
+    inst->acquired++;
+    if (get_buffer(inst->levels, &inst->levels_buf, "i", 1, "levels") < 0)
+        goto fail;
+    inst->acquired++;
+    return 0;
+fail:
+    release(inst);
+    return -1;
+}
+
+static long decode(long code)
+{
+    return code & 1 ? -(code >> 1) : code >> 1;
+}
+
+static long false_code_of(long lit)
+{
+    return lit > 0 ? (lit << 1) | 1 : -lit << 1;
+}
+
+/* Read the pending part of the trail into queue, and return its length. */
+static Py_ssize_t read_trail(PyObject *trail, Py_ssize_t start,
+                             int *queue)
+{
+    Py_buffer view;
+    Py_ssize_t count;
+    if (get_buffer(trail, &view, "i", 0, "trail") < 0)
+        return -1;
+    count = view.len / sizeof(int) - start;
+    if (count > 0)
+        memcpy(queue, (int *)view.buf + start, count * sizeof(int));
+    PyBuffer_Release(&view);
+    return count < 0 ? 0 : count;
+}
+
+static int set_reason(PyObject *reasons, long var, long reason)
+{
+    PyObject *value = PyLong_FromLong(reason);
+    if (value == NULL)
+        return -1;
+    /* Steals the reference. */
+    return PyList_SetItem(reasons, var, value);
+}
+
+/* Append the literals implied by propagate to the trail, and mark the
+ * whole trail as propagated. */
+static int finish(PyObject *obj, PyObject *trail, int *implied,
+                  Py_ssize_t count)
+{
+    PyObject *r, *qhead;
+    Py_ssize_t trail_len;
+    int status;
+
+    if (count > 0) {
+        PyObject *data = PyBytes_FromStringAndSize((char *)implied,
+                                                   count * sizeof(int));
+        if (data == NULL)
+            return -1;
+        r = PyObject_CallMethod(trail, "frombytes", "O", data);
+        Py_DECREF(data);
+        if (r == NULL)
+            return -1;
+        Py_DECREF(r);
+    }
+    trail_len = PyObject_Length(trail);
+    if (trail_len < 0)
+        return -1;
+    qhead = PyLong_FromSsize_t(trail_len);
+    if (qhead == NULL)
+        return -1;
+    status = PyObject_SetAttrString(obj, "qhead", qhead);
+    Py_DECREF(qhead);
+    return status;
+}
+
+static PyObject *propagate(PyObject *module, PyObject *obj)
+{
+    Instance inst;
+    PyObject *qhead_obj, *trail, *result = NULL;
+    Py_ssize_t qhead, trail_len, queue_len = 0, q, first_new = 0;
+    signed char *values;
+    int *lits, *offsets, *levels, *queue = NULL;
+    long level, var_count, conflict = -1;
+
+    qhead_obj = PyObject_GetAttrString(obj, "qhead");
+    if (qhead_obj == NULL)
+        return NULL;
+    qhead = PyLong_AsSsize_t(qhead_obj);
+    Py_DECREF(qhead_obj);
+    if (qhead == -1 && PyErr_Occurred())
+        return NULL;
+
+    if (acquire(obj, &inst) < 0)
+        return NULL;
+    values = inst.values_buf.buf;
+    lits = inst.lits_buf.buf;
+    offsets = inst.offsets_buf.buf;
+    levels = inst.levels_buf.buf;
+    level = (long)PyObject_Length(inst.trail_lim);
+    var_count = inst.values_buf.len / 2 - 1;
+    trail_len = PyObject_Length(inst.trail);
+    if (level < 0 || trail_len < 0)
+        goto done;
+
+    /* The pending literals, then every literal implied here: each variable
+     * is assigned at most once. */
+    queue = malloc((trail_len - qhead + var_count + 1) * sizeof(int));
+    if (queue == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    queue_len = read_trail(inst.trail, qhead, queue);
+    if (queue_len < 0)
+        goto done;
+    first_new = queue_len;
+
+#define ASSIGN(code, reason)                                            \
+    do {                                                                \
+        long code_ = (code);                                            \
+        values[code_] = 1;                                              \
+        values[code_ ^ 1] = 0;                                          \
+        levels[code_ >> 1] = level;                                     \
+        if (set_reason(inst.reasons, code_ >> 1, (reason)) < 0)         \
+            goto done;                                                  \
+        queue[queue_len++] = decode(code_);                             \
+    } while (0)
+
+    for (q = 0; q < queue_len && conflict < 0; q++) {
+        long false_code = false_code_of(queue[q]);
+        PyObject *pairs = PyList_GET_ITEM(inst.binaries, false_code);
+        PyObject *watchers;
+        Py_ssize_t i, j, n, k;
+
+        n = PyList_GET_SIZE(pairs);
+        for (i = 0; i < n; i++) {
+            PyObject *pair = PyList_GET_ITEM(pairs, i);
+            long other = PyLong_AsLong(PyTuple_GET_ITEM(pair, 0));
+            if (values[other] < 0) {
+                /* The reason is the false literal, inline. */
+                ASSIGN(other, ~false_code);
+            } else if (values[other] == 0) {
+                conflict = PyLong_AsLong(PyTuple_GET_ITEM(pair, 1));
+                break;
+            }
+        }
+        if (conflict >= 0)
+            break;
+
+        watchers = PyList_GET_ITEM(inst.watches, false_code);
+        n = PyList_GET_SIZE(watchers);
+        for (i = j = 0; i < n; i++) {
+            PyObject *item = PyList_GET_ITEM(watchers, i);
+            long clause_index = PyLong_AsLong(item);
+            long start = offsets[clause_index];
+            long end = offsets[clause_index + 1];
+            long first = lits[start];
+            int moved = 0;
+
+            /* Keep the falsified watch in the clause's second slot. */
+            if (first == false_code) {
+                first = lits[start + 1];
+                lits[start] = first;
+                lits[start + 1] = false_code;
+            }
+            if (values[first] != 1) {
+                for (k = start + 2; k < end; k++) {
+                    long code = lits[k];
+                    if (values[code] != 0) {
+                        lits[start + 1] = code;
+                        lits[k] = false_code;
+                        if (PyList_Append(PyList_GET_ITEM(inst.watches, code),
+                                          item) < 0)
+                            goto done;
+                        moved = 1;
+                        break;
+                    }
+                }
+            }
+            if (moved)
+                continue;
+            if (j != i) {
+                PyObject *old = PyList_GET_ITEM(watchers, j);
+                Py_INCREF(item);
+                PyList_SET_ITEM(watchers, j, item);
+                Py_DECREF(old);
+            }
+            j++;
+            if (values[first] == 1)
+                continue;
+            if (values[first] == 0) {
+                conflict = clause_index;
+                /* Keep the remaining watchers. */
+                for (i++; i < n; i++, j++) {
+                    PyObject *rest = PyList_GET_ITEM(watchers, i);
+                    PyObject *old = PyList_GET_ITEM(watchers, j);
+                    Py_INCREF(rest);
+                    PyList_SET_ITEM(watchers, j, rest);
+                    Py_DECREF(old);
+                }
+                break;
+            }
+            ASSIGN(first, clause_index);
+        }
+        if (PyList_SetSlice(watchers, j, n, NULL) < 0)
+            goto done;
+    }
+#undef ASSIGN
+
+    if (PyErr_Occurred())
+        goto done;
+    result = conflict >= 0 ? PyLong_FromLong(conflict) : Py_None;
+    if (conflict < 0)
+        Py_INCREF(Py_None);
+
+done:
+    trail = inst.trail;
+    Py_XINCREF(trail);
+    release(&inst);
+    if (result != NULL && finish(obj, trail, queue + first_new,
+                                 queue_len - first_new) < 0)
+        Py_CLEAR(result);
+    Py_XDECREF(trail);
+    free(queue);
+    return result;
+}
+
+PyDoc_STRVAR(propagate_doc,
+"propagate(instance)\n\n"
+"CompactInstance.propagate: index of a conflicting clause, or None.");
+
+static PyObject *first_uip(PyObject *module, PyObject *args)
+{
+    PyObject *obj, *on_clause, *on_var, *learnt = NULL, *seen = NULL;
+    PyObject *result = NULL;
+    Instance inst;
+    Py_buffer trail_buf;
+    int *lits, *offsets, *levels, *trail, *added = NULL;
+    unsigned char *marks = NULL;
+    long conflict, clause_index, current_level, var_count, uip = 0;
+    Py_ssize_t index, added_len = 0, pending = 0, i;
+
+    if (!PyArg_ParseTuple(args, "OlOO", &obj, &conflict, &on_clause,
+                          &on_var))
+        return NULL;
+    if (acquire(obj, &inst) < 0)
+        return NULL;
+    if (get_buffer(inst.trail, &trail_buf, "i", 0, "trail") < 0) {
+        release(&inst);
+        return NULL;
+    }
+    lits = inst.lits_buf.buf;
+    offsets = inst.offsets_buf.buf;
+    levels = inst.levels_buf.buf;
+    trail = trail_buf.buf;
+    var_count = inst.values_buf.len / 2 - 1;
+    current_level = (long)PyObject_Length(inst.trail_lim);
+    index = trail_buf.len / sizeof(int) - 1;
+
+    marks = calloc(var_count + 1, 1);
+    added = malloc((var_count + 1) * sizeof(int));
+    learnt = PyList_New(1);
+    if (marks == NULL || added == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    if (learnt == NULL)
+        goto done;
+    Py_INCREF(Py_None);
+    PyList_SET_ITEM(learnt, 0, Py_None);
+
+    clause_index = conflict;
+    {
+        long binary_code = 0;
+        long start = offsets[conflict], end = offsets[conflict + 1];
+        for (;;) {
+            long k;
+            if (on_clause != Py_None && clause_index >= 0) {
+                PyObject *r = PyObject_CallFunction(on_clause, "l",
+                                                    clause_index);
+                if (r == NULL)
+                    goto done;
+                Py_DECREF(r);
+            }
+            for (k = start; k < end; k++) {
+                long code = clause_index < 0 ? binary_code : lits[k];
+                long var = code >> 1;
+                if (marks[var] || levels[var] <= 0)
+                    continue;
+                marks[var] = 1;
+                added[added_len++] = var;
+                if (on_var != Py_None) {
+                    PyObject *r = PyObject_CallFunction(on_var, "l", var);
+                    if (r == NULL)
+                        goto done;
+                    Py_DECREF(r);
+                }
+                if (levels[var] >= current_level) {
+                    pending++;
+                } else {
+                    PyObject *lit = PyLong_FromLong(decode(code));
+                    if (lit == NULL || PyList_Append(learnt, lit) < 0) {
+                        Py_XDECREF(lit);
+                        goto done;
+                    }
+                    Py_DECREF(lit);
+                }
+            }
+
+            /* Next literal of the current level to resolve on. */
+            while (!marks[labs(trail[index])])
+                index--;
+            uip = trail[index];
+            index--;
+            marks[labs(uip)] = 0;
+            pending--;
+            if (pending == 0)
+                break;
+            {
+                PyObject *reason = PyList_GET_ITEM(inst.reasons, labs(uip));
+                clause_index = PyLong_AsLong(reason);
+                if (clause_index == -1 && PyErr_Occurred())
+                    goto done;
+            }
+            if (clause_index < 0) {
+                /* A binary reason: just the other, false literal. */
+                binary_code = ~clause_index;
+                start = 0;
+                end = 1;
+            } else {
+                /* A reason's implied literal comes first; skip it. */
+                start = offsets[clause_index] + 1;
+                end = offsets[clause_index + 1];
+            }
+        }
+    }
+
+    {
+        PyObject *negated = PyLong_FromLong(-uip);
+        if (negated == NULL)
+            goto done;
+        /* Steals the reference; drops the placeholder None. */
+        PyList_SetItem(learnt, 0, negated);
+    }
+    seen = PySet_New(NULL);
+    if (seen == NULL)
+        goto done;
+    for (i = 0; i < added_len; i++) {
+        if (marks[added[i]]) {
+            PyObject *var = PyLong_FromLong(added[i]);
+            if (var == NULL || PySet_Add(seen, var) < 0) {
+                Py_XDECREF(var);
+                goto done;
+            }
+            Py_DECREF(var);
+        }
+    }
+    result = PyTuple_Pack(2, learnt, seen);
+
+done:
+    PyBuffer_Release(&trail_buf);
+    release(&inst);
+    Py_XDECREF(learnt);
+    Py_XDECREF(seen);
+    free(marks);
+    free(added);
+    return result;
+}
+
+PyDoc_STRVAR(first_uip_doc,
+"first_uip(instance, conflict, on_clause, on_var)\n\n"
+"ImplicationGraph.first_uip for a CompactInstance: (learnt, seen).");
+
+static PyMethodDef methods[] = {
+    {"propagate", propagate, METH_O, propagate_doc},
+    {"first_uip", first_uip, METH_VARARGS, first_uip_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef module = {
+    PyModuleDef_HEAD_INIT, "_kernel",
+    "Compiled propagation and conflict analysis for CompactInstance.",
+    -1, methods, NULL, NULL, NULL, NULL
+};
+
+PyMODINIT_FUNC PyInit__kernel(void)
+{
+    return PyModule_Create(&module);
+}
@@ -0,0 +1,91 @@
+"""Model enumeration (AllSAT).
+
+Every model found is blocked with a clause before searching for the next
+one, until the formula becomes UNSAT. Without projection the blocking clause
+only negates the decisions, since propagation from them alone produced the
+model. With projection it negates the model restricted to the projection
+variables, so every projected model is found exactly once.
+"""
+from satsolver.util import Unknown
+
+
+class ModelEnumerator(object):
+    """Streams the models of a solver's formula.
+
+    The solver is left with the blocking clauses added; models are not
+    stored on the instance.
+    """
+    def __init__(self, solver, projection=None):
+        """
+        Args:
+            solver (Solver): should not have been given assumptions, since
+                models are blocked for good.
+            projection (iterable[int]): variables to enumerate models over;
+                every variable by default.
+        """
+        self.solver = solver
+        self.projection = None
+        if projection is not None:
+            self.projection = sorted(set(abs(var) for var in projection))
+        self.count = 0
+        # True once every model has been found.
+        self.exhausted = False
+        # Result of the last call to Solver.solve.
+        self.result = None
+
+    def models(self, max_models=None, **limits):
+        """Yield models until there are none left or max_models is reached.
+
+        Args:
+            limits: budgets for each call to Solver.solve; enumeration stops
+                early (self.result is then Unknown) when one runs out.
+
+        Yields:
+            list[int]: a model as true literals over the projection
+                variables (or every variable), in variable order.
+        """
+        solver = self.solver
+        instance = solver.instance
+        solver.save_solutions = False
+        try:
+            while max_models is None or self.count < max_models:
+                self.result = solver.solve(**limits)
+                if not self.result.success:
+                    self.exhausted = not isinstance(self.result, Unknown)
+                    return
+                model = self._model()
+                self.count += 1
+                blocked = solver.add_clause(self._blocking_clause(model))
+                yield model
+                if not blocked.success:
+                    self.exhausted = True
+                    return
+        finally:
+            solver.save_solutions = True
+
+    def _model(self):
+        asgs = self.solver.instance.asgs
+        variables = self.projection
+        if variables is None:
+            variables = range(1, self.solver.instance.var_count + 1)
+        return [var if asgs[var] else -var for var in variables]
+
+    def _blocking_clause(self, model):
+        if self.projection is not None:
+            return [-lit for lit in model]
+        instance = self.solver.instance
+        trail = instance.trail
+        return [-trail[start] for start in instance.trail_lim]
+
+
+def count_models(solver, projection=None, **limits):
+    """Number of (projected) models.
+
+    Returns:
+        tuple(int, bool): (count, exhausted); the count is a lower bound
+        unless every model was found.
+    """
+    enumerator = ModelEnumerator(solver, projection)
+    for _ in enumerator.models(**limits):
+        pass
+    return enumerator.count, enumerator.exhausted
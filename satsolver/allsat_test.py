@@ -0,0 +1,64 @@
+import random
+
+from satsolver.state import Instance
+from satsolver.compact import CompactInstance
+from satsolver.solver import Solver
+from satsolver.allsat import ModelEnumerator, count_models
+from satsolver.cube_test import models
+from satsolver.solver_test import pigeonhole
+
+
+def test_enumerates_every_model():
+    inst = Instance(var_count=3, clauses=[[1, 2], [-2, 3]])
+    enumerator = ModelEnumerator(Solver(inst))
+    found = sorted(enumerator.models())
+    assert found == sorted([[1, -2, 3], [1, -2, -3], [1, 2, 3], [-1, 2, 3]])
+    assert enumerator.exhausted
+    # Models are streamed, not stored.
+    assert inst.solutions == []
+
+
+def test_projection():
+    inst = Instance(var_count=3, clauses=[[1, 2], [-2, 3]])
+    enumerator = ModelEnumerator(Solver(inst), projection=[2])
+    assert sorted(enumerator.models()) == [[-2], [2]]
+
+
+def test_max_models():
+    inst = Instance(var_count=4, clauses=[])
+    enumerator = ModelEnumerator(Solver(inst))
+    assert len(list(enumerator.models(max_models=5))) == 5
+    assert not enumerator.exhausted
+
+
+def test_unsat_has_no_models():
+    var_count, clauses = pigeonhole(3)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    assert count_models(Solver(inst)) == (0, True)
+
+
+def test_budget_stops_enumeration():
+    var_count, clauses = pigeonhole(5)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    count, exhausted = count_models(Solver(inst), max_conflicts=1)
+    assert (count, exhausted) == (0, False)
+
+
+def test_counts_match_brute_force():
+    rng = random.Random(3)
+    for _ in range(100):
+        var_count = rng.randint(2, 7)
+        clauses = [[rng.choice([-1, 1]) * rng.randint(1, var_count)
+                    for _ in range(rng.randint(1, 3))]
+                   for _ in range(rng.randint(1, 2 * var_count))]
+        projection = rng.sample(range(1, var_count + 1),
+                                rng.randint(1, var_count))
+        expected = set(tuple(bits[var - 1] for var in sorted(projection))
+                       for bits in models(var_count, clauses))
+        for cls in (Instance, CompactInstance):
+            inst = cls(var_count, [list(c) for c in clauses])
+            assert count_models(Solver(inst)) == (
+                sum(1 for _ in models(var_count, clauses)), True)
+            inst = cls(var_count, [list(c) for c in clauses])
+            assert count_models(Solver(inst), projection) == (
+                len(expected), True)
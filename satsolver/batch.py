@@ -0,0 +1,335 @@
+"""Batch solving of many DIMACS (or binary CNF) files.
+
+    satsolver batch problems/ --output results.jsonl
+    satsolver batch 'nightly/**/*.cnf.gz' --workers 8 --time-limit 10
+    satsolver batch manifest.txt
+
+`solve_many` schedules the files on a process pool, largest first by the
+clause count in their headers, so a big instance does not start last and
+hold up the end of the batch. Worker processes are reused across files, so
+interpreter startup and imports are paid once per worker rather than once
+per file.
+
+Each result is one JSON line: the file's path, its status (SAT, UNSAT,
+UNKNOWN or ERROR), size, and parse and solve times. Lines are flushed as
+results come in, so a batch that is interrupted can be resumed: files that
+already have a result in the output are skipped. Files that ended in ERROR
+(an exception, or a worker process that died) are tried again; their new
+line comes after the old one.
+"""
+import collections
+import glob
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from satsolver.binfmt import MappedCNF, is_binary
+from satsolver.cache import DEFAULT_MAX_BYTES, ResultCache
+from satsolver.loader import load_instance
+from satsolver.parser import CNFStream, open_cnf
+from satsolver.restarts import make_policy
+from satsolver.solver import Solver
+from satsolver.stats import SolverStats
+from satsolver.util import Failure, Unknown
+
+# File names solved when a directory is given.
+CNF_SUFFIXES = ('.cnf', '.cnf.gz', '.cnf.bz2', '.cnf.xz', '.dimacs',
+                '.cnfb')
+
+
+def collect_paths(source):
+    """The DIMACS files a batch source names.
+
+    Args:
+        source (str): a directory (searched recursively for CNF_SUFFIXES),
+            a glob pattern, or a manifest file listing one path per line.
+            Manifest paths are relative to the manifest's directory; blank
+            lines and lines starting with '#' are skipped.
+
+    Returns:
+        list[str]
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(CNF_SUFFIXES):
+                    paths.append(os.path.join(root, name))
+        return paths
+    elif any(char in source for char in '*?['):
+        return sorted(glob.glob(source, recursive=True))
+    base = os.path.dirname(source)
+    paths = []
+    with io.open(source) as manifest:
+        for line in manifest:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                paths.append(os.path.join(base, line))
+    return paths
+
+
+def clause_count(path):
+    """Clause count from a file's header, or 0 if it cannot be read."""
+    try:
+        if is_binary(path):
+            return MappedCNF(path).clause_count
+        with io.open(path, 'rb') as f:
+            return CNFStream(open_cnf(f)).clause_count
+    except Exception:
+        return 0
+
+
+def completed(output):
+    """Paths that already have a result in a JSONL output file.
+
+    ERROR records do not count, so those files are solved again.
+    """
+    done = set()
+    if output is None or not os.path.exists(output):
+        return done
+    with io.open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                if record['status'] != 'ERROR':
+                    done.add(record['path'])
+            except (ValueError, KeyError):
+                # A line cut short when the batch was interrupted.
+                continue
+    return done
+
+
+def _drop_partial_line(output):
+    """Cut off a last line that an interrupted batch left unfinished."""
+    with io.open(output, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            step = min(position, 4096)
+            f.seek(position - step)
+            chunk = f.read(step)
+            newline = chunk.rfind(b'\n')
+            if newline >= 0:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position < end:
+            f.truncate(position)
+
+
+def solve_file(path, restarts='luby', preprocess=False, budgets=None,
+               verify=True, limits=None, models=False, cache=None,
+               cache_size=DEFAULT_MAX_BYTES):
+    """Solve one DIMACS file.
+
+    Args:
+        cache (str): directory of a ResultCache to answer from and fill.
+        cache_size (int): its size bound, in bytes.
+
+    Returns:
+        dict: path, status, vars, clauses, parse_time, solve_time,
+        conflicts and time (in total); cached if the answer came from the
+        cache; model (as a list of literals) if `models` is set and it is
+        SAT; reason if UNKNOWN; error if ERROR.
+    """
+    record = {'path': path}
+    start = time.time()
+    try:
+        inst = load_instance(path, preprocess, budgets)
+        parsed = time.time()
+        record['parse_time'] = parsed - start
+        if isinstance(inst, Failure):
+            # Preprocessing showed it UNSAT.
+            record.update(status='UNSAT', solve_time=0.0)
+        else:
+            if cache is not None:
+                cache = ResultCache(cache, cache_size)
+            _solve(inst, parsed, record, restarts, verify, limits, models,
+                   cache)
+    except Exception as e:
+        record['status'] = 'ERROR'
+        record['error'] = '{}: {}'.format(type(e).__name__, e)
+    record['time'] = time.time() - start
+    return record
+
+
+def _solve(inst, parsed, record, restarts, verify, limits, models, cache):
+    record['vars'] = inst.var_count
+    record['clauses'] = len(inst.clauses)
+    result = None
+    if cache is not None:
+        key = cache.key(inst)
+        result = cache.lookup(key, inst)
+        record['cached'] = result is not None
+    if result is None:
+        stats = SolverStats()
+        solver = Solver(inst, restarts=make_policy(restarts), stats=stats)
+        solver.verify_models = verify
+        result = solver.solve(**(limits or {}))
+        record['conflicts'] = stats.conflicts
+        if cache is not None:
+            cache.store(key, result, inst)
+    record['solve_time'] = time.time() - parsed
+    if result.success:
+        record['status'] = 'SAT'
+        if models:
+            model = inst.solutions[-1]
+            record['model'] = [var if model[var] else -var
+                               for var in sorted(model)]
+    elif isinstance(result, Unknown):
+        record['status'] = 'UNKNOWN'
+        record['reason'] = result.reason
+    else:
+        record['status'] = 'UNSAT'
+
+
+def _run(todo, options, workers):
+    """solve_file on each path, at most `workers` at a time.
+
+    A worker process that dies (a crash in the compiled kernel, an OOM kill)
+    breaks the pool: the files it was running with get ERROR records, and
+    the files not yet started go to a fresh pool.
+
+    Yields:
+        dict: solve_file's result for each path, in completion order.
+    """
+    pending = collections.deque(todo)
+    running = {}
+    executor = None
+    try:
+        while pending or running:
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=workers)
+            # Only as many files as workers are handed over, so a broken
+            # pool has not started the rest.
+            while pending and len(running) < workers:
+                path = pending.popleft()
+                running[executor.submit(solve_file, path, **options)] = path
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            broken = any(isinstance(future.exception(),
+                                    BrokenProcessPool) for future in done)
+            if broken:
+                # Every running file fails with the pool.
+                done, _ = wait(running)
+            for future in done:
+                path = running.pop(future)
+                if isinstance(future.exception(), BrokenProcessPool):
+                    yield {'path': path, 'status': 'ERROR', 'time': 0.0,
+                           'error': 'a worker process died'}
+                else:
+                    yield future.result()
+            if broken:
+                executor.shutdown(wait=False)
+                executor = None
+    finally:
+        if executor is not None:
+            # Files already running finish; nothing else is started.
+            executor.shutdown(wait=False)
+
+
+def solve_many(paths, output=None, workers=None, resume=True, **options):
+    """Solve many DIMACS files on a process pool.
+
+    Args:
+        paths (list[str]): see collect_paths.
+        output (str): JSONL file the results are appended to, one line per
+            file, as they come in.
+        workers (int): processes; one per CPU by default.
+        resume (bool): skip the files that already have a result other
+            than ERROR in `output`.
+        options: see solve_file.
+
+    Yields:
+        dict: solve_file's result for each file, in completion order.
+    """
+    skip = completed(output) if resume else set()
+    todo = [path for path in paths if path not in skip]
+    # Largest first, so the longest runs start early.
+    todo.sort(key=clause_count, reverse=True)
+    if not todo:
+        return
+
+    out = None
+    if output is not None:
+        if resume and os.path.exists(output):
+            _drop_partial_line(output)
+        out = io.open(output, 'a' if resume else 'w')
+    try:
+        for record in _run(todo, options,
+                           workers or multiprocessing.cpu_count()):
+            if out is not None:
+                out.write(json.dumps(record, sort_keys=True) + '\n')
+                out.flush()
+            yield record
+    finally:
+        if out is not None:
+            out.close()
+
+
+def main(argv=None):
+    import argparse
+    from satsolver.restarts import POLICIES
+
+    cmdline_parser = argparse.ArgumentParser(
+        prog='satsolver batch',
+        description='Solve many DIMACS files on a process pool.')
+    cmdline_parser.add_argument('source',
+                                help='directory, glob pattern (quoted) or '
+                                     'manifest file of paths')
+    cmdline_parser.add_argument('--output', metavar='FILE',
+                                default='results.jsonl',
+                                help='JSONL results (default: '
+                                     'results.jsonl)')
+    cmdline_parser.add_argument('--workers', metavar='N', type=int,
+                                default=None,
+                                help='worker processes (default: one per '
+                                     'CPU)')
+    cmdline_parser.add_argument('--no-resume', action='store_true',
+                                help='overwrite OUTPUT instead of skipping '
+                                     'the files it has results for')
+    cmdline_parser.add_argument('--restarts', choices=sorted(POLICIES),
+                                default='luby')
+    cmdline_parser.add_argument('--preprocess', action='store_true')
+    cmdline_parser.add_argument('--time-limit', metavar='SECONDS', type=float,
+                                default=None, help='per file')
+    cmdline_parser.add_argument('--conflict-limit', metavar='N', type=int,
+                                default=None, help='per file')
+    cmdline_parser.add_argument('--models', action='store_true',
+                                help='include the model of SAT files')
+    cmdline_parser.add_argument('--no-verify', action='store_true')
+    cmdline_parser.add_argument('--cache', metavar='DIR', default=None,
+                                help='reuse results of identical (or '
+                                     'renamed) formulas, cached in DIR')
+    cmdline_parser.add_argument('--cache-size', metavar='MB', type=float,
+                                default=256)
+    args = cmdline_parser.parse_args(argv)
+
+    paths = collect_paths(args.source)
+    limits = dict(max_time=args.time_limit, max_conflicts=args.conflict_limit)
+    counts = {}
+    try:
+        for record in solve_many(paths, args.output, args.workers,
+                                 resume=not args.no_resume,
+                                 restarts=args.restarts,
+                                 preprocess=args.preprocess,
+                                 verify=not args.no_verify, limits=limits,
+                                 models=args.models, cache=args.cache,
+                                 cache_size=int(args.cache_size * (1 << 20))):
+            counts[record['status']] = counts.get(record['status'], 0) + 1
+    except KeyboardInterrupt:
+        sys.stderr.write('interrupted; run again to resume\n')
+        sys.exit(130)
+    summary = ', '.join('{} {}'.format(count, status)
+                        for status, count in sorted(counts.items()))
+    sys.stderr.write('{} files solved{}\n'.format(
+        sum(counts.values()), ': ' + summary if summary else ''))
+
+
+if __name__ == '__main__':
+    main()
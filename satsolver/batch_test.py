@@ -0,0 +1,86 @@
+import io
+import json
+import os
+
+from satsolver import batch
+
+from satsolver.batch import collect_paths, completed, solve_file, solve_many
+from satsolver.parser import write_cnf
+from satsolver.solver_test import pigeonhole
+
+
+def write(path, var_count, clauses):
+    with io.open(str(path), 'w') as f:
+        write_cnf(f, var_count, clauses)
+    return str(path)
+
+
+def make_batch(tmpdir):
+    small = write(tmpdir.join('small.cnf'), 2, [[1, 2], [-1]])
+    php = write(tmpdir.mkdir('php').join('php-3.cnf'), *pigeonhole(3))
+    tmpdir.join('notes.txt').write('not a formula')
+    return small, php
+
+
+def test_collect_paths(tmpdir):
+    small, php = make_batch(tmpdir)
+    assert collect_paths(str(tmpdir)) == [small, php]
+    assert collect_paths(str(tmpdir.join('*.cnf'))) == [small]
+    manifest = tmpdir.join('manifest')
+    manifest.write('# nightly\nsmall.cnf\n\nphp/php-3.cnf\n')
+    assert collect_paths(str(manifest)) == [small, php]
+
+
+def test_solve_file(tmpdir):
+    small, php = make_batch(tmpdir)
+    record = solve_file(small, models=True)
+    assert record['status'] == 'SAT'
+    assert record['model'] == [-1, 2]
+    assert (record['vars'], record['clauses']) == (2, 2)
+    assert solve_file(php, limits={'max_conflicts': 1})['status'] == 'UNKNOWN'
+    assert solve_file(str(tmpdir.join('notes.txt')))['status'] == 'ERROR'
+
+
+def test_solve_many_largest_first_and_resume(tmpdir):
+    small, php = make_batch(tmpdir)
+    output = str(tmpdir.join('results.jsonl'))
+    records = list(solve_many([small, php], output, workers=1))
+    # One worker takes the files in order: the pigeonhole one is larger.
+    assert [r['path'] for r in records] == [php, small]
+    assert [r['status'] for r in records] == ['UNSAT', 'SAT']
+    with io.open(output) as f:
+        assert [json.loads(line)['path'] for line in f] == [php, small]
+
+    # An interrupted write leaves a partial line, which does not count.
+    with io.open(output, 'w') as f:
+        f.write(json.dumps(records[0]) + '\n{"path": "')
+    assert completed(output) == set([php])
+    records = list(solve_many([small, php], output, workers=1))
+    assert [r['path'] for r in records] == [small]
+    assert list(solve_many([small, php], output, workers=1)) == []
+
+
+def test_resume_retries_errors(tmpdir):
+    small, php = make_batch(tmpdir)
+    output = str(tmpdir.join('results.jsonl'))
+    with io.open(output, 'w') as f:
+        f.write(json.dumps({'path': small, 'status': 'ERROR'}) + '\n')
+        f.write(json.dumps({'path': php, 'status': 'UNSAT'}) + '\n')
+    assert completed(output) == set([php])
+    records = list(solve_many([small, php], output, workers=1))
+    assert [(r['path'], r['status']) for r in records] == [(small, 'SAT')]
+    assert completed(output) == set([small, php])
+
+
+def crash_on_php(path, **options):
+    if 'php' in path:
+        os._exit(1)
+    return solve_file(path, **options)
+
+
+def test_dead_worker_is_an_error(tmpdir, monkeypatch):
+    small, php = make_batch(tmpdir)
+    monkeypatch.setattr(batch, 'solve_file', crash_on_php)
+    records = list(solve_many([small, php], workers=1))
+    assert [(r['path'], r['status']) for r in records] == [
+        (php, 'ERROR'), (small, 'SAT')]
@@ -0,0 +1,350 @@
+"""Reproducible benchmarks and performance regression checks.
+
+The suites are generated from fixed seeds, so every run solves the same
+DIMACS files without downloading anything:
+  - random 3-SAT at the phase transition (4.26 clauses per variable)
+  - pigeonhole: n + 1 pigeons in n holes (UNSAT)
+  - graph coloring of random graphs
+  - parity: one XOR constraint encoded twice with opposite parities (UNSAT)
+
+Every instance runs in its own process, which times parsing, preprocessing
+and solving separately and reports its peak memory. Results can be written
+as JSON or CSV and compared against an earlier JSON run:
+
+    python -m satsolver.bench --output base.json
+    python -m satsolver.bench --baseline base.json
+"""
+
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+from satsolver.loader import load_instance
+from satsolver.parser import write_cnf
+from satsolver.preprocess import Preprocessor
+from satsolver.compact import CompactInstance
+from satsolver.solver import Solver, peak_memory
+from satsolver.stats import SolverStats
+from satsolver.util import Unknown
+
+# A generated instance: `generate` returns (var_count, clauses); `expected`
+# is 'SAT', 'UNSAT' or None if unknown.
+Benchmark = namedtuple('Benchmark', ['name', 'family', 'generate', 'expected'])
+
+# A result may be this much slower than its baseline...
+DEFAULT_THRESHOLD = 0.25
+# ...and results faster than this many seconds are too noisy to compare.
+MIN_COMPARED_TIME = 0.05
+
+FIELDS = ['name', 'family', 'vars', 'clauses', 'status', 'parse_time',
+          'preprocess_time', 'solve_time', 'peak_rss_kb', 'conflicts',
+          'decisions', 'propagations_per_second']
+
+
+def random_3sat(var_count, seed, ratio=4.26):
+    rng = random.Random(seed)
+    clauses = []
+    for _ in range(int(var_count * ratio)):
+        clauses.append([var if rng.random() < 0.5 else -var
+                        for var in rng.sample(range(1, var_count + 1), 3)])
+    return var_count, clauses
+
+
+def pigeonhole(holes):
+    """n + 1 pigeons in n holes; variable p * holes + h + 1 puts p in h."""
+    pigeons = holes + 1
+
+    def var(p, h):
+        return p * holes + h + 1
+
+    clauses = [[var(p, h) for h in range(holes)] for p in range(pigeons)]
+    for h in range(holes):
+        for p in range(pigeons):
+            for q in range(p + 1, pigeons):
+                clauses.append([-var(p, h), -var(q, h)])
+    return pigeons * holes, clauses
+
+
+def graph_coloring(nodes, colors, seed, degree=4):
+    """Color a random graph with `nodes * degree / 2` edges."""
+    rng = random.Random(seed)
+
+    def var(node, color):
+        return node * colors + color + 1
+
+    clauses = []
+    for node in range(nodes):
+        clauses.append([var(node, c) for c in range(colors)])
+        for c in range(colors):
+            for d in range(c + 1, colors):
+                clauses.append([-var(node, c), -var(node, d)])
+    edges = set()
+    while len(edges) < nodes * degree // 2:
+        edge = tuple(sorted(rng.sample(range(nodes), 2)))
+        if edge in edges:
+            continue
+        edges.add(edge)
+        for c in range(colors):
+            clauses.append([-var(edge[0], c), -var(edge[1], c)])
+    return nodes * colors, clauses
+
+
+def _xor_chain(variables, parity, next_var, clauses):
+    """Encode XOR(variables) == parity with one auxiliary per step.
+
+    Returns:
+        int: the next unused variable.
+    """
+    acc = variables[0]
+    for var in variables[1:]:
+        out = next_var
+        next_var += 1
+        # out <-> acc XOR var
+        clauses.extend([[-acc, -var, -out], [acc, var, -out],
+                        [acc, -var, out], [-acc, var, out]])
+        acc = out
+    clauses.append([acc if parity else -acc])
+    return next_var
+
+
+def parity(var_count, seed):
+    """The same XOR twice, in different orders, with opposite parities."""
+    rng = random.Random(seed)
+    variables = list(range(1, var_count + 1))
+    clauses = []
+    next_var = _xor_chain(variables, 1, var_count + 1, clauses)
+    rng.shuffle(variables)
+    next_var = _xor_chain(variables, 0, next_var, clauses)
+    return next_var - 1, clauses
+
+
+def _benchmark(name, family, expected, func, *args):
+    return Benchmark(name, family, lambda: func(*args), expected)
+
+
+SUITES = {
+    'small': [
+        _benchmark('random-3sat-50-{}'.format(seed), 'random-3sat', None,
+                   random_3sat, 50, seed)
+        for seed in range(4)
+    ] + [
+        _benchmark('pigeonhole-5', 'pigeonhole', 'UNSAT', pigeonhole, 5),
+        _benchmark('coloring-30-3', 'coloring', None,
+                   graph_coloring, 30, 3, 1),
+        _benchmark('parity-12', 'parity', 'UNSAT', parity, 12, 1),
+    ],
+    'full': [
+        _benchmark('random-3sat-{}-{}'.format(n, seed), 'random-3sat', None,
+                   random_3sat, n, seed)
+        for n in (100, 150) for seed in range(4)
+    ] + [
+        _benchmark('pigeonhole-{}'.format(n), 'pigeonhole', 'UNSAT',
+                   pigeonhole, n)
+        for n in (6, 7)
+    ] + [
+        _benchmark('coloring-{}-{}'.format(n, k), 'coloring', None,
+                   graph_coloring, n, k, 1)
+        for n, k in ((60, 3), (40, 4))
+    ] + [
+        _benchmark('parity-{}'.format(n), 'parity', 'UNSAT', parity, n, 1)
+        for n in (16, 24)
+    ],
+}
+
+
+def write_suite(suite, directory):
+    """Write every benchmark of a suite as a DIMACS file.
+
+    Returns:
+        list[tuple(Benchmark, str)]: each benchmark with its file's path.
+    """
+    written = []
+    for benchmark in suite:
+        var_count, clauses = benchmark.generate()
+        path = os.path.join(directory, benchmark.name + '.cnf')
+        with io.open(path, 'w') as f:
+            write_cnf(f, var_count, clauses,
+                      comments=['family: ' + benchmark.family])
+        written.append((benchmark, path))
+    return written
+
+
+def run_instance(path, preprocess=True, max_conflicts=None):
+    """Parse, preprocess and solve a DIMACS file, timing each step.
+
+    Meant to run in a fresh process, so peak_rss_kb is this instance's.
+
+    Returns:
+        dict: the result's FIELDS, except name and family.
+    """
+    # Loaded like the command line loads it.
+    start = time.time()
+    instance = load_instance(path)
+    parse_time = time.time() - start
+    var_count, clause_count = instance.var_count, len(instance.clauses)
+
+    start = time.time()
+    status = None
+    if preprocess:
+        preprocessor = Preprocessor(var_count, instance.clauses)
+        if preprocessor.run().success:
+            instance = CompactInstance(var_count,
+                                       preprocessor.remaining_clauses())
+            instance.reconstruction = preprocessor.extend
+        else:
+            status = 'UNSAT'
+    preprocess_time = time.time() - start
+
+    stats = SolverStats()
+    start = time.time()
+    if status is None:
+        result = Solver(instance, stats=stats).solve(
+            max_conflicts=max_conflicts)
+        if result.success:
+            status = 'SAT'
+        elif isinstance(result, Unknown):
+            status = 'UNKNOWN'
+        else:
+            status = 'UNSAT'
+    solve_time = time.time() - start
+
+    return {
+        'vars': var_count,
+        'clauses': clause_count,
+        'status': status,
+        'parse_time': parse_time,
+        'preprocess_time': preprocess_time,
+        'solve_time': solve_time,
+        'peak_rss_kb': int(peak_memory() * 1024),
+        'conflicts': stats.conflicts,
+        'decisions': stats.decisions,
+        'propagations_per_second': (stats.propagations / solve_time
+                                    if solve_time > 0 else 0.0),
+    }
+
+
+def _run_instance(args):
+    return run_instance(*args)
+
+
+def run_suite(suite, directory=None, preprocess=True, max_conflicts=None):
+    """Run every benchmark of a suite, each in its own process.
+
+    Args:
+        suite (list[Benchmark]):
+        directory (str): where to write the DIMACS files; a temporary
+            directory by default.
+
+    Returns:
+        list[dict]: one result per benchmark, with FIELDS.
+    """
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix='satsolver-bench-')
+    results = []
+    # A fresh process per instance keeps peak memory per instance.
+    pool = multiprocessing.Pool(processes=1, maxtasksperchild=1)
+    try:
+        for benchmark, path in write_suite(suite, directory):
+            result = pool.apply(_run_instance,
+                                ((path, preprocess, max_conflicts),))
+            result['name'] = benchmark.name
+            result['family'] = benchmark.family
+            if benchmark.expected not in (None, result['status']):
+                raise ValueError('{} is {}, expected {}'.format(
+                    benchmark.name, result['status'], benchmark.expected))
+            results.append(result)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD,
+            min_time=MIN_COMPARED_TIME):
+    """Find regressions against a baseline run.
+
+    A result regresses if its status changed, or its solve time grew by more
+    than `threshold` (a fraction) and by more than `min_time` seconds.
+    Benchmarks missing from either run are ignored.
+
+    Returns:
+        list[str]: a description of each regression.
+    """
+    previous = dict((result['name'], result) for result in baseline)
+    regressions = []
+    for result in results:
+        base = previous.get(result['name'])
+        if base is None:
+            continue
+        if result['status'] != base['status']:
+            regressions.append('{}: status {} -> {}'.format(
+                result['name'], base['status'], result['status']))
+            continue
+        limit = base['solve_time'] * (1 + threshold)
+        if (result['solve_time'] > limit and
+                result['solve_time'] - base['solve_time'] > min_time):
+            regressions.append('{}: solve time {:.3f}s -> {:.3f}s'.format(
+                result['name'], base['solve_time'], result['solve_time']))
+    return regressions
+
+
+def write_results(results, file_object, format='json'):
+    if format == 'json':
+        json.dump(results, file_object, indent=2, sort_keys=True)
+        file_object.write('\n')
+    elif format == 'csv':
+        writer = csv.DictWriter(file_object, FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    else:
+        raise ValueError('Unknown format {}'.format(format))
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(
+        description='Run the benchmark suite')
+    cmdline_parser.add_argument('--suite', choices=sorted(SUITES),
+                                default='small')
+    cmdline_parser.add_argument('--dir', default=None,
+                                help='write the DIMACS files here')
+    cmdline_parser.add_argument('--format', choices=['json', 'csv'],
+                                default='json')
+    cmdline_parser.add_argument('--output', default=None,
+                                help='results file (default: stdout)')
+    cmdline_parser.add_argument('--baseline', default=None,
+                                help='JSON results to check for regressions')
+    cmdline_parser.add_argument('--threshold', type=float,
+                                default=DEFAULT_THRESHOLD,
+                                help='allowed slowdown, as a fraction')
+    cmdline_parser.add_argument('--no-preprocess', action='store_true')
+    cmdline_parser.add_argument('--max-conflicts', type=int, default=None)
+    args = cmdline_parser.parse_args()
+
+    results = run_suite(SUITES[args.suite], args.dir,
+                        preprocess=not args.no_preprocess,
+                        max_conflicts=args.max_conflicts)
+    if args.output is None:
+        write_results(results, sys.stdout, args.format)
+    else:
+        with open(args.output, 'w', newline='') as f:
+            write_results(results, f, args.format)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            sys.stderr.write('regression: {}\n'.format(regression))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
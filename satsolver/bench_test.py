@@ -0,0 +1,80 @@
+import io
+import json
+
+from satsolver.state import Instance
+from satsolver.solver import Solver
+from satsolver.bench import (Benchmark, SUITES, compare, graph_coloring,
+                             parity, pigeonhole, random_3sat, run_suite,
+                             write_results)
+
+
+def solves(var_count, clauses):
+    return Solver(Instance(var_count, clauses)).solve().success
+
+
+def test_generators_are_reproducible():
+    assert random_3sat(20, 3) == random_3sat(20, 3)
+    assert random_3sat(20, 3) != random_3sat(20, 4)
+    assert graph_coloring(10, 3, 1) == graph_coloring(10, 3, 1)
+
+
+def test_generated_families():
+    var_count, clauses = random_3sat(20, 1)
+    assert var_count == 20
+    assert len(clauses) == 85
+    assert not solves(*pigeonhole(4))
+    assert not solves(*parity(6, 1))
+    # A 4-regular-ish graph on 10 nodes is easily 5-colorable.
+    assert solves(*graph_coloring(10, 5, 1))
+
+
+def test_suite_names_are_unique():
+    for suite in SUITES.values():
+        assert len(set(b.name for b in suite)) == len(suite)
+
+
+def test_run_suite(tmpdir):
+    suite = [Benchmark('php-3', 'pigeonhole', lambda: pigeonhole(3), 'UNSAT')]
+    results = run_suite(suite, str(tmpdir))
+    assert tmpdir.join('php-3.cnf').check()
+    [result] = results
+    assert result['name'] == 'php-3'
+    assert result['status'] == 'UNSAT'
+    assert result['vars'] == 12
+    assert result['peak_rss_kb'] > 0
+
+
+def test_compare():
+    baseline = [
+        {'name': 'a', 'status': 'SAT', 'solve_time': 1.0},
+        {'name': 'b', 'status': 'SAT', 'solve_time': 1.0},
+        {'name': 'c', 'status': 'UNSAT', 'solve_time': 0.01},
+        {'name': 'd', 'status': 'SAT', 'solve_time': 1.0},
+    ]
+    results = [
+        {'name': 'a', 'status': 'SAT', 'solve_time': 1.2},
+        {'name': 'b', 'status': 'SAT', 'solve_time': 2.0},
+        # Too fast to tell.
+        {'name': 'c', 'status': 'UNSAT', 'solve_time': 0.03},
+        {'name': 'd', 'status': 'UNKNOWN', 'solve_time': 1.0},
+        {'name': 'new', 'status': 'SAT', 'solve_time': 9.0},
+    ]
+    regressions = compare(results, baseline, threshold=0.25)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('b: solve time')
+    assert regressions[1] == 'd: status SAT -> UNKNOWN'
+
+
+def test_write_results():
+    results = [{'name': 'a', 'family': 'f', 'vars': 1, 'clauses': 1,
+                'status': 'SAT', 'parse_time': 0.0, 'preprocess_time': 0.0,
+                'solve_time': 0.5, 'peak_rss_kb': 1, 'conflicts': 0,
+                'decisions': 1, 'propagations_per_second': 0.0}]
+    out = io.StringIO()
+    write_results(results, out, 'csv')
+    lines = out.getvalue().splitlines()
+    assert lines[0].startswith('name,family,vars')
+    assert len(lines) == 2
+    out = io.StringIO()
+    write_results(results, out, 'json')
+    assert json.loads(out.getvalue()) == results
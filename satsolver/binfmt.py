@@ -0,0 +1,477 @@
+"""Binary CNF files, loaded by memory mapping.
+
+Parsing a large DIMACS file takes far longer than solving starts; a formula
+converted once with
+
+    satsolver convert problem.cnf.xz problem.cnfb
+
+loads in the time it takes to map the file. The layout is that of
+CompactInstance, little-endian:
+
+    header      HEADER: magic, version, flags, var and clause counts, the
+                literal count and the position of each section
+    offsets     int32[clause_count + 1]; clause i is lits[offsets[i]:
+                offsets[i + 1]]
+    lits        int32[lit_count] literal codes (2 * var + sign)
+    occurrences optional (flag OCCURRENCES): int32[2 * (var_count + 1) + 1]
+                offsets by literal code, then int32[lit_count] clause
+                indices, so the clauses containing a literal are one slice
+
+`MappedInstance` reads its original clauses straight out of the read-only
+mapping and never writes to it: which literals of a clause are watched is
+kept in a private array instead of by reordering the clause. Any number of
+processes solving the same file share one copy of its clauses in the page
+cache, and a process forked after loading (see portfolio and cube) shares
+its parent's mapping.
+"""
+import io
+import mmap
+import struct
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from satsolver.compact import CompactInstance, ClauseView, _satisfied
+from satsolver.state import encode, decode
+
+MAGIC = b'SATCNFB\n'
+VERSION = 1
+
+# Header flags.
+OCCURRENCES = 1
+
+# magic, version, flags, var_count, clause_count, lit_count, and the byte
+# positions of offsets, lits and occurrences (0 if absent); padded to 64.
+HEADER = struct.Struct('<8sIIIIQQQQ8x')
+
+# Largest literal count int32 offsets can address.
+MAX_LITS = (1 << 31) - 1
+
+
+def is_binary(filename):
+    """Whether a file starts with the binary CNF magic."""
+    with io.open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _little_endian(values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def occurrence_index(var_count, lits, offsets):
+    """Clauses of every literal, grouped by literal code.
+
+    Returns:
+        tuple(array, array): per-code offsets into the clause indices, and
+        the clause indices; the clauses containing code c are
+        clauses[starts[c]:starts[c + 1]], in increasing order.
+    """
+    code_count = 2 * (var_count + 1)
+    if np is not None and len(lits):
+        codes = np.frombuffer(lits, dtype=np.intc)
+        sizes = np.diff(np.frombuffer(offsets, dtype=np.intc))
+        owners = np.repeat(np.arange(len(sizes), dtype=np.intc), sizes)
+        # A stable sort keeps each code's clauses in order.
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes, minlength=code_count)
+        starts = np.zeros(code_count + 1, dtype=np.intc)
+        np.cumsum(counts, out=starts[1:])
+        return _array(starts), _array(owners[order])
+
+    counts = array('i', [0]) * (code_count + 1)
+    for code in lits:
+        counts[code + 1] += 1
+    for code in range(code_count):
+        counts[code + 1] += counts[code]
+    starts = array('i', counts)
+    clauses = array('i', [0]) * len(lits)
+    for clause_index in range(len(offsets) - 1):
+        for k in range(offsets[clause_index], offsets[clause_index + 1]):
+            code = lits[k]
+            clauses[counts[code]] = clause_index
+            counts[code] += 1
+    return starts, clauses
+
+
+def _array(values):
+    result = array('i')
+    result.frombytes(values.astype(np.intc).tobytes())
+    return result
+
+
+def write_binary(file_object, var_count, lits, offsets, occurrences=True):
+    """Write flattened clauses as a binary CNF file.
+
+    Args:
+        file_object: a binary file.
+        var_count (int):
+        lits, offsets (array): as CompactInstance.lits and offsets; no
+            clause may repeat a literal.
+        occurrences (bool): include the occurrence index.
+    """
+    if len(lits) > MAX_LITS:
+        raise ValueError('{} literals do not fit int32 offsets'
+                         .format(len(lits)))
+    offsets_pos = HEADER.size
+    lits_pos = offsets_pos + 4 * len(offsets)
+    occurrences_pos = lits_pos + 4 * len(lits) if occurrences else 0
+    file_object.write(HEADER.pack(
+        MAGIC, VERSION, OCCURRENCES if occurrences else 0, var_count,
+        len(offsets) - 1, len(lits), offsets_pos, lits_pos, occurrences_pos))
+    file_object.write(_little_endian(offsets).tobytes())
+    file_object.write(_little_endian(lits).tobytes())
+    if occurrences:
+        for section in occurrence_index(var_count, lits, offsets):
+            file_object.write(_little_endian(section).tobytes())
+
+
+def convert(source, destination, occurrences=True):
+    """Convert a DIMACS file (possibly compressed) to a binary CNF file.
+
+    Literals repeated within a clause are written once.
+
+    Args:
+        source (str | file): see parser.open_cnf.
+        destination (str): path of the binary file.
+        occurrences (bool): include the occurrence index.
+
+    Returns:
+        tuple(int, int): the variable and clause counts.
+    """
+    from satsolver.parser import CNFStream, open_cnf
+
+    stream = CNFStream(open_cnf(source))
+    lits = array('i')
+    offsets = array('i', [0])
+    for clause in stream:
+        for lit in clause:
+            if abs(lit) > stream.var_count:
+                raise ValueError('Variable {} exceeds the {} declared in the '
+                                 'header'.format(abs(lit), stream.var_count))
+        # Watching relies on distinct literals, so repeats are dropped.
+        seen = set()
+        for lit in clause:
+            if lit not in seen:
+                seen.add(lit)
+                lits.append(encode(lit))
+        offsets.append(len(lits))
+    with io.open(destination, 'wb') as f:
+        write_binary(f, stream.var_count, lits, offsets, occurrences)
+    return stream.var_count, len(offsets) - 1
+
+
+class MappedCNF(object):
+    """A binary CNF file mapped into memory.
+
+    `offsets`, `lits`, `occurrence_starts` and `occurrence_clauses` are
+    int32 views of the mapping, so nothing is copied until it is read. The
+    mapping stays open as long as any view of it is alive.
+    """
+    def __init__(self, filename):
+        if sys.byteorder != 'little':
+            raise ValueError('binary CNF files are only read on '
+                             'little-endian machines')
+        self.filename = filename
+        with io.open(filename, 'rb') as f:
+            try:
+                self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped.
+                raise ValueError('{} is not a binary CNF file'
+                                 .format(filename))
+        if len(self.buffer) < HEADER.size:
+            raise ValueError('{} is not a binary CNF file'.format(filename))
+        (magic, version, flags, self.var_count, self.clause_count,
+         lit_count, offsets_pos, lits_pos,
+         occurrences_pos) = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError('{} is not a binary CNF file'.format(filename))
+        if version != VERSION:
+            raise ValueError('Unsupported binary CNF version {}'
+                             .format(version))
+
+        self.offsets = self._view(offsets_pos, self.clause_count + 1)
+        self.lits = self._view(lits_pos, lit_count)
+        if self.offsets[0] != 0 or self.offsets[-1] != lit_count:
+            raise ValueError('{} has inconsistent offsets'.format(filename))
+        self.occurrence_starts = self.occurrence_clauses = None
+        if flags & OCCURRENCES:
+            code_count = 2 * (self.var_count + 1)
+            self.occurrence_starts = self._view(occurrences_pos,
+                                                code_count + 1)
+            self.occurrence_clauses = self._view(
+                occurrences_pos + 4 * (code_count + 1), lit_count)
+
+    def __reduce__(self):
+        # Processes that are not forked map the file again.
+        return MappedCNF, (self.filename,)
+
+    def _view(self, position, count):
+        end = position + 4 * count
+        if end > len(self.buffer):
+            raise ValueError('{} is truncated'.format(self.filename))
+        return memoryview(self.buffer)[position:end].cast('i')
+
+    def __len__(self):
+        return self.clause_count
+
+    def __getitem__(self, clause_index):
+        offsets = self.offsets
+        return [decode(code) for code in
+                self.lits[offsets[clause_index]:offsets[clause_index + 1]]]
+
+    def __iter__(self):
+        for clause_index in range(self.clause_count):
+            yield self[clause_index]
+
+    def occurrences(self, lit):
+        """Indices of the clauses that contain a literal.
+
+        Returns:
+            memoryview | None: None if the file has no occurrence index.
+        """
+        if self.occurrence_starts is None:
+            return None
+        code = encode(lit)
+        starts = self.occurrence_starts
+        return self.occurrence_clauses[starts[code]:starts[code + 1]]
+
+
+class WatchedFirstView(ClauseView):
+    """ClauseView listing the two watched literals of a clause first.
+
+    A reason's implied literal is then first, as in every other instance.
+    """
+    def __getitem__(self, clause_index):
+        instance = self.instance
+        if instance.deleted[clause_index]:
+            return None
+        codes = list(instance.clause_codes(clause_index))
+        if len(codes) > 2:
+            watched = instance.watched_codes(clause_index)
+            for code in watched:
+                codes.remove(code)
+            codes[:0] = watched
+        return [decode(code) for code in codes]
+
+
+def load(filename):
+    """Map a binary CNF file as a MappedInstance."""
+    return MappedInstance(MappedCNF(filename))
+
+
+class MappedInstance(CompactInstance):
+    """CompactInstance whose original clauses stay in a read-only mapping.
+
+    Clauses 0 to base_count - 1 are those of the mapped file; learned and
+    added clauses get indices from base_count on and live in the private
+    `lits` and `offsets` arrays (whose offsets start over at 0). The two
+    watched literal codes of clause i are watched[2 * i] and
+    watched[2 * i + 1], the falsified one kept second, as CompactInstance
+    keeps them first in the clause. `clauses` lists them first too.
+
+    The compiled kernel expects CompactInstance's layout, so this always
+    propagates in Python.
+    """
+    kernel = None
+
+    def __init__(self, cnf):
+        """
+        Args:
+            cnf (MappedCNF):
+        """
+        CompactInstance.__init__(self, cnf.var_count, [])
+        self.cnf = cnf
+        self.base_lits = cnf.lits
+        self.base_offsets = cnf.offsets
+        self.base_count = cnf.clause_count
+        self.clauses = WatchedFirstView(self)
+        self.deleted = bytearray(self.base_count)
+        self.watched = array('i', [0, 0]) * self.base_count
+        for clause_index in range(self.base_count):
+            self.watch_clause(clause_index)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['base_lits'], state['base_offsets']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.base_lits = self.cnf.lits
+        self.base_offsets = self.cnf.offsets
+
+    def clause_codes(self, clause_index):
+        if clause_index < self.base_count:
+            offsets = self.base_offsets
+            return self.base_lits[offsets[clause_index]:
+                                  offsets[clause_index + 1]]
+        offsets = self.offsets
+        clause_index -= self.base_count
+        return self.lits[offsets[clause_index]:offsets[clause_index + 1]]
+
+    def watched_codes(self, clause_index):
+        w = clause_index << 1
+        return self.watched[w], self.watched[w + 1]
+
+    def _append(self, clause):
+        self.lits.extend(encode(lit) for lit in clause)
+        self.offsets.append(len(self.lits))
+        self.deleted.append(0)
+        self.watched.extend((0, 0))
+        return len(self.deleted) - 1
+
+    def watch_clause(self, clause_index):
+        codes = self.clause_codes(clause_index)
+        size = len(codes)
+        if size < 2:
+            self.units.append(clause_index)
+            return
+        first, second = codes[0], codes[1]
+        w = clause_index << 1
+        self.watched[w] = first
+        self.watched[w + 1] = second
+        if size == 2:
+            self.binaries[first].append((second, clause_index))
+            self.binaries[second].append((first, clause_index))
+        else:
+            self.watches[first].append(clause_index)
+            self.watches[second].append(clause_index)
+
+    def is_locked(self, clause_index):
+        for code in self.watched_codes(clause_index):
+            if (self.values[code] == 1 and
+                    self.reasons[code >> 1] == clause_index):
+                return True
+        return False
+
+    def _collect_garbage(self):
+        """Drop the literals of deleted clauses from the private `lits`."""
+        lits = self.lits
+        offsets = self.offsets
+        deleted = self.deleted
+        compacted = array('i')
+        new_offsets = array('i', [0])
+        for k in range(len(offsets) - 1):
+            if not deleted[self.base_count + k]:
+                compacted.extend(lits[offsets[k]:offsets[k + 1]])
+            new_offsets.append(len(compacted))
+        self.lits = compacted
+        self.offsets = new_offsets
+        self.wasted = 0
+
+    def propagate(self):
+        values = self.values
+        base_lits = self.base_lits
+        base_offsets = self.base_offsets
+        base_count = self.base_count
+        watched = self.watched
+        watches = self.watches
+        binaries = self.binaries
+        trail = self.trail
+
+        while self.qhead < len(trail):
+            lit = trail[self.qhead]
+            self.qhead += 1
+            # Code of the literal that just became false.
+            false_code = (lit << 1) | 1 if lit > 0 else -lit << 1
+
+            for other, clause_index in binaries[false_code]:
+                value = values[other]
+                if value < 0:
+                    # The reason is the false literal, inline.
+                    self.assign(decode(other), ~false_code)
+                elif value == 0:
+                    self.qhead = len(trail)
+                    return clause_index
+
+            watchers = watches[false_code]
+            n = len(watchers)
+            i = j = 0
+            while i < n:
+                clause_index = watchers[i]
+                i += 1
+                w = clause_index << 1
+
+                # Keep the falsified watch second.
+                first = watched[w]
+                if first == false_code:
+                    first = watched[w + 1]
+                    watched[w] = first
+                    watched[w + 1] = false_code
+                if values[first] == 1:
+                    watchers[j] = clause_index
+                    j += 1
+                    continue
+
+                if clause_index < base_count:
+                    lits = base_lits
+                    start = base_offsets[clause_index]
+                    end = base_offsets[clause_index + 1]
+                else:
+                    # Read every time: garbage collection replaces them.
+                    lits = self.lits
+                    start = self.offsets[clause_index - base_count]
+                    end = self.offsets[clause_index - base_count + 1]
+                for k in range(start, end):
+                    code = lits[k]
+                    if values[code] != 0 and code != first:
+                        watched[w + 1] = code
+                        watches[code].append(clause_index)
+                        break
+                else:
+                    watchers[j] = clause_index
+                    j += 1
+                    if values[first] == 0:
+                        while i < n:
+                            watchers[j] = watchers[i]
+                            i += 1
+                            j += 1
+                        del watchers[j:]
+                        self.qhead = len(trail)
+                        return clause_index
+                    self.assign(decode(first), clause_index)
+            del watchers[j:]
+        return None
+
+    def verify(self):
+        if len(self.trail) != self.var_count:
+            raise Exception('cannot verify! {} unassigned vars'
+                            .format(self.var_count - len(self.trail)))
+        base_count = self.base_count
+        return (_satisfied(self.values, self.base_lits, self.base_offsets,
+                           self.deleted[:base_count]) and
+                _satisfied(self.values, self.lits, self.offsets,
+                           self.deleted[base_count:]))
+
+
+def main(argv=None):
+    import argparse
+
+    cmdline_parser = argparse.ArgumentParser(
+        prog='satsolver convert',
+        description='Convert a DIMACS file to the binary CNF format, which '
+                    'loads without parsing.')
+    cmdline_parser.add_argument('source',
+                                help='DIMACS file, possibly compressed, or - '
+                                     'for stdin')
+    cmdline_parser.add_argument('destination')
+    cmdline_parser.add_argument('--no-occurrences', action='store_true',
+                                help='leave out the occurrence index')
+    args = cmdline_parser.parse_args(argv)
+
+    var_count, clause_count = convert(args.source, args.destination,
+                                      not args.no_occurrences)
+    sys.stderr.write('{}: {} variables, {} clauses\n'.format(
+        args.destination, var_count, clause_count))
+
+
+if __name__ == '__main__':
+    main()
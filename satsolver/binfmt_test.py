@@ -0,0 +1,126 @@
+import io
+from array import array
+
+import pytest
+
+from satsolver import binfmt
+from satsolver.compact import encode
+from satsolver.parser import write_cnf
+from satsolver.solver import Solver
+from satsolver.solver_test import pigeonhole
+
+
+def convert(tmpdir, var_count, clauses, occurrences=True):
+    source = str(tmpdir.join('problem.cnf'))
+    with io.open(source, 'w') as f:
+        write_cnf(f, var_count, clauses)
+    destination = str(tmpdir.join('problem.cnfb'))
+    binfmt.convert(source, destination, occurrences)
+    return destination
+
+
+def test_round_trip(tmpdir):
+    clauses = [[1, -2], [3], [-1, 2, -3]]
+    path = convert(tmpdir, 3, clauses)
+    assert binfmt.is_binary(path)
+    cnf = binfmt.MappedCNF(path)
+    assert (cnf.var_count, cnf.clause_count) == (3, 3)
+    assert list(cnf.offsets) == [0, 2, 3, 6]
+    assert list(cnf) == clauses
+    assert list(cnf.occurrences(-1)) == [2]
+    assert list(cnf.occurrences(2)) == [2]
+    assert list(cnf.occurrences(-2)) == [0]
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_occurrence_index(monkeypatch, use_numpy):
+    if use_numpy and binfmt.np is None:
+        pytest.skip('numpy is not installed')
+    if not use_numpy:
+        monkeypatch.setattr(binfmt, 'np', None)
+    clauses = [[1, 2], [-1, 2, 3], [2, -3]]
+    lits, offsets = [], [0]
+    for clause in clauses:
+        lits.extend(encode(lit) for lit in clause)
+        offsets.append(len(lits))
+    starts, owners = binfmt.occurrence_index(3, array('i', lits),
+                                             array('i', offsets))
+    code = encode(2)
+    assert list(owners[starts[code]:starts[code + 1]]) == [0, 1, 2]
+    assert len(owners) == len(lits)
+
+
+def test_without_occurrences(tmpdir):
+    cnf = binfmt.MappedCNF(convert(tmpdir, 2, [[1, 2]], occurrences=False))
+    assert cnf.occurrences(1) is None
+    assert list(cnf) == [[1, 2]]
+
+
+@pytest.mark.parametrize('text', [b'', b'p cnf 1 1\n1 0\n', binfmt.MAGIC])
+def test_not_binary(tmpdir, text):
+    path = tmpdir.join('bad.cnfb')
+    path.write(text, 'wb')
+    with pytest.raises(ValueError):
+        binfmt.MappedCNF(str(path))
+
+
+def test_mapped_clauses_are_not_written(tmpdir):
+    clauses = [[1, 2, 3], [-1, 2, 3], [1, -2, 3], [1, 2, -3],
+               [-1, -2, 3], [-1, 2, -3], [1, -2, -3]]
+    inst = binfmt.load(convert(tmpdir, 3, clauses))
+    before = bytes(inst.base_lits)
+    assert Solver(inst).solve().success
+    assert inst.solutions == [{1: 1, 2: 1, 3: 1}]
+    # The mapping is read-only; clauses are reordered only in the view.
+    assert bytes(inst.base_lits) == before
+    assert sorted(map(sorted, inst.clauses)) == sorted(map(sorted, clauses))
+
+
+@pytest.mark.parametrize('holes', [3, 4])
+def test_solver_unsat(tmpdir, holes):
+    var_count, clauses = pigeonhole(holes)
+    inst = binfmt.load(convert(tmpdir, var_count, clauses))
+    assert not Solver(inst, max_learnts=10).solve().success
+
+
+def test_repeated_literals(tmpdir):
+    clauses = [[3, 2, 2], [1, 3, 3], [-3, 4, -1], [-1, 2], [3, -2],
+               [-2, -4, -4], [3, 3, -1]]
+    path = convert(tmpdir, 4, clauses)
+    assert list(binfmt.MappedCNF(path))[-1] == [3, -1]
+    inst = binfmt.load(path)
+    assert Solver(inst).solve().success
+    assert inst.verify()
+
+
+def test_learnt_clauses_and_garbage(tmpdir):
+    inst = binfmt.load(convert(tmpdir, 4, [[1, 2, 3]]))
+    learnt = inst.add_clause([-1, -2, -3, -4], learnt=True)
+    assert learnt == 1
+    assert inst.clauses[learnt] == [-1, -2, -3, -4]
+    inst.delete_clauses([learnt])
+    assert inst.clauses[learnt] is None
+    assert inst.watches[encode(-1)] == []
+    assert len(inst.lits) == 0
+    assert inst.clauses[0] == [1, 2, 3]
+
+
+def test_pickle_maps_again(tmpdir):
+    import pickle
+    inst = binfmt.load(convert(tmpdir, 2, [[1, 2, -1], [-2]]))
+    copy = pickle.loads(pickle.dumps(inst))
+    assert copy.cnf is not inst.cnf
+    assert list(copy.clauses) == list(inst.clauses)
+    assert Solver(copy).solve().success
+
+
+def test_cli_loads_binary(tmpdir, capsys):
+    from satsolver import cli
+    source = str(tmpdir.join('problem.cnf'))
+    with io.open(source, 'w') as f:
+        write_cnf(f, 2, [[1, 2], [-1]])
+    destination = str(tmpdir.join('problem.cnfb'))
+    cli.main(['convert', source, destination])
+    for extra in ([], ['--preprocess']):
+        cli.main([destination, '--competition'] + extra)
+        assert capsys.readouterr().out == 's SATISFIABLE\nv -1 2 0\n'
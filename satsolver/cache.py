@@ -0,0 +1,242 @@
+"""On-disk cache of results, keyed on the clause set.
+
+An instance's key is a hash of its canonical form: literals within each
+clause sorted and deduplicated, clauses sorted and deduplicated, and the
+variables renumbered by a renaming-invariant signature, so the same formula
+hits the cache even if its variables were renamed (as long as the
+signatures tell them apart; ties fall back to the original numbering, which
+only costs a miss). Two formulas with the same canonical form are the same
+formula up to renaming, so a cached UNSAT is always valid for a hit. A
+cached model is translated back to the instance's variables and checked
+with `verify` before it is trusted.
+
+Entries are small JSON files in one directory. Hits refresh an entry's
+modification time, and the least recently used entries are evicted once the
+directory grows past its size bound.
+"""
+import hashlib
+import io
+import json
+import os
+import struct
+import tempfile
+from collections import namedtuple
+
+from satsolver.util import Success, Failure
+
+# Default bound on the cache directory's size.
+DEFAULT_MAX_BYTES = 256 << 20
+
+# Rounds of signature refinement in canonicalize.
+REFINEMENT_ROUNDS = 2
+
+# Size of a variable's signature digest.
+SIGNATURE_BYTES = 16
+
+# digest: hex key of the canonical form; mapping: var -> canonical var.
+Canonical = namedtuple('Canonical', ['digest', 'mapping'])
+
+
+def _normalize(clauses):
+    """Sorted, deduplicated clauses of sorted, deduplicated literals."""
+    normalized = set()
+    for clause in clauses:
+        if clause is not None:
+            normalized.add(tuple(sorted(set(clause))))
+    return sorted(normalized)
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=SIGNATURE_BYTES).digest()
+
+
+def _signatures(var_count, clauses):
+    """Renaming-invariant signature of every variable.
+
+    Starts from (positive, negative) occurrence counts; each round adds the
+    signatures of the variables a variable shares clauses with. Signatures
+    are blake2b digests of a fixed byte encoding, so they (and the canonical
+    order built on them) are the same on every platform and Python version.
+    """
+    counts = [[0, 0] for _ in range(var_count + 1)]
+    for clause in clauses:
+        for lit in clause:
+            counts[abs(lit)][lit < 0] += 1
+    sigs = [_digest(struct.pack('<QQ', *count)) for count in counts]
+    for _ in range(REFINEMENT_ROUNDS):
+        neighbours = [[] for _ in range(var_count + 1)]
+        for clause in clauses:
+            # A polarity byte and a fixed-size signature per literal.
+            clause_sig = _digest(b''.join(sorted(
+                (b'\x01' if lit > 0 else b'\x00') + sigs[abs(lit)]
+                for lit in clause)))
+            for lit in clause:
+                neighbours[abs(lit)].append(
+                    (b'\x01' if lit > 0 else b'\x00') + clause_sig)
+        sigs = [_digest(sigs[var] + b''.join(sorted(neighbours[var])))
+                for var in range(var_count + 1)]
+    return sigs
+
+
+def canonicalize(var_count, clauses):
+    """Key of a formula, and how its variables map to the canonical ones.
+
+    Args:
+        var_count (int):
+        clauses (iterable[list[int]]): None entries (deleted clauses) are
+            skipped.
+
+    Returns:
+        Canonical
+    """
+    clauses = _normalize(clauses)
+    sigs = _signatures(var_count, clauses)
+    order = sorted(range(1, var_count + 1), key=lambda var: (sigs[var], var))
+    mapping = [0] * (var_count + 1)
+    for canonical_var, var in enumerate(order, 1):
+        mapping[var] = canonical_var
+
+    def rename(lit):
+        return mapping[lit] if lit > 0 else -mapping[-lit]
+    canonical = _normalize([rename(lit) for lit in clause]
+                           for clause in clauses)
+
+    digest = hashlib.sha256()
+    digest.update('p cnf {} {}\n'.format(var_count,
+                                         len(canonical)).encode('ascii'))
+    for clause in canonical:
+        digest.update(' '.join(map(str, clause)).encode('ascii'))
+        digest.update(b' 0\n')
+    return Canonical(digest.hexdigest(), mapping)
+
+
+class ResultCache(object):
+    """SAT models and UNSAT answers on local disk, with LRU eviction."""
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            directory (str): created if needed; may be shared by processes.
+            max_bytes (int): evict the least recently used entries beyond
+                this many bytes.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, instance):
+        return canonicalize(instance.var_count, instance.clauses)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key.digest + '.json')
+
+    def lookup(self, key, instance):
+        """Answer an instance from the cache, without solving it.
+
+        A cached model is translated to the instance's variables, verified
+        against its clauses and, like a solver's, added to its solutions.
+
+        Args:
+            key (Canonical): the instance's key.
+            instance (Instance): unsolved, with nothing assigned.
+
+        Returns:
+            Success | Failure | None: None on a miss, or if the cached model
+            does not check out.
+        """
+        path = self._path(key)
+        try:
+            with io.open(path) as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if entry['status'] == 'UNSAT':
+            result = Failure('Unsat!', result=[])
+        else:
+            model = entry['model']
+            lits = [var if model[key.mapping[var] - 1] > 0 else -var
+                    for var in range(1, instance.var_count + 1)]
+            for lit in lits:
+                instance.assign(lit)
+            valid = instance.verify()
+            if valid:
+                instance.save_solution()
+            instance.undo(0)
+            if not valid:
+                return None
+            result = Success()
+        try:
+            # Mark the entry as recently used.
+            os.utime(path, None)
+        except OSError:
+            pass
+        return result
+
+    def store(self, key, result, instance):
+        """Cache the result of solving an instance.
+
+        Only SAT answers (with the instance's last model) and UNSAT answers
+        are stored; UNSAT answers under assumptions must not be.
+        """
+        if result.success:
+            model = instance.solutions[-1]
+            # Canonical literals, ordered by canonical variable.
+            canonical = [0] * instance.var_count
+            for var in range(1, instance.var_count + 1):
+                canonical_var = key.mapping[var]
+                canonical[canonical_var - 1] = (canonical_var if model[var]
+                                                else -canonical_var)
+            entry = {'status': 'SAT', 'model': canonical}
+        elif isinstance(result, Failure):
+            entry = {'status': 'UNSAT'}
+        else:
+            return
+        # Write atomically, so concurrent readers never see half an entry.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with io.open(fd, 'w') as f:
+            f.write(json.dumps(entry, separators=(',', ':')))
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries beyond max_bytes."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+            total += stat.st_size
+        entries.sort()
+        for _, name, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                # Another process evicted it first.
+                pass
+            total -= size
+
+
+def solve_cached(cache, instance, solve):
+    """Look an instance up in a cache, and solve and store it on a miss.
+
+    Args:
+        cache (ResultCache):
+        instance (Instance):
+        solve (callable): solves the instance, returning its result.
+
+    Returns:
+        Success | Failure | Unknown
+    """
+    key = cache.key(instance)
+    result = cache.lookup(key, instance)
+    if result is None:
+        result = solve()
+        cache.store(key, result, instance)
+    return result
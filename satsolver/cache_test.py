@@ -0,0 +1,103 @@
+import json
+import os
+
+from satsolver.cache import ResultCache, canonicalize, solve_cached
+from satsolver.compact import CompactInstance
+from satsolver.solver import Solver
+from satsolver.state import Instance
+from satsolver.util import Unknown
+from satsolver.solver_test import pigeonhole
+
+CLAUSES = [[1, -2], [2, 3, -4], [-1, 4], [3, 4], [-3, -4, 2]]
+
+
+def rename(clauses, perm):
+    return [[perm[abs(lit)] * (1 if lit > 0 else -1) for lit in clause]
+            for clause in clauses]
+
+
+def test_canonical_key():
+    key = canonicalize(4, CLAUSES).digest
+    shuffled = [list(reversed(clause)) for clause in reversed(CLAUSES)]
+    assert canonicalize(4, shuffled + [[1, -2, 1]]).digest == key
+    renamed = rename(CLAUSES, {1: 3, 2: 1, 3: 4, 4: 2})
+    assert canonicalize(4, renamed).digest == key
+    assert canonicalize(5, CLAUSES).digest != key
+    assert canonicalize(4, CLAUSES[1:]).digest != key
+
+
+def test_canonical_key_is_portable():
+    # Pinned: keys must not depend on the platform or Python version.
+    key = canonicalize(4, CLAUSES)
+    assert key.digest == ('73cf912d7776d22525cb523ab564941a'
+                          '09c6b0a1bcac034309ddb6a0ef7357db')
+    assert key.mapping == [0, 3, 4, 2, 1]
+
+
+def never_solve():
+    raise AssertionError('the cache should have answered')
+
+
+def test_sat_hit_on_renamed_instance(tmpdir):
+    cache = ResultCache(str(tmpdir))
+    inst = Instance(4, [list(clause) for clause in CLAUSES])
+    assert solve_cached(cache, inst, Solver(inst).solve).success
+
+    perm = {1: 3, 2: 1, 3: 4, 4: 2}
+    renamed = rename(CLAUSES, perm)
+    inst = CompactInstance(4, renamed)
+    assert solve_cached(cache, inst, never_solve).success
+    model = inst.solutions[-1]
+    assert all(any(model[abs(lit)] == (lit > 0) for lit in clause)
+               for clause in renamed)
+    assert len(inst.trail) == 0
+
+
+def test_bad_model_is_not_trusted(tmpdir):
+    cache = ResultCache(str(tmpdir))
+    inst = Instance(4, [list(clause) for clause in CLAUSES])
+    key = cache.key(inst)
+    assert solve_cached(cache, inst, Solver(inst).solve).success
+    path = os.path.join(str(tmpdir), key.digest + '.json')
+    with open(path, 'w') as f:
+        json.dump({'status': 'SAT', 'model': [-1, -2, -3, -4]}, f)
+    inst = Instance(4, [list(clause) for clause in CLAUSES])
+    assert cache.lookup(key, inst) is None
+    assert inst.solutions == []
+
+
+def test_unsat_and_unknown(tmpdir):
+    cache = ResultCache(str(tmpdir))
+    var_count, clauses = pigeonhole(3)
+    inst = Instance(var_count, clauses)
+    key = cache.key(inst)
+    cache.store(key, Unknown('Time budget exhausted'), inst)
+    assert cache.lookup(key, inst) is None
+    assert not solve_cached(cache, inst, Solver(inst).solve).success
+    inst = Instance(var_count, pigeonhole(3)[1])
+    result = solve_cached(cache, inst, never_solve)
+    assert not result.success and not isinstance(result, Unknown)
+
+
+def test_lru_eviction(tmpdir):
+    cache = ResultCache(str(tmpdir), max_bytes=0)
+    inst = Instance(2, [[1, 2]])
+    key = cache.key(inst)
+    assert solve_cached(cache, inst, Solver(inst).solve).success
+    # Nothing fits in zero bytes.
+    assert os.listdir(str(tmpdir)) == []
+
+    cache.max_bytes = 1 << 20
+    keys = []
+    for var_count in (1, 2, 3):
+        inst = Instance(var_count, [[var_count]])
+        keys.append(cache.key(inst))
+        solve_cached(cache, inst, Solver(inst).solve)
+    paths = [os.path.join(str(tmpdir), key.digest + '.json') for key in keys]
+    for age, path in enumerate(paths):
+        os.utime(path, (age, age))
+    # A hit makes the oldest entry the most recently used.
+    assert cache.lookup(keys[0], Instance(1, [[1]])).success
+    cache.max_bytes = sum(os.path.getsize(path) for path in paths) - 1
+    cache.evict()
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
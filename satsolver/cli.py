@@ -0,0 +1,359 @@
+"""Command line entry point (the `satsolver` console script).
+
+Only argparse is imported up front; every feature module is imported once
+the command line asks for it, so small queries start quickly. For many
+small queries, `--server` answers problem after problem in one process, and
+`satsolver batch` (see satsolver.batch) solves whole directories of files.
+`satsolver convert` (see satsolver.binfmt) writes a formula in a binary
+format that loads without parsing.
+"""
+import sys
+
+
+def build_parser():
+    import argparse
+    from satsolver.restarts import POLICIES
+
+    cmdline_parser = argparse.ArgumentParser(
+        prog='satsolver',
+        epilog='Many files at once: satsolver batch <dir|glob|manifest>; '
+               'see satsolver batch --help. To skip parsing next time: '
+               'satsolver convert <DIMACS file> <binary file>.')
+    cmdline_parser.add_argument('filename', action='store', type=str,
+                                nargs='?', default=None,
+                                help='DIMACS file, possibly compressed, '
+                                     'binary CNF file, or - for stdin')
+    cmdline_parser.add_argument('--server', metavar='SOCKET', nargs='?',
+                                const='-', default=None,
+                                help='answer DIMACS problems one after '
+                                     'another, from stdin or from clients '
+                                     'of the Unix socket SOCKET')
+    cmdline_parser.add_argument('--portfolio', metavar='N', type=int,
+                                default=0,
+                                help='race N differently configured solvers '
+                                     'in parallel processes')
+    cmdline_parser.add_argument('--share-clauses', action='store_true',
+                                help='exchange short learned clauses between '
+                                     'portfolio solvers')
+    cmdline_parser.add_argument('--cubes', metavar='DEPTH', type=int,
+                                default=0,
+                                help='cube-and-conquer: split into up to '
+                                     '2**DEPTH cubes by lookahead and solve '
+                                     'them in parallel')
+    cmdline_parser.add_argument('--workers', metavar='N', type=int,
+                                default=None,
+                                help='local cube-and-conquer workers '
+                                     '(default: one per CPU)')
+    cmdline_parser.add_argument('--listen', metavar='[HOST:]PORT',
+                                default=None,
+                                help='also hand cubes to remote workers '
+                                     '(python -m satsolver.cube HOST:PORT); '
+                                     'on localhost unless HOST is given')
+    cmdline_parser.add_argument('--authkey', default=None,
+                                help='key remote workers must present '
+                                     '(default: $SATSOLVER_AUTHKEY, or a '
+                                     'random key printed to stderr)')
+    cmdline_parser.add_argument('--restarts', choices=sorted(POLICIES),
+                                default='luby',
+                                help='restart policy (default: luby)')
+    cmdline_parser.add_argument('--stats', action='store_true',
+                                help='log progress and print search '
+                                     'statistics as JSON to stderr')
+    cmdline_parser.add_argument('--preprocess', action='store_true',
+                                help='simplify the formula before solving')
+    cmdline_parser.add_argument('--preprocess-budget', metavar='SECONDS',
+                                type=float, default=None,
+                                help='time limit for each preprocessing '
+                                     'technique')
+    cmdline_parser.add_argument('--time-limit', metavar='SECONDS', type=float,
+                                default=None)
+    cmdline_parser.add_argument('--conflict-limit', metavar='N', type=int,
+                                default=None)
+    cmdline_parser.add_argument('--propagation-limit', metavar='N', type=int,
+                                default=None)
+    cmdline_parser.add_argument('--memory-limit', metavar='MB', type=float,
+                                default=None,
+                                help='peak resident memory to give up at')
+    cmdline_parser.add_argument('--all-models', action='store_true',
+                                help='enumerate every model, one per line')
+    cmdline_parser.add_argument('--max-models', metavar='N', type=int,
+                                default=None,
+                                help='stop enumerating after N models')
+    cmdline_parser.add_argument('--project', metavar='VARS', default=None,
+                                help='enumerate models over these '
+                                     'comma-separated variables only')
+    cmdline_parser.add_argument('--proof', metavar='FILE', default=None,
+                                help='write a DRAT proof of UNSAT answers, '
+                                     'compressed if FILE ends in .gz, .bz2 '
+                                     'or .xz')
+    cmdline_parser.add_argument('--proof-format', choices=['binary', 'text'],
+                                default='binary')
+    cmdline_parser.add_argument('--competition', action='store_true',
+                                help='print results in SAT competition '
+                                     'format (s and v lines)')
+    cmdline_parser.add_argument('--output', metavar='FILE', default=None,
+                                help='write the result here instead of '
+                                     'stdout')
+    cmdline_parser.add_argument('--no-verify', action='store_true',
+                                help='do not re-check models against the '
+                                     'clauses')
+    cmdline_parser.add_argument('--cache', metavar='DIR', default=None,
+                                help='reuse results of identical (or '
+                                     'renamed) formulas, cached in DIR')
+    cmdline_parser.add_argument('--cache-size', metavar='MB', type=float,
+                                default=256,
+                                help='evict the least recently used cache '
+                                     'entries beyond this size')
+    cmdline_parser.add_argument('--diagnostics', action='store_true',
+                                help='log search steps and explain '
+                                     'conflicts (slow)')
+    return cmdline_parser
+
+
+def projection(cmdline_parser, args):
+    """--project's variables, or None; malformed lists are usage errors."""
+    if args.project is None:
+        return None
+    try:
+        variables = [int(var) for var in args.project.split(',')]
+    except ValueError:
+        variables = []
+    if not variables or min(variables) < 1:
+        cmdline_parser.error('--project takes comma-separated variables, '
+                             'e.g. 1,2,5')
+    return variables
+
+
+def limits(args):
+    """Solver.solve budgets from the command line."""
+    return dict(max_conflicts=args.conflict_limit,
+                max_time=args.time_limit,
+                max_propagations=args.propagation_limit,
+                max_memory=args.memory_limit)
+
+
+def preprocess_budgets(args):
+    if args.preprocess_budget is None:
+        return None
+    from satsolver.preprocess import DEFAULT_BUDGETS
+    return dict((name, args.preprocess_budget) for name in DEFAULT_BUDGETS)
+
+
+def _write_result(args, result, inst):
+    from satsolver.util import Unknown
+
+    out = sys.stdout if args.output is None else open(args.output, 'w')
+    try:
+        if args.competition:
+            from satsolver.output import write_result
+            model = inst.solutions[-1] if result.success else None
+            write_result(out, result, model)
+        elif result.success:
+            # Print the solutions
+            out.write('Satisfying solutions:\n')
+            for solution in inst.solutions:
+                out.write('{}\n'.format(solution))
+        elif isinstance(result, Unknown):
+            out.write('Unknown: {}\n'.format(result.reason))
+        else:
+            out.write('Unsatisfiable\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def _write_models(args, enumerator, **limits):
+    """Write models as they are found, then how enumeration ended.
+
+    With --competition every model is a block of `v` lines after a single
+    `s SATISFIABLE` line, and the count is a `c` comment.
+    """
+    from satsolver.output import literal_lines, status_line
+    from satsolver.util import Unknown
+
+    out = sys.stdout if args.output is None else open(args.output, 'w')
+    try:
+        for model in enumerator.models(args.max_models, **limits):
+            if args.competition:
+                if enumerator.count == 1:
+                    out.write('s SATISFIABLE\n')
+                out.write(''.join(literal_lines(model)))
+            else:
+                out.write(' '.join(str(lit) for lit in model) + '\n')
+            out.flush()
+        count = '{}{}'.format(enumerator.count,
+                              '' if enumerator.exhausted else '+')
+        if args.competition:
+            if enumerator.count == 0:
+                out.write(status_line(enumerator.result))
+            out.write('c models: {}\n'.format(count))
+        else:
+            out.write('Models: {}\n'.format(count))
+            if isinstance(enumerator.result, Unknown):
+                out.write('Unknown: {}\n'.format(enumerator.result.reason))
+            elif enumerator.count == 0:
+                out.write('Unsatisfiable\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def _log_progress(stats):
+    import logging
+    logging.info('%d conflicts, %d decisions, %d restarts, %.0f props/s',
+                 stats.conflicts, stats.decisions, stats.restarts,
+                 stats.propagations_per_second)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ['batch']:
+        import satsolver.batch as batch
+        batch.main(argv[1:])
+        return
+    if argv[:1] == ['convert']:
+        import satsolver.binfmt as binfmt
+        binfmt.main(argv[1:])
+        return
+
+    cmdline_parser = build_parser()
+    args = cmdline_parser.parse_args(argv)
+    enumerate_models = (args.all_models or args.max_models is not None or
+                        args.project is not None)
+    if (args.server is None) == (args.filename is None):
+        cmdline_parser.error('give either a DIMACS file or --server')
+    if args.server is not None and (enumerate_models or args.cubes or
+                                    args.portfolio or args.proof is not None
+                                    or args.output is not None):
+        cmdline_parser.error('--server answers in competition format with '
+                             'a single solver per problem')
+    if enumerate_models and (args.preprocess or args.cubes or
+                             args.portfolio):
+        cmdline_parser.error('model enumeration only works with a single '
+                             'solver and without preprocessing')
+    if args.cache is not None and (enumerate_models or
+                                   args.proof is not None):
+        cmdline_parser.error('cached answers come without model enumeration '
+                             'or proofs')
+    if args.proof is not None and (enumerate_models or args.preprocess or
+                                   args.cubes or args.portfolio):
+        cmdline_parser.error('proofs are only written by a single solver, '
+                             'without preprocessing or model enumeration')
+    if args.stats and (args.cubes or args.portfolio):
+        cmdline_parser.error('--stats only reports on a single solver')
+    if args.cubes and (args.conflict_limit is not None or
+                       args.propagation_limit is not None or
+                       args.memory_limit is not None):
+        cmdline_parser.error('cube-and-conquer only takes --time-limit; '
+                             'its workers split cubes by conflicts')
+    project = projection(cmdline_parser, args)
+    if args.diagnostics or args.stats:
+        import logging
+        if args.diagnostics:
+            from satsolver.state import Instance
+            logging.basicConfig(level=logging.DEBUG)
+            Instance.diagnostics = True
+        else:
+            logging.basicConfig(level=logging.INFO)
+
+    if args.server is not None:
+        import satsolver.server as server
+        options = dict(restarts=args.restarts, preprocess=args.preprocess,
+                       budgets=preprocess_budgets(args),
+                       verify=not args.no_verify, limits=limits(args))
+        if args.server == '-':
+            server.serve_stream(sys.stdin, sys.stdout, **options)
+        else:
+            server.serve_socket(args.server, **options)
+        return
+
+    from satsolver.loader import load_instance
+    from satsolver.util import Failure, Unknown
+    inst = load_instance(args.filename, args.preprocess,
+                         preprocess_budgets(args))
+    if isinstance(inst, Failure):
+        _write_result(args, inst, None)
+        return
+    if project is not None and max(project) > inst.var_count:
+        cmdline_parser.error('--project: variable {} exceeds the {} declared '
+                             'in the header'.format(max(project),
+                                                    inst.var_count))
+
+    cache = None
+    if args.cache is not None:
+        from satsolver.cache import ResultCache
+        cache = ResultCache(args.cache, int(args.cache_size * (1 << 20)))
+        key = cache.key(inst)
+        result = cache.lookup(key, inst)
+        if result is not None:
+            _write_result(args, result, inst)
+            return
+
+    # The parallel modes build on the solver, so they are imported last.
+    if args.cubes > 0:
+        import satsolver.cube as cube
+        listen = authkey = None
+        if args.listen is not None:
+            listen = cube.parse_address(args.listen)
+            authkey = cube.resolve_authkey(args.authkey)
+            if authkey is None:
+                authkey = cube.generate_authkey()
+                sys.stderr.write('remote workers: python -m satsolver.cube '
+                                 '{}:{} --authkey {}\n'.format(
+                                     listen[0], listen[1],
+                                     authkey.decode('ascii')))
+        # Ctrl-C stops the workers; the search is then undecided.
+        try:
+            result = cube.solve(inst, args.cubes, workers=args.workers,
+                                listen=listen, authkey=authkey,
+                                max_time=args.time_limit)
+        except KeyboardInterrupt:
+            result = Unknown('Interrupted')
+    elif args.portfolio > 0:
+        import satsolver.portfolio as portfolio
+        # Portfolio workers diversify their restart policies themselves.
+        try:
+            result = portfolio.solve(inst, workers=args.portfolio,
+                                     share_clauses=args.share_clauses,
+                                     limits=limits(args))
+        except KeyboardInterrupt:
+            result = Unknown('Interrupted')
+    else:
+        import signal
+        from satsolver.restarts import make_policy
+        from satsolver.solver import Solver
+
+        stats = None
+        if args.stats:
+            from satsolver.stats import SolverStats
+            stats = SolverStats(progress=_log_progress)
+        proof = None
+        if args.proof is not None:
+            from satsolver.proof import open_proof
+            proof = open_proof(args.proof,
+                               binary=args.proof_format == 'binary')
+        solver = Solver(inst, restarts=make_policy(args.restarts),
+                        stats=stats, proof=proof)
+        solver.verify_models = not args.no_verify
+        # Ctrl-C stops the search, which still reports what it has.
+        signal.signal(signal.SIGINT, lambda signum, frame: solver.interrupt())
+        if enumerate_models:
+            from satsolver.allsat import ModelEnumerator
+            enumerator = ModelEnumerator(solver, project)
+            _write_models(args, enumerator, **limits(args))
+        else:
+            result = solver.solve(**limits(args))
+        if proof is not None:
+            proof.close()
+        if stats is not None:
+            import json
+            sys.stderr.write(json.dumps(stats.as_dict(), sort_keys=True) + '\n')
+    if cache is not None:
+        cache.store(key, result, inst)
+    if not enumerate_models:
+        _write_result(args, result, inst)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import io
+import sys
+
+import pytest
+
+from satsolver import cli
+
+
+def write(tmpdir, text):
+    path = tmpdir.join('problem.cnf')
+    path.write(text)
+    return str(path)
+
+
+def test_competition_output(tmpdir, capsys):
+    cli.main([write(tmpdir, 'p cnf 2 2\n1 2 0\n-1 0\n'), '--competition'])
+    assert capsys.readouterr().out == 's SATISFIABLE\nv -1 2 0\n'
+
+
+def test_preprocessing_finds_unsat(tmpdir, capsys):
+    cli.main([write(tmpdir, 'p cnf 1 2\n1 0\n-1 0\n'), '--preprocess'])
+    assert capsys.readouterr().out == 'Unsatisfiable\n'
+
+
+def test_server_on_stdin(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'stdin',
+                        io.StringIO('p cnf 1 1\n1 0\np cnf 1 1\n-1 0\n'))
+    cli.main(['--server'])
+    assert capsys.readouterr().out == ('s SATISFIABLE\nv 1 0\n'
+                                       's SATISFIABLE\nv -1 0\n')
+
+
+@pytest.mark.parametrize('argv', [[], ['x.cnf', '--server'],
+                                  ['--server', '--all-models'],
+                                  ['x.cnf', '--portfolio', '2', '--stats'],
+                                  ['x.cnf', '--cubes', '2',
+                                   '--conflict-limit', '10']])
+def test_bad_arguments(argv):
+    with pytest.raises(SystemExit):
+        cli.main(argv)
+
+
+@pytest.mark.parametrize('extra, expected', [
+    ([], '-1 2\nModels: 1\n'),
+    (['--competition'], 's SATISFIABLE\nv -1 2 0\nc models: 1\n'),
+])
+def test_all_models_to_output(tmpdir, capsys, extra, expected):
+    output = str(tmpdir.join('models.txt'))
+    cli.main([write(tmpdir, 'p cnf 2 2\n1 2 0\n-1 0\n'), '--all-models',
+              '--output', output] + extra)
+    assert capsys.readouterr().out == ''
+    assert tmpdir.join('models.txt').read() == expected
+
+
+@pytest.mark.parametrize('extra, expected', [
+    ([], 'Models: 0\nUnsatisfiable\n'),
+    (['--competition'], 's UNSATISFIABLE\nc models: 0\n'),
+])
+def test_all_models_unsat(tmpdir, capsys, extra, expected):
+    cli.main([write(tmpdir, 'p cnf 1 2\n1 0\n-1 0\n'), '--all-models'] +
+             extra)
+    assert capsys.readouterr().out == expected
+
+
+@pytest.mark.parametrize('project', ['', '1,', 'x', '0', '1,3'])
+def test_bad_projection(tmpdir, capsys, project):
+    with pytest.raises(SystemExit):
+        cli.main([write(tmpdir, 'p cnf 2 1\n1 2 0\n'), '--project', project])
+    assert '--project' in capsys.readouterr().err
+
+
+def test_cache(tmpdir, capsys, monkeypatch):
+    cache = str(tmpdir.join('cache'))
+    problem = write(tmpdir, 'p cnf 2 2\n1 2 0\n-1 0\n')
+    cli.main([problem, '--competition', '--cache', cache])
+    assert len(tmpdir.join('cache').listdir()) == 1
+    import satsolver.solver
+    monkeypatch.setattr(satsolver.solver, 'Solver', None)
+    cli.main([problem, '--competition', '--cache', cache])
+    assert capsys.readouterr().out == 's SATISFIABLE\nv -1 2 0\n' * 2
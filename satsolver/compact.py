@@ -0,0 +1,368 @@
+"""Array-backed alternative to Instance for large formulas.
+
+Literals are encoded as 2 * var + sign (sign is 1 for negated literals), so a
+literal's negation is `code ^ 1` and its variable is `code >> 1`.
+
+Propagation and conflict analysis run in a compiled kernel (_kernel.c) if
+setup.py could build it, and in the Python code here otherwise; both take
+the same steps, so results are identical either way.
+"""
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    # Compiled propagate and first_uip (_kernel.c), if it was built.
+    from satsolver import _kernel
+except ImportError:
+    _kernel = None
+
+from satsolver.state import Instance, ConflictRecord, encode, decode
+
+
+class ClauseView(object):
+    """Read-only sequence of the clauses of a CompactInstance.
+
+    Clauses are decoded into fresh lists of DIMACS literals; deleted clauses
+    read as None.
+    """
+    def __init__(self, instance):
+        self.instance = instance
+
+    def __len__(self):
+        return len(self.instance.deleted)
+
+    def __getitem__(self, clause_index):
+        instance = self.instance
+        if instance.deleted[clause_index]:
+            return None
+        return [decode(code) for code in instance.clause_codes(clause_index)]
+
+    def __iter__(self):
+        for clause_index in range(len(self)):
+            yield self[clause_index]
+
+
+class AssignmentView(object):
+    """Maps variables to 0, 1 or None, like Instance.asgs."""
+    def __init__(self, instance):
+        self.values = instance.values
+
+    def __len__(self):
+        return len(self.values) // 2 - 1
+
+    def __getitem__(self, var):
+        value = self.values[var << 1]
+        return None if value < 0 else value
+
+
+class CompactInstance(Instance):
+    """Instance with all clauses in one flat literal array.
+
+    Clause `i` is `lits[offsets[i]:offsets[i + 1]]`. Learned clauses are
+    appended to the same arrays; deleted ones are dropped from `lits` once
+    enough space is wasted, which keeps clause indices stable.
+
+    Assignments are kept per literal code in `values` (1 true, 0 false, -1
+    unassigned), so checking a literal is a single array lookup.
+
+    Search state (trail, levels, reasons, learnts) and the public
+    resolve/set_lit/verify API behave as in Instance, which it shares most
+    of its search methods with.
+    """
+    def __init__(self, var_count, clauses):
+        """
+        Args:
+            var_count (int):
+            clauses (iterable[list[int]]): consumed one clause at a time.
+        """
+        self.var_count = var_count
+
+        self.lits = array('i')
+        self.offsets = array('i', [0])
+        # deleted[i] is 1 once clause i has been deleted.
+        self.deleted = bytearray()
+        # Number of literals in `lits` that belong to deleted clauses.
+        self.wasted = 0
+
+        self.values = array('b', [-1]) * (2 * (var_count + 1))
+        self.asgs = AssignmentView(self)
+        self.clauses = ClauseView(self)
+
+        self.trail = array('i')
+        self.qhead = 0
+        self.trail_lim = []
+        self.levels = array('i', [0]) * (var_count + 1)
+        self.reasons = [None] * (var_count + 1)
+
+        # Watch lists and binary implication lists (of (other code, clause
+        # index)), indexed by literal code.
+        self.watches = [[] for _ in range(2 * (var_count + 1))]
+        self.binaries = [[] for _ in range(2 * (var_count + 1))]
+        self.units = []
+        self.conflict = ConflictRecord()
+        self.implied = 0
+        self.learnts = []
+
+        for clause in clauses:
+            self.add_clause(clause)
+
+        # Store any valid satisfying assignments here.
+        self.solutions = []
+        self.reconstruction = None
+
+    @classmethod
+    def from_arrays(cls, var_count, lits, offsets):
+        """Build an instance around already flattened clauses.
+
+        The arrays (see BulkCNFParser) are used as they are, not copied.
+        """
+        instance = cls(var_count, [])
+        instance.lits = lits
+        instance.offsets = offsets
+        instance.deleted = bytearray(len(offsets) - 1)
+        for clause_index in range(len(offsets) - 1):
+            instance.watch_clause(clause_index)
+        return instance
+
+    def new_var(self):
+        self.var_count += 1
+        self.values.extend(array('b', [-1, -1]))
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.watches.extend([[], []])
+        self.binaries.extend([[], []])
+        return self.var_count
+
+    def _append(self, clause):
+        self.lits.extend(encode(lit) for lit in clause)
+        self.offsets.append(len(self.lits))
+        self.deleted.append(0)
+        return len(self.offsets) - 2
+
+    def add_clause(self, clause, learnt=False):
+        clause_index = self._append(clause)
+        self.watch_clause(clause_index)
+        if learnt:
+            self.learnts.append(clause_index)
+        return clause_index
+
+    def watch_clause(self, clause_index):
+        start = self.offsets[clause_index]
+        size = self.offsets[clause_index + 1] - start
+        if size < 2:
+            self.units.append(clause_index)
+        elif size == 2:
+            first, second = self.lits[start], self.lits[start + 1]
+            self.binaries[first].append((second, clause_index))
+            self.binaries[second].append((first, clause_index))
+        else:
+            self.watches[self.lits[start]].append(clause_index)
+            self.watches[self.lits[start + 1]].append(clause_index)
+
+    def resolve(self, lit):
+        value = self.values[encode(lit)]
+        return None if value < 0 else value
+
+    def assign(self, lit, reason=None):
+        code = encode(lit)
+        var = code >> 1
+        self.values[code] = 1
+        self.values[code ^ 1] = 0
+        self.levels[var] = len(self.trail_lim)
+        self.reasons[var] = reason
+        self.trail.append(lit)
+
+    def unset_lit(self, lit):
+        self.values[lit << 1] = -1
+        self.values[(lit << 1) | 1] = -1
+
+    def undo(self, trail_len):
+        values = self.values
+        trail = self.trail
+        for i in range(trail_len, len(trail)):
+            code = abs(trail[i]) << 1
+            values[code] = -1
+            values[code | 1] = -1
+        del trail[trail_len:]
+        self.qhead = min(self.qhead, trail_len)
+
+    def clause_codes(self, clause_index):
+        """The literal codes of a clause, deleted or not."""
+        offsets = self.offsets
+        return self.lits[offsets[clause_index]:offsets[clause_index + 1]]
+
+    def watched_codes(self, clause_index):
+        """The two watched literal codes of a clause of two or more."""
+        start = self.offsets[clause_index]
+        return self.lits[start], self.lits[start + 1]
+
+    def is_locked(self, clause_index):
+        code = self.lits[self.offsets[clause_index]]
+        var = code >> 1
+        return self.values[code] == 1 and self.reasons[var] == clause_index
+
+    def delete_clauses(self, clause_indices):
+        deleted = set(clause_indices)
+        if not deleted:
+            return
+        watched = set()
+        binary = set()
+        for clause_index in deleted:
+            size = len(self.clause_codes(clause_index))
+            if size < 2:
+                self.units.remove(clause_index)
+            elif size == 2:
+                binary.update(self.watched_codes(clause_index))
+            else:
+                watched.update(self.watched_codes(clause_index))
+            self.deleted[clause_index] = 1
+            self.wasted += size
+        for code in watched:
+            self.watches[code] = [c for c in self.watches[code]
+                                  if c not in deleted]
+        for code in binary:
+            self.binaries[code] = [(other, c) for other, c in self.binaries[code]
+                                   if c not in deleted]
+        self.learnts = [c for c in self.learnts if c not in deleted]
+        if self.wasted > len(self.lits) // 2:
+            self._collect_garbage()
+
+    def _collect_garbage(self):
+        """Drop the literals of deleted clauses from `lits`."""
+        lits = self.lits
+        offsets = self.offsets
+        deleted = self.deleted
+        compacted = array('i')
+        new_offsets = array('i', [0])
+        for clause_index in range(len(offsets) - 1):
+            if not deleted[clause_index]:
+                compacted.extend(
+                    lits[offsets[clause_index]:offsets[clause_index + 1]])
+            new_offsets.append(len(compacted))
+        self.lits = compacted
+        self.offsets = new_offsets
+        self.wasted = 0
+
+    @property
+    def kernel(self):
+        return _kernel
+
+    def propagate(self):
+        if _kernel is not None:
+            return _kernel.propagate(self)
+        values = self.values
+        lits = self.lits
+        offsets = self.offsets
+        watches = self.watches
+        binaries = self.binaries
+        trail = self.trail
+
+        while self.qhead < len(trail):
+            lit = trail[self.qhead]
+            self.qhead += 1
+            # Code of the literal that just became false.
+            false_code = (lit << 1) | 1 if lit > 0 else -lit << 1
+
+            for other, clause_index in binaries[false_code]:
+                value = values[other]
+                if value < 0:
+                    # The reason is the false literal, inline.
+                    self.assign(decode(other), ~false_code)
+                elif value == 0:
+                    self.qhead = len(trail)
+                    return clause_index
+
+            watchers = watches[false_code]
+            n = len(watchers)
+            i = j = 0
+            while i < n:
+                clause_index = watchers[i]
+                i += 1
+                start = offsets[clause_index]
+
+                # Keep the falsified watch in the clause's second slot.
+                first = lits[start]
+                if first == false_code:
+                    first = lits[start + 1]
+                    lits[start] = first
+                    lits[start + 1] = false_code
+                if values[first] == 1:
+                    watchers[j] = clause_index
+                    j += 1
+                    continue
+
+                for k in range(start + 2, offsets[clause_index + 1]):
+                    code = lits[k]
+                    if values[code] != 0:
+                        lits[start + 1] = code
+                        lits[k] = false_code
+                        watches[code].append(clause_index)
+                        break
+                else:
+                    watchers[j] = clause_index
+                    j += 1
+                    if values[first] == 0:
+                        while i < n:
+                            watchers[j] = watchers[i]
+                            i += 1
+                            j += 1
+                        del watchers[j:]
+                        self.qhead = len(trail)
+                        return clause_index
+                    self.assign(decode(first), clause_index)
+            del watchers[j:]
+        return None
+
+    def verify(self):
+        if len(self.trail) != self.var_count:
+            raise Exception('cannot verify! {} unassigned vars'
+                            .format(self.var_count - len(self.trail)))
+        return _satisfied(self.values, self.lits, self.offsets, self.deleted)
+
+    def save_solution(self):
+        self.add_solution(
+            dict((var, self.asgs[var])
+                 for var in range(1, self.var_count + 1)))
+
+
+def _satisfied(values, lits, offsets, deleted):
+    """Whether every clause not marked deleted has a true literal.
+
+    Args:
+        values (array): as CompactInstance.values.
+        lits, offsets: flattened clauses, as CompactInstance.lits and offsets.
+        deleted (bytes): one flag per clause.
+    """
+    if np is not None:
+        return _satisfied_numpy(values, lits, offsets, deleted)
+    for clause_index in range(len(offsets) - 1):
+        if deleted[clause_index]:
+            continue
+        for k in range(offsets[clause_index], offsets[clause_index + 1]):
+            if values[lits[k]] == 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _satisfied_numpy(values, lits, offsets, deleted):
+    """_satisfied, over all literals at once."""
+    offsets = np.frombuffer(offsets, dtype=np.intc)
+    deleted = np.frombuffer(deleted, dtype=np.uint8).astype(bool)
+    sizes = np.diff(offsets)
+    if np.any((sizes == 0) & ~deleted):
+        # An empty clause.
+        return False
+    if not len(lits):
+        return True
+    codes = np.frombuffer(lits, dtype=np.intc)
+    true_lits = np.frombuffer(values, dtype=np.int8)[codes] == 1
+    # Clauses are contiguous, so each non-empty one is a segment.
+    nonempty = sizes > 0
+    satisfied = np.logical_or.reduceat(true_lits, offsets[:-1][nonempty])
+    return bool(np.all(satisfied | deleted[nonempty]))
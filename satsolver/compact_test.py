@@ -0,0 +1,149 @@
+import pytest
+
+from satsolver.state import Instance
+from satsolver.compact import CompactInstance, encode, decode
+from satsolver.solver import Solver
+from satsolver.solver_test import pigeonhole
+
+
+def test_encode_decode():
+    assert encode(1) == 2
+    assert encode(-1) == 3
+    assert encode(3) ^ 1 == encode(-3)
+    for lit in [1, -1, 7, -7, 123456]:
+        assert decode(encode(lit)) == lit
+
+
+def test_flat_storage():
+    inst = CompactInstance(var_count=3, clauses=[[1, -2], [3], [-1, 2, -3]])
+    assert list(inst.offsets) == [0, 2, 3, 6]
+    assert len(inst.lits) == 6
+    assert len(inst.clauses) == 3
+    assert inst.clauses[2] == [-1, 2, -3]
+    assert inst.units == [1]
+
+
+def test_resolve_and_set_lit():
+    inst = CompactInstance(var_count=2, clauses=[[1, -2]])
+    assert inst.resolve(1) is None
+    assert inst.set_lit(2, 1).success
+    assert inst.resolve(2) == 1
+    assert inst.resolve(-2) == 0
+    assert inst.asgs[2] == 1
+    assert inst.asgs[1] is None
+    assert not inst.set_lit(2, 0).success
+
+
+def test_is_unit():
+    clauses = [[-1, -2, 3, 4]]
+    inst = CompactInstance(var_count=4, clauses=clauses)
+    inst.set_lits([1, 2], 1)
+    inst.set_lit(4, 0)
+    is_unit, implied = inst.is_unit(clauses[0]).result
+    assert is_unit
+    assert implied == 3
+
+
+def test_bcp_cascade():
+    clauses = [[1, 2], [-2, 3], [-3, 4, 5, -6]]
+    inst = CompactInstance(var_count=6, clauses=clauses)
+    inst.set_lit(1, 0)
+    inst.set_lits([4, 5], 0)
+    assert Solver(inst).bcp().success
+    assert inst.asgs[2] == 1
+    assert inst.asgs[3] == 1
+    assert inst.asgs[6] == 0
+
+
+def test_verify():
+    clauses = [[1, -2], [4, 5, -6]]
+    inst = CompactInstance(var_count=6, clauses=clauses)
+    inst.set_lits([1, 4], 1)
+    inst.set_lits([2, 3, 5, 6], 0)
+    assert inst.verify()
+    inst.undo(0)
+    inst.set_lits([2, 4], 1)
+    inst.set_lits([1, 3, 5, 6], 0)
+    assert not inst.verify()
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_verify_skips_deleted_clauses(monkeypatch, use_numpy):
+    import satsolver.compact
+    if use_numpy and satsolver.compact.np is None:
+        pytest.skip('numpy is not installed')
+    if not use_numpy:
+        monkeypatch.setattr(satsolver.compact, 'np', None)
+    inst = CompactInstance(var_count=3, clauses=[[1, 2], [-1, -2], [3]])
+    bad = inst.add_clause([-3, 1], learnt=True)
+    inst.set_lits([1, 3], 1)
+    inst.set_lits([2], 0)
+    assert inst.verify()
+    inst.undo(0)
+    inst.set_lits([3], 1)
+    inst.set_lits([1, 2], 0)
+    assert not inst.verify()
+    inst.delete_clauses([0, bad])
+    assert inst.verify()
+    inst.add_clause([])
+    assert not inst.verify()
+
+
+def test_delete_and_collect_garbage():
+    inst = CompactInstance(var_count=4, clauses=[[1, 2, 3]])
+    learnt = inst.add_clause([-1, -2, -3, -4], learnt=True)
+    inst.delete_clauses([learnt])
+    assert inst.clauses[learnt] is None
+    assert inst.watches[encode(-1)] == []
+    # The deleted clause wasted over half of the literals, so it was dropped.
+    assert len(inst.lits) == 3
+    assert inst.clauses[0] == [1, 2, 3]
+    assert len(inst.clauses) == 2
+
+
+@pytest.mark.parametrize('holes', [3, 4])
+def test_solver_unsat(holes):
+    var_count, clauses = pigeonhole(holes)
+    inst = CompactInstance(var_count=var_count, clauses=clauses)
+    assert not Solver(inst, max_learnts=10).solve().success
+
+
+def test_same_results_as_instance():
+    clauses = [[1, 2, -3], [-1, 3], [2, 4], [-2, -4, 5], [-5, -1], [3, 5, -2]]
+    recipe = [(1, 1), (4, 1)]
+    inst = Instance(var_count=5, clauses=[list(c) for c in clauses])
+    compact = CompactInstance(var_count=5, clauses=clauses)
+    assert Solver(inst, recipe=recipe).solve().success
+    assert Solver(compact, recipe=recipe).solve().success
+    assert compact.solutions == inst.solutions
+
+
+def _search(var_count, clauses):
+    from satsolver.stats import SolverStats
+    inst = CompactInstance(var_count=var_count, clauses=clauses)
+    stats = SolverStats()
+    result = Solver(inst, max_learnts=10, stats=stats).solve()
+    return (result.success, inst.solutions, stats.conflicts, stats.decisions,
+            list(inst.lits))
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_kernel_matches_python(monkeypatch, seed):
+    import satsolver.compact
+    from satsolver.bench import random_3sat
+    if satsolver.compact._kernel is None:
+        pytest.skip('the kernel is not built')
+    problems = [random_3sat(40, seed), pigeonhole(3 + seed % 2)]
+    compiled = [_search(*problem) for problem in problems]
+    monkeypatch.setattr(satsolver.compact, '_kernel', None)
+    assert [_search(*problem) for problem in problems] == compiled
+
+
+def test_python_fallback(monkeypatch):
+    import satsolver.compact
+    monkeypatch.setattr(satsolver.compact, '_kernel', None)
+    inst = CompactInstance(var_count=3, clauses=[[1, 2], [-2, 3]])
+    assert inst.kernel is None
+    test_bcp_cascade()
+    test_solver_unsat(4)
+    test_same_results_as_instance()
@@ -0,0 +1,395 @@
+"""Cube-and-conquer: split an instance into cubes and solve them in parallel.
+
+Lookahead splits the formula into cubes (partial assignments) that together
+cover every assignment. Workers solve the formula under each cube as
+assumptions, keeping one incremental solver per worker so learned clauses
+carry over between cubes. A cube that takes more than its conflict budget is
+handed back and split further. The first SAT cube ends the search; the
+instance is UNSAT once every cube is.
+
+Workers get their cubes through a coordinator's queues. Local workers are
+processes sharing them directly; workers on other hosts connect to the
+coordinator over a socket (see `serve` and `work_remote`). That connection
+exchanges pickles, so it is authenticated with a secret key (see
+`resolve_authkey`), and the coordinator listens on localhost unless it is
+given a host.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import secrets
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from multiprocessing.managers import BaseManager
+
+from satsolver.util import Success, Failure, Unknown
+from satsolver.state import Instance
+from satsolver.solver import Solver
+
+# Only this many of the most frequently occurring variables are looked
+# ahead on.
+LOOKAHEAD_CANDIDATES = 32
+
+# Conflicts a worker spends on a cube before handing it back to be split.
+CUBE_CONFLICTS = 2000
+
+# How many levels a handed back cube is split into.
+RESPLIT_DEPTH = 1
+
+# Environment variable holding the key remote workers authenticate with.
+AUTHKEY_VARIABLE = 'SATSOLVER_AUTHKEY'
+
+# Where the coordinator listens when only a port is given.
+DEFAULT_HOST = '127.0.0.1'
+
+
+def resolve_authkey(authkey=None):
+    """The key shared by a coordinator and its remote workers.
+
+    Args:
+        authkey (str): given on the command line; $SATSOLVER_AUTHKEY is used
+            if it is not.
+
+    Returns:
+        bytes | None: None if neither is set.
+    """
+    if not authkey:
+        authkey = os.environ.get(AUTHKEY_VARIABLE)
+    return authkey.encode('utf-8') if authkey else None
+
+
+def generate_authkey():
+    return secrets.token_hex(16).encode('ascii')
+
+
+def parse_address(address):
+    """(host, port) from 'HOST:PORT', or from 'PORT' for localhost."""
+    host, _, port = address.rpartition(':')
+    return host or DEFAULT_HOST, int(port)
+
+
+class Lookahead(object):
+    """Chooses branching variables by propagating both of their values."""
+    def __init__(self, instance, candidates=LOOKAHEAD_CANDIDATES):
+        """
+        Args:
+            instance (Instance): must not have any decisions yet.
+        """
+        self.instance = instance
+        counts = Counter()
+        for clause in instance.clauses:
+            if clause is not None:
+                counts.update(abs(lit) for lit in clause)
+        self.candidates = [var for var, _ in counts.most_common(candidates)]
+
+    def _probe(self, lit):
+        """Number of assignments implied by `lit`, or None on a conflict."""
+        instance = self.instance
+        instance.new_decision_level()
+        start = len(instance.trail)
+        instance.assign(lit)
+        conflict = instance.propagate()
+        implied = len(instance.trail) - start
+        instance.backtrack(instance.decision_level - 1)
+        return None if conflict is not None else implied
+
+    def choose(self):
+        """Pick the variable whose two branches simplify the formula most.
+
+        Returns:
+            tuple(int, list[int]): (variable, forced)
+            `forced` holds literals whose negation failed to propagate; the
+            variable is None if there is nothing left to branch on, or if a
+            variable failed both ways (forced is then [0]).
+        """
+        asgs = self.instance.asgs
+        best, best_score = None, -1
+        for var in self.candidates:
+            if asgs[var] is not None:
+                continue
+            pos = self._probe(var)
+            neg = self._probe(-var)
+            if pos is None and neg is None:
+                return None, [0]
+            elif pos is None:
+                return None, [-var]
+            elif neg is None:
+                return None, [var]
+            # Favor balanced splits, like march's product heuristic.
+            score = (pos + 1) * (neg + 1)
+            if score > best_score:
+                best, best_score = var, score
+        if best is None:
+            # Every candidate is assigned; branch on anything that is not.
+            for var in range(1, self.instance.var_count + 1):
+                if asgs[var] is None:
+                    return var, []
+        return best, []
+
+    def split(self, cube, depth):
+        """Split a cube into up to 2 ** depth cubes.
+
+        Cubes found UNSAT by propagation are dropped, so an empty list means
+        the cube itself is UNSAT.
+
+        Returns:
+            list[list[int]]: the cubes, each extending `cube`.
+        """
+        instance = self.instance
+        cubes = []
+        # Stack of (cube, remaining depth); every cube is tried from level 0.
+        stack = [(list(cube), depth)]
+        while stack:
+            cube, remaining = stack.pop()
+            instance.backtrack(0)
+            if not self._assume(cube):
+                continue
+            while remaining > 0:
+                var, forced = self.choose()
+                if forced == [0]:
+                    break
+                if forced:
+                    cube.append(forced[0])
+                    if not self._assume(forced):
+                        break
+                    continue
+                if var is None:
+                    # Fully assigned without a conflict.
+                    cubes.append(cube)
+                    break
+                stack.append((cube + [-var], remaining - 1))
+                cube = cube + [var]
+                remaining -= 1
+                if not self._assume([var]):
+                    break
+            else:
+                cubes.append(cube)
+        instance.backtrack(0)
+        return cubes
+
+    def _assume(self, lits):
+        """Decide each literal; False on a conflict."""
+        instance = self.instance
+        for lit in lits:
+            value = instance.resolve(lit)
+            if value == 0:
+                return False
+            elif value is None:
+                instance.new_decision_level()
+                instance.assign(lit)
+                if instance.propagate() is not None:
+                    return False
+        return True
+
+
+def make_cubes(instance, depth):
+    """Split an instance into cubes by lookahead.
+
+    Returns:
+        list[list[int]]: cubes covering every model of the instance; empty if
+        the instance is UNSAT.
+    """
+    if instance.assign_units() is not None or instance.propagate() is not None:
+        return []
+    return Lookahead(instance).split([], depth)
+
+
+def _formula(instance):
+    # Copies, so instances built from them do not reorder the caller's.
+    clauses = [list(clause) for clause in instance.clauses
+               if clause is not None]
+    return instance.var_count, clauses
+
+
+def work(formula, tasks, results, max_conflicts=CUBE_CONFLICTS):
+    """Worker loop: solve cubes from `tasks` until a None task arrives.
+
+    Results are (cube id, status, payload) with status 'sat' (payload is the
+    model), 'unsat' (payload is the final conflict over the cube) or
+    'unknown'.
+    """
+    var_count, clauses = formula
+    instance = Instance(var_count=var_count, clauses=clauses)
+    solver = Solver(instance)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        cube_id, cube = task
+        result = solver.solve(assumptions=cube, max_conflicts=max_conflicts)
+        if result.success:
+            results.put((cube_id, 'sat', instance.solutions[-1]))
+        elif isinstance(result, Unknown):
+            results.put((cube_id, 'unknown', None))
+        else:
+            results.put((cube_id, 'unsat', result.result))
+
+
+def _work_local(formula, tasks, results, max_conflicts):
+    # Ctrl-C goes to the coordinator, which stops every local worker.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(formula, tasks, results, max_conflicts)
+
+
+class CubeManager(BaseManager):
+    pass
+
+
+def serve(address, formula, tasks, results, authkey):
+    """Share the coordinator's queues with remote workers.
+
+    Args:
+        authkey (bytes): workers must present the same key.
+
+    Returns:
+        the manager server, already serving on a background thread.
+    """
+    CubeManager.register('formula', callable=lambda: formula)
+    CubeManager.register('tasks', callable=lambda: tasks)
+    CubeManager.register('results', callable=lambda: results)
+    manager = CubeManager(address=address, authkey=authkey)
+    server = manager.get_server()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def work_remote(address, authkey, max_conflicts=CUBE_CONFLICTS):
+    """Run a worker for a coordinator started by `solve(..., listen=...)`."""
+    CubeManager.register('formula')
+    CubeManager.register('tasks')
+    CubeManager.register('results')
+    manager = CubeManager(address=address, authkey=authkey)
+    manager.connect()
+    try:
+        work(manager.formula()._getvalue(), manager.tasks(),
+             manager.results(), max_conflicts)
+    except (EOFError, IOError):
+        # The coordinator finished (or died) while we waited for a cube.
+        logging.info('coordinator at %s went away', address)
+
+
+def solve(instance, depth, workers=None, listen=None, authkey=None,
+          max_conflicts=CUBE_CONFLICTS, max_time=None):
+    """Solve an instance by cube-and-conquer.
+
+    Args:
+        instance (Instance): only its solutions are changed; lookahead runs
+            on a copy.
+        depth (int): initial lookahead depth, for up to 2 ** depth cubes.
+        workers (int): local worker processes; defaults to the number of
+            CPUs. May be 0 when only remote workers are used.
+        listen (tuple(str, int)): also accept remote workers on this address.
+        authkey (bytes): required with `listen`; see resolve_authkey.
+        max_conflicts (int): per cube, before it is split further.
+        max_time (float): give up after this many seconds, lookahead
+            included.
+
+    Returns:
+        Success | Failure | Unknown
+        On success the model is appended to instance.solutions.
+    """
+    if listen is not None and not authkey:
+        raise ValueError('remote workers need an authkey')
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    deadline = None if max_time is None else time.time() + max_time
+    formula = _formula(instance)
+    # Lookahead assigns and propagates, so it gets its own copy.
+    var_count, clauses = _formula(instance)
+    scratch = Instance(var_count=var_count, clauses=clauses)
+    cubes = make_cubes(scratch, depth)
+    if not cubes:
+        return Failure('Unsat!')
+    lookahead = Lookahead(scratch)
+
+    tasks = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    if listen is not None:
+        # Remote workers reach the same queues through the manager.
+        serve(listen, formula, tasks, results, authkey)
+
+    processes = []
+    for _ in range(workers):
+        process = multiprocessing.Process(
+            target=_work_local,
+            args=(formula, tasks, results, max_conflicts))
+        process.daemon = True
+        process.start()
+        processes.append(process)
+
+    pending = {}
+    next_id = [0]
+
+    def submit(cube):
+        pending[next_id[0]] = cube
+        tasks.put((next_id[0], cube))
+        next_id[0] += 1
+
+    for cube in cubes:
+        submit(cube)
+
+    result = Failure('Unsat!')
+    try:
+        while pending:
+            timeout = None
+            if deadline is not None:
+                timeout = max(deadline - time.time(), 0)
+            try:
+                cube_id, status, payload = results.get(timeout=timeout)
+            except queue.Empty:
+                result = Unknown('Time budget exhausted')
+                break
+            cube = pending.pop(cube_id, None)
+            if cube is None:
+                # Already known to be UNSAT.
+                continue
+            if status == 'sat':
+                instance.add_solution(payload)
+                result = Success()
+                break
+            elif status == 'unknown':
+                logging.debug('splitting cube %s', cube)
+                for sub_cube in lookahead.split(cube, RESPLIT_DEPTH):
+                    submit(sub_cube)
+            else:
+                # Every pending cube containing the final conflict's
+                # assumptions is UNSAT as well.
+                core = set(-lit for lit in payload)
+                for other_id, other in list(pending.items()):
+                    if core.issubset(other):
+                        del pending[other_id]
+    finally:
+        for _ in processes:
+            tasks.put(None)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+    return result
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(
+        description='Cube-and-conquer worker for a remote coordinator')
+    cmdline_parser.add_argument('address', help='coordinator HOST:PORT')
+    cmdline_parser.add_argument('--authkey', default=None,
+                                help='the key the coordinator printed or was '
+                                     'given; defaults to $' + AUTHKEY_VARIABLE)
+    args = cmdline_parser.parse_args()
+
+    authkey = resolve_authkey(args.authkey)
+    if authkey is None:
+        cmdline_parser.error('give the coordinator\'s key with --authkey or '
+                             '$' + AUTHKEY_VARIABLE)
+    work_remote(parse_address(args.address), authkey)
+
+if __name__ == '__main__':
+    main()
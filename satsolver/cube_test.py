@@ -0,0 +1,85 @@
+import itertools
+
+import pytest
+
+from satsolver.state import Instance
+from satsolver.util import Unknown
+from satsolver.cube import Lookahead, make_cubes, solve
+from satsolver.solver_test import pigeonhole
+
+
+def models(var_count, clauses):
+    for bits in itertools.product([0, 1], repeat=var_count):
+        if all(any(bits[abs(lit) - 1] == (lit > 0) for lit in clause)
+               for clause in clauses):
+            yield bits
+
+
+def test_cubes_cover_every_model():
+    clauses = [[1, 2, 3], [-1, 4], [-2, -4, 5], [3, -5, 6], [-6, -1, 2]]
+    inst = Instance(var_count=6, clauses=[list(c) for c in clauses])
+    cubes = make_cubes(inst, 3)
+    assert 1 < len(cubes) <= 8
+    assert inst.decision_level == 0
+    for bits in models(6, clauses):
+        matching = [cube for cube in cubes
+                    if all(bits[abs(lit) - 1] == (lit > 0) for lit in cube)]
+        assert len(matching) == 1
+
+
+def test_lookahead_forces_failed_literal():
+    # 1 = 1 leads to a conflict, so lookahead forces 1 = 0.
+    clauses = [[-1, 2], [-1, -2], [1, 3, 4]]
+    inst = Instance(var_count=4, clauses=clauses)
+    var, forced = Lookahead(inst).choose()
+    assert forced == [-1]
+
+
+def test_make_cubes_unsat():
+    clauses = [[1, 2], [1, -2], [-1, 2], [-1, -2]]
+    inst = Instance(var_count=2, clauses=clauses)
+    assert make_cubes(inst, 2) == []
+
+
+def test_solve_sat():
+    clauses = [[1, 2, 3], [-1, -2], [-2, -3], [-1, -3], [2, 3], [4, 5]]
+    inst = Instance(var_count=5, clauses=clauses)
+    assert solve(inst, 2, workers=2).success
+    # Lookahead ran on a copy.
+    assert len(inst.trail) == 0
+    solution = inst.solutions[-1]
+    assert solution[1] == 0
+    assert solution[2] != solution[3]
+
+
+def test_solve_unsat_with_resplitting():
+    var_count, clauses = pigeonhole(5)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    # A tiny budget makes workers hand back cubes to be split further.
+    assert not solve(inst, 1, workers=2, max_conflicts=5).success
+
+
+def test_solve_time_budget():
+    var_count, clauses = pigeonhole(8)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    result = solve(inst, 1, workers=1, max_time=0.5)
+    assert isinstance(result, Unknown)
+    assert result.reason == 'Time budget exhausted'
+
+
+def test_authkey(monkeypatch):
+    from satsolver.cube import resolve_authkey
+    monkeypatch.delenv('SATSOLVER_AUTHKEY', raising=False)
+    assert resolve_authkey() is None
+    monkeypatch.setenv('SATSOLVER_AUTHKEY', 'secret')
+    assert resolve_authkey() == b'secret'
+    assert resolve_authkey('given') == b'given'
+    with pytest.raises(ValueError):
+        solve(Instance(var_count=1, clauses=[[1]]), 1, workers=0,
+              listen=('127.0.0.1', 0))
+
+
+def test_parse_address():
+    from satsolver.cube import parse_address
+    assert parse_address('5000') == ('127.0.0.1', 5000)
+    assert parse_address('0.0.0.0:5000') == ('0.0.0.0', 5000)
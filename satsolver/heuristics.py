@@ -0,0 +1,246 @@
+"""Decision heuristics for Solver.
+
+A heuristic picks the next decision and is told about the solver's progress
+through a few hooks: `bump` for every variable involved in a conflict,
+`decay` once per conflict, and `unassigned` for every variable unassigned by
+a backtrack. Variables added to the instance later are announced through
+`new_var`. On a restart, `restart_level` says how many decision levels can
+be kept.
+"""
+import random
+
+
+class Heuristic(object):
+    """Base decision heuristic; the hooks do nothing by default."""
+    def __init__(self, instance):
+        self.instance = instance
+
+    def next_decision(self):
+        """Choose the next variable to assign.
+
+        Returns:
+            tuple(variable, value) | None if every variable is assigned.
+        """
+        raise NotImplementedError
+
+    def bump(self, var):
+        pass
+
+    def decay(self):
+        pass
+
+    def unassigned(self, var, value):
+        pass
+
+    def new_var(self, var):
+        pass
+
+    def restart_level(self):
+        """Decision level to restart to; 0 by default."""
+        return 0
+
+
+class ActivityHeap(object):
+    """Binary max-heap of variables ordered by their activity.
+
+    Positions are tracked per variable so a bumped variable can be moved up
+    in O(log n).
+    """
+    def __init__(self, activity):
+        # list[float] indexed by variable; owned by the caller.
+        self.activity = activity
+        self.heap = []
+        # maps var -> position in heap
+        self.indices = {}
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, var):
+        return var in self.indices
+
+    def push(self, var):
+        self.heap.append(var)
+        self.indices[var] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def pop(self):
+        heap = self.heap
+        top = heap[0]
+        last = heap.pop()
+        del self.indices[top]
+        if heap:
+            heap[0] = last
+            self.indices[last] = 0
+            self._sift_down(0)
+        return top
+
+    def increase(self, var):
+        """Restore the heap order after the activity of `var` grew."""
+        self._sift_up(self.indices[var])
+
+    def _sift_up(self, i):
+        heap = self.heap
+        indices = self.indices
+        activity = self.activity
+        var = heap[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if activity[heap[parent]] >= activity[var]:
+                break
+            heap[i] = heap[parent]
+            indices[heap[i]] = i
+            i = parent
+        heap[i] = var
+        indices[var] = i
+
+    def _sift_down(self, i):
+        heap = self.heap
+        indices = self.indices
+        activity = self.activity
+        var = heap[i]
+        n = len(heap)
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if (child + 1 < n and
+                    activity[heap[child + 1]] > activity[heap[child]]):
+                child += 1
+            if activity[heap[child]] <= activity[var]:
+                break
+            heap[i] = heap[child]
+            indices[heap[i]] = i
+            i = child
+        heap[i] = var
+        indices[var] = i
+
+
+class VSIDS(Heuristic):
+    """Exponential VSIDS with phase saving.
+
+    Variables involved in conflicts have their activity bumped by an amount
+    that grows after every conflict, so older bumps decay relative to recent
+    ones. The most active unassigned variable is decided next, with the value
+    it last had.
+    """
+    def __init__(self, instance, decay=0.95, initial_phase=1, seed=None):
+        """
+        Args:
+            decay (float): activity decay per conflict; lower values focus
+                on more recent conflicts.
+            initial_phase (int): value to decide variables with at first.
+            seed (int): if given, the initial order of the variables is
+                shuffled with it, to diversify otherwise identical solvers.
+        """
+        super(VSIDS, self).__init__(instance)
+        self.var_decay = decay
+        self.var_inc = 1.0
+        self.initial_phase = initial_phase
+
+        # Indexed by variable; SAT variables are 1-indexed.
+        self.activity = [0.0] * (instance.var_count + 1)
+        self.phases = [initial_phase] * (instance.var_count + 1)
+        if seed is not None:
+            # Small enough to be overtaken by the first bump.
+            rng = random.Random(seed)
+            for var in range(1, instance.var_count + 1):
+                self.activity[var] = rng.random() * 1e-5
+
+        self.heap = ActivityHeap(self.activity)
+        for var in range(1, instance.var_count + 1):
+            if instance.asgs[var] is None:
+                self.heap.push(var)
+
+    def next_decision(self):
+        asgs = self.instance.asgs
+        heap = self.heap
+        # Assigned variables are only dropped from the heap lazily.
+        while len(heap) > 0:
+            var = heap.pop()
+            if asgs[var] is None:
+                return var, self.phases[var]
+        return None
+
+    def bump(self, var):
+        activity = self.activity
+        activity[var] += self.var_inc
+        if activity[var] > 1e100:
+            for i in range(len(activity)):
+                activity[i] *= 1e-100
+            self.var_inc *= 1e-100
+        if var in self.heap:
+            self.heap.increase(var)
+
+    def decay(self):
+        self.var_inc /= self.var_decay
+
+    def unassigned(self, var, value):
+        self.phases[var] = value
+        if var not in self.heap:
+            self.heap.push(var)
+
+    def new_var(self, var):
+        self.activity.append(0.0)
+        self.phases.append(self.initial_phase)
+        self.heap.push(var)
+
+    def restart_level(self):
+        # Decisions more active than the next one would just be made again,
+        # with the same phases, so keep their levels.
+        instance = self.instance
+        asgs = instance.asgs
+        heap = self.heap
+        while len(heap) > 0 and asgs[heap.heap[0]] is not None:
+            heap.pop()
+        if len(heap) == 0:
+            return instance.decision_level
+        activity = self.activity
+        next_activity = activity[heap.heap[0]]
+        trail = instance.trail
+        for level, start in enumerate(instance.trail_lim):
+            if (start >= len(trail) or
+                    activity[abs(trail[start])] < next_activity):
+                return level
+        return instance.decision_level
+
+
+class Recipe(Heuristic):
+    """Follow a fixed list of decisions, then defer to another heuristic.
+
+    Entries whose variable is already assigned are skipped.
+    """
+    def __init__(self, instance, recipe, fallback):
+        """
+        Args:
+            recipe (list[tuple(variable, value)]):
+            fallback (Heuristic): used once the recipe runs out.
+        """
+        super(Recipe, self).__init__(instance)
+        self.recipe = recipe
+        self.recipe_index = 0
+        self.fallback = fallback
+
+    def next_decision(self):
+        asgs = self.instance.asgs
+        while self.recipe_index < len(self.recipe):
+            var, value = self.recipe[self.recipe_index]
+            self.recipe_index += 1
+            if asgs[var] is None:
+                return var, value
+        return self.fallback.next_decision()
+
+    def bump(self, var):
+        self.fallback.bump(var)
+
+    def decay(self):
+        self.fallback.decay()
+
+    def unassigned(self, var, value):
+        self.fallback.unassigned(var, value)
+
+    def new_var(self, var):
+        self.fallback.new_var(var)
+
+    def restart_level(self):
+        return self.fallback.restart_level()
@@ -0,0 +1,65 @@
+from satsolver.state import Instance
+from satsolver.heuristics import ActivityHeap, VSIDS, Recipe
+
+
+def test_heap_pops_most_active():
+    activity = [0.0, 3.0, 1.0, 5.0, 2.0]
+    heap = ActivityHeap(activity)
+    for var in range(1, 5):
+        heap.push(var)
+    assert [heap.pop() for _ in range(4)] == [3, 1, 4, 2]
+    assert len(heap) == 0
+
+
+def test_heap_increase():
+    activity = [0.0, 3.0, 1.0, 5.0]
+    heap = ActivityHeap(activity)
+    for var in range(1, 4):
+        heap.push(var)
+    activity[2] = 10.0
+    heap.increase(2)
+    assert heap.pop() == 2
+    assert 2 not in heap
+    assert 3 in heap
+
+
+def test_vsids_picks_bumped_var():
+    inst = Instance(var_count=3, clauses=[[1, 2, 3]])
+    vsids = VSIDS(inst)
+    vsids.bump(2)
+    vsids.decay()
+    vsids.bump(3)
+    # Later bumps weigh more.
+    assert vsids.next_decision() == (3, 1)
+    assert vsids.next_decision() == (2, 1)
+
+
+def test_vsids_skips_assigned():
+    inst = Instance(var_count=2, clauses=[[1, 2]])
+    vsids = VSIDS(inst)
+    vsids.bump(1)
+    inst.set_lit(1, 1)
+    assert vsids.next_decision() == (2, 1)
+    inst.set_lit(2, 1)
+    assert vsids.next_decision() is None
+
+
+def test_vsids_phase_saving():
+    inst = Instance(var_count=2, clauses=[[1, 2]])
+    vsids = VSIDS(inst)
+    vsids.bump(2)
+    assert vsids.next_decision() == (2, 1)
+    inst.set_lit(2, 0)
+    inst.undo(0)
+    vsids.unassigned(2, 0)
+    assert vsids.next_decision() == (2, 0)
+
+
+def test_recipe_then_fallback():
+    inst = Instance(var_count=3, clauses=[[1, 2, 3]])
+    recipe = Recipe(inst, [(2, 0), (1, 1)], VSIDS(inst))
+    assert recipe.next_decision() == (2, 0)
+    inst.set_lit(1, 1)
+    # The recipe entry for 1 is skipped, since 1 is already assigned.
+    recipe.bump(3)
+    assert recipe.next_decision() == (3, 1)
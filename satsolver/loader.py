@@ -0,0 +1,50 @@
+"""Loading formulas from files, for the command line and library code.
+
+Text DIMACS files are bulk-parsed, compressed files and stdin are streamed,
+and binary CNF files (see satsolver.binfmt) are memory-mapped.
+"""
+import satsolver.binfmt as binfmt
+import satsolver.parser as parser
+from satsolver.compact import CompactInstance
+
+
+def load_instance(filename, preprocess=False, budgets=None):
+    """Parse (and maybe preprocess) a DIMACS file.
+
+    Binary CNF files (see satsolver.binfmt) are mapped instead of parsed.
+
+    Args:
+        filename (str): possibly compressed, a binary CNF file, or '-' for
+            stdin.
+        preprocess (bool):
+        budgets (dict[str, float]): preprocessing budgets.
+
+    Returns:
+        CompactInstance | Failure: Failure if preprocessing found it UNSAT.
+    """
+    binary = filename != '-' and binfmt.is_binary(filename)
+    if preprocess:
+        from satsolver.preprocess import Preprocessor
+        if binary:
+            stream = binfmt.MappedCNF(filename)
+        else:
+            # Preprocess while the stream is being read.
+            stream = parser.CNFStream(parser.open_cnf(filename))
+        preprocessor = Preprocessor(stream.var_count, stream, budgets)
+        result = preprocessor.run()
+        if not result.success:
+            return result
+        inst = CompactInstance(var_count=preprocessor.var_count,
+                               clauses=preprocessor.remaining_clauses())
+        inst.reconstruction = preprocessor.extend
+    elif binary:
+        inst = binfmt.load(filename)
+    elif filename == '-' or parser.is_compressed(filename):
+        # Build the instance while the stream is being read.
+        stream = parser.CNFStream(parser.open_cnf(filename))
+        inst = CompactInstance(var_count=stream.var_count, clauses=stream)
+    else:
+        file_parser = parser.BulkCNFFileParser(filename)
+        inst = CompactInstance.from_arrays(
+            file_parser.var_count, file_parser.lits, file_parser.offsets)
+    return inst
@@ -0,0 +1,32 @@
+import gzip
+import io
+
+from satsolver import binfmt
+from satsolver.loader import load_instance
+from satsolver.parser import write_cnf
+from satsolver.util import Failure
+
+CLAUSES = [[1, -2], [2, 3], [-1, -3]]
+
+
+def test_formats_load_alike(tmpdir):
+    text = str(tmpdir.join('problem.cnf'))
+    with io.open(text, 'w') as f:
+        write_cnf(f, 3, CLAUSES)
+    compressed = str(tmpdir.join('problem.cnf.gz'))
+    with io.open(text, 'rb') as f, gzip.open(compressed, 'wb') as g:
+        g.write(f.read())
+    binary = str(tmpdir.join('problem.cnfb'))
+    binfmt.convert(text, binary)
+    expected = sorted(map(sorted, CLAUSES))
+    for path in (text, compressed, binary):
+        inst = load_instance(path)
+        assert inst.var_count == 3
+        assert sorted(map(sorted, inst.clauses)) == expected
+
+
+def test_preprocessing_finds_unsat(tmpdir):
+    path = str(tmpdir.join('problem.cnf'))
+    with io.open(path, 'w') as f:
+        write_cnf(f, 1, [[1], [-1]])
+    assert isinstance(load_instance(path, preprocess=True), Failure)
@@ -0,0 +1,67 @@
+"""SAT competition output.
+
+    s SATISFIABLE
+    v 1 -2 3 ... 0
+
+or `s UNSATISFIABLE` / `s UNKNOWN`. Models are formatted in bulk and
+written in a few large writes, so printing big models stays cheap.
+"""
+from satsolver.util import Unknown
+
+# Literals per `v` line.
+VALUES_PER_LINE = 16
+
+# Characters of `v` lines collected before each write.
+WRITE_SIZE = 1 << 16
+
+
+def status_line(result):
+    if isinstance(result, Unknown):
+        return 's UNKNOWN\n'
+    elif result.success:
+        return 's SATISFIABLE\n'
+    return 's UNSATISFIABLE\n'
+
+
+def model_lines(model, values_per_line=VALUES_PER_LINE):
+    """`v` lines for a model, ending with the terminating 0.
+
+    Args:
+        model (dict[int, int]): maps var -> 0 or 1.
+
+    Yields:
+        str: one line at a time.
+    """
+    return literal_lines([var if model[var] else -var for var in sorted(model)],
+                         values_per_line)
+
+
+def literal_lines(lits, values_per_line=VALUES_PER_LINE):
+    """`v` lines for a list of true literals, ending with the terminating 0."""
+    lits = [str(lit) for lit in lits]
+    lits.append('0')
+    for start in range(0, len(lits), values_per_line):
+        yield 'v ' + ' '.join(lits[start:start + values_per_line]) + '\n'
+
+
+def write_result(file_object, result, model=None):
+    """Write a result in competition format.
+
+    Args:
+        file_object: a text file, e.g. sys.stdout.
+        result (Success | Failure | Unknown):
+        model (dict[int, int]): printed for a SAT result.
+    """
+    file_object.write(status_line(result))
+    if not result.success or model is None:
+        return
+    chunk = []
+    size = 0
+    for line in model_lines(model):
+        chunk.append(line)
+        size += len(line)
+        if size >= WRITE_SIZE:
+            file_object.write(''.join(chunk))
+            chunk = []
+            size = 0
+    file_object.write(''.join(chunk))
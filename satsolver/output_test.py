@@ -0,0 +1,28 @@
+from io import StringIO
+
+from satsolver.util import Success, Failure, Unknown
+from satsolver import output
+from satsolver.output import model_lines, write_result
+
+
+def test_model_lines():
+    model = dict((var, var % 2) for var in range(1, 21))
+    lines = list(model_lines(model, values_per_line=8))
+    assert lines[0] == 'v 1 -2 3 -4 5 -6 7 -8\n'
+    assert lines[-1] == 'v 17 -18 19 -20 0\n'
+    assert len(lines) == 3
+
+
+def test_write_result(monkeypatch):
+    monkeypatch.setattr(output, 'WRITE_SIZE', 8)
+    out = StringIO()
+    write_result(out, Success(), {1: 1, 2: 0})
+    assert out.getvalue() == 's SATISFIABLE\nv 1 -2 0\n'
+
+    out = StringIO()
+    write_result(out, Failure('Unsat!'))
+    assert out.getvalue() == 's UNSATISFIABLE\n'
+
+    out = StringIO()
+    write_result(out, Unknown('Time budget exhausted'))
+    assert out.getvalue() == 's UNKNOWN\n'
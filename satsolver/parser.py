@@ -1,24 +1,133 @@
-from __future__ import print_function, absolute_import
+import bz2
+import io
+import mmap
+import sys
+import zlib
+from array import array
 
-import re
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
-class CNFParser(object):
-    """Stream parser for DIMACS format"""
+# Leading bytes of the compressed formats open_cnf understands.
+GZIP_MAGIC = b'\x1f\x8b'
+BZIP2_MAGIC = b'BZh'
+XZ_MAGIC = b'\xfd7zXZ\x00'
 
-    def __init__(self, file_object):
-        self.file_object = file_object
-        self.var_count = 0
-        self.clauses = []
+# Bytes of compressed input decompressed per step when streaming.
+STREAM_CHUNK_SIZE = 1 << 16
 
-        self.remove_doubles = re.compile(r'\s\s+')
 
-        self._parse()
+def _magic(file_object):
+    """The first bytes of a stream, without consuming them."""
+    if hasattr(file_object, 'peek'):
+        return file_object.peek(len(XZ_MAGIC))[:len(XZ_MAGIC)]
+    position = file_object.tell()
+    magic = file_object.read(len(XZ_MAGIC))
+    file_object.seek(position)
+    return magic
 
-    def _parse(self):
+
+def _decompressor(magic):
+    """A decompressor object for the stream starting with `magic`, if any."""
+    if not isinstance(magic, bytes):
+        # A text stream.
+        return None
+    if magic.startswith(GZIP_MAGIC):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif magic.startswith(BZIP2_MAGIC):
+        return bz2.BZ2Decompressor()
+    elif magic.startswith(XZ_MAGIC):
+        try:
+            import lzma
+        except ImportError:
+            raise ValueError('Reading xz streams requires the lzma module')
+        return lzma.LZMADecompressor()
+    return None
+
+
+def _decompressed_lines(file_object, decompressor):
+    rest = b''
+    while True:
+        chunk = file_object.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        lines = (rest + decompressor.decompress(chunk)).split(b'\n')
+        rest = lines.pop()
+        for line in lines:
+            yield line
+    if rest:
+        yield rest
+
+
+def open_cnf(source):
+    """Open a DIMACS stream for reading line by line.
+
+    gzip, bzip2 and xz compressed input is recognized by its leading bytes
+    and decompressed on the fly.
+
+    Args:
+        source (str | file): a filename, '-' for stdin, or a binary file
+            object.
+
+    Returns:
+        iterable of lines (bytes)
+    """
+    if source == '-':
+        stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+        # Wrap stdin so its first bytes can be peeked at.
+        file_object = io.open(stdin.fileno(), 'rb', closefd=False)
+    elif isinstance(source, str):
+        file_object = io.open(source, 'rb')
+    else:
+        file_object = source
+
+    decompressor = _decompressor(_magic(file_object))
+    if decompressor is None:
+        return file_object
+    return _decompressed_lines(file_object, decompressor)
+
+
+def is_compressed(filename):
+    with io.open(filename, 'rb') as f:
+        return _decompressor(_magic(f)) is not None
+
+
+# First characters of comment lines, and of the '%' line that ends the
+# formula in some benchmarks; as str and bytes.
+COMMENT_STARTS = ('c', '#', b'c', b'#')
+END_STARTS = ('%', b'%')
+
+
+def _to_str(line):
+    if isinstance(line, bytes):
+        return line.decode('ascii', 'replace')
+    return line
+
+
+class CNFStream(object):
+    """Clause-at-a-time DIMACS reader.
+
+    Construction only reads up to the header, so `var_count` is known before
+    any clause is. Iterating then yields each clause as a list of literals
+    once its terminating 0 is read, holding no more than the clause itself.
+    Clauses may span lines.
+    """
+
+    def __init__(self, lines):
+        """
+        Args:
+            lines (iterable): lines of DIMACS text, as bytes or str (e.g. a
+                file object or open_cnf's result).
+        """
+        self.lines = iter(lines)
+        self.var_count = 0
+        self.clause_count = 0
 
         # find the header
-        line_number, header = self._find_header()
+        self.line_number, header = self._find_header()
         elms = header.split()
         if len(elms) != 4:
             raise ValueError('Unrecognized cnf header: "{}"'.format(header))
@@ -27,58 +136,272 @@ class CNFParser(object):
         self.var_count = int(var_count)
         self.clause_count = int(clause_count)
 
-        for i, line in enumerate(self.file_object):
-            self._parse_line(line_number + i, line)
-
     def _warn(self, msg):
         print('Warning: {}'.format(msg))
 
     def _find_header(self):
-        for line_number, line in enumerate(self.file_object):
-            line = line.strip()
-            if line[0] == 'p':
+        for line_number, line in enumerate(self.lines):
+            line = _to_str(line).strip()
+            if line[:1] == 'p':
                 return line_number, line
-            elif line[0] == 'c' or line == '':
+            elif line[:1] in ('c', '#', ''):
                 continue
             else:
                 raise Exception('Unexpected header on line {}: "{}"'
                                 .format(line_number, line))
+        raise ValueError('No cnf header found')
+
+    def __iter__(self):
+        clause = []
+        for line_number, line in enumerate(self.lines, self.line_number + 1):
+            elms = line.split()
+            if not elms:
+                continue
+            # Be flexible with comments (since some benchmarks use either)
+            first = elms[0][:1]
+            if first in COMMENT_STARTS:
+                continue
+            elif first in END_STARTS:
+                break
 
-    def _parse_line(self, line_number, line):
+            for token in elms:
+                try:
+                    literal = int(token)
+                except ValueError:
+                    self._warn('Error in line #{} -- could not parse "{}"'
+                               .format(line_number, _to_str(token)))
+                    continue
+
+                if literal == 0:
+                    # An empty clause (a lone 0) makes the formula UNSAT.
+                    yield clause
+                    clause = []
+                else:
+                    clause.append(literal)
+
+        if clause:
+            yield clause
 
-        line = line.strip()
-        if len(line) == 0:
-            return
 
-        # Be flexible with comments (since some benchmarks use either)
-        if line[0] in '#c':
+def iter_clauses(source):
+    """Yield the clauses of a DIMACS stream one at a time.
+
+    Args:
+        source (str | file): see open_cnf; a file named here is closed once
+            the clauses run out (or the generator is closed).
+    """
+    if isinstance(source, str) and source != '-':
+        with io.open(source, 'rb') as f:
+            for clause in CNFStream(open_cnf(f)):
+                yield clause
+    else:
+        for clause in CNFStream(open_cnf(source)):
+            yield clause
+
+
+class CNFParser(object):
+    """Parse a whole DIMACS stream into a list of clauses"""
+
+    def __init__(self, file_object):
+        self.file_object = file_object
+        stream = CNFStream(file_object)
+        self.var_count = stream.var_count
+        self.clause_count = stream.clause_count
+        self.clauses = list(stream)
+
+
+class CNFFileParser(CNFParser):
+    """Parse DIMACS files, which may be compressed"""
+    def __init__(self, filename):
+        self.filename = filename
+        with io.open(filename, 'rb') as f:
+            super(CNFFileParser, self).__init__(open_cnf(f))
+
+
+def write_cnf(file_object, var_count, clauses, comments=()):
+    """Write clauses in DIMACS format to a text file object.
+
+    Args:
+        var_count (int):
+        clauses (list[list[int]]):
+        comments (iterable[str]): written as comment lines before the header.
+    """
+    for comment in comments:
+        file_object.write('c {}\n'.format(comment))
+    file_object.write('p cnf {} {}\n'.format(var_count, len(clauses)))
+    for clause in clauses:
+        file_object.write(' '.join(str(lit) for lit in clause) + ' 0\n')
+
+
+# Bytes read per step by BulkCNFParser.
+CHUNK_SIZE = 1 << 22
+
+# Anything outside these in the clause section is a parse error.
+CLAUSE_CHARS = b'0123456789- \t\r\n'
+
+
+def _extend(int_array, values):
+    """Append a NumPy array to an array('i') without boxing every item."""
+    int_array.frombytes(values.astype(np.int32).tobytes())
+
+
+class BulkCNFParser(object):
+    """Whole-buffer DIMACS parser emitting flattened clauses.
+
+    The input is read in large chunks and every chunk is tokenized at once
+    (with NumPy if it is installed), so clauses may span lines. The result is
+    in the layout of CompactInstance: `lits` holds the literal codes of all
+    clauses back to back, and clause i is lits[offsets[i]:offsets[i + 1]].
+    An empty clause (a lone 0) is kept, like CNFParser keeps it.
+
+    The header's variable and clause counts are checked against the clauses.
+    """
+
+    def __init__(self, file_object, chunk_size=CHUNK_SIZE):
+        self.file_object = file_object
+        self.chunk_size = chunk_size
+        self.var_count = 0
+        self.clause_count = 0
+
+        self.lits = array('i')
+        self.offsets = array('i', [0])
+
+        self._header = None
+        self._done = False
+
+        self._parse()
+
+    def _parse(self):
+        rest = b''
+        while not self._done:
+            chunk = self.file_object.read(self.chunk_size)
+            if not chunk:
+                break
+            chunk = rest + chunk
+            # Only hand over whole lines; the tail waits for the next chunk.
+            end = chunk.rfind(b'\n') + 1
+            rest = chunk[end:]
+            self._parse_chunk(chunk[:end])
+        if rest and not self._done:
+            self._parse_chunk(rest)
+
+        if self._header is None:
+            raise ValueError('No cnf header found')
+
+        # A final clause may lack its terminating 0.
+        if len(self.lits) > self.offsets[-1]:
+            self.offsets.append(len(self.lits))
+        self._validate()
+
+    def _parse_chunk(self, chunk):
+        if (self._header is None or b'c' in chunk or b'#' in chunk or
+                b'%' in chunk):
+            chunk = self._strip_lines(chunk)
+        if not chunk.strip():
+            # NumPy would read a blank chunk as a lone 0.
             return
+        if chunk.translate(None, CLAUSE_CHARS):
+            # Let the slow path report the offending token.
+            self._add_tokens_slow(chunk)
+        elif np is not None:
+            self._add_tokens_numpy(chunk)
+        else:
+            self._add_tokens_slow(chunk)
 
-        line = self.remove_doubles.sub(r' ', line)
-        elms = line.split()
+    def _strip_lines(self, chunk):
+        """Drop comments, read the header and stop at '%'.
 
-        clause = []
-        for clause_str in elms:
-            clause_str = clause_str.strip()
+        Some benchmarks end the formula with a '%' line followed by a stray
+        "0", so nothing after it is read.
+        """
+        kept = []
+        for line in chunk.split(b'\n'):
+            stripped = line.strip()
+            if not stripped or stripped[:1] in (b'c', b'#'):
+                continue
+            if stripped[:1] == b'%':
+                self._done = True
+                break
+            if stripped[:1] == b'p':
+                self._read_header(stripped)
+                continue
+            if self._header is None:
+                raise ValueError('Unexpected header: "{}"'
+                                 .format(stripped.decode('ascii', 'replace')))
+            kept.append(line)
+        return b'\n'.join(kept)
+
+    def _read_header(self, line):
+        header = line.decode('ascii', 'replace')
+        elms = header.split()
+        if self._header is not None or len(elms) != 4 or elms[1] != 'cnf':
+            raise ValueError('Unrecognized cnf header: "{}"'.format(header))
+        self._header = header
+        self.var_count = int(elms[2])
+        self.clause_count = int(elms[3])
+
+    def _add_tokens_slow(self, chunk):
+        lits = self.lits
+        offsets = self.offsets
+        for token in chunk.split():
             try:
-                literal = int(clause_str)
+                lit = int(token)
             except ValueError:
-                self._warn('Error in line #{} -- could not parse "{}"'.format(
-                           line_number, clause_str))
-                continue
+                raise ValueError('Could not parse "{}"'
+                                 .format(token.decode('ascii', 'replace')))
+            if lit == 0:
+                offsets.append(len(lits))
+            elif lit < 0:
+                lits.append((-lit << 1) | 1)
+            else:
+                lits.append(lit << 1)
 
-            if literal == 0:
-                break
+    def _add_tokens_numpy(self, chunk):
+        tokens = np.fromstring(chunk, dtype=np.int64, sep=' ')
+        if len(tokens) != len(chunk.split()):
+            # NumPy skipped something like a lone '-'; let the slow path
+            # report it.
+            self._add_tokens_slow(chunk)
+            return
+        zeros = np.flatnonzero(tokens == 0)
+        nonzero = tokens[tokens != 0]
+        codes = np.where(nonzero < 0, (-nonzero << 1) | 1, nonzero << 1)
 
-            clause.append(literal)
+        # Clause ends, counted in literals; repeated ends are empty clauses.
+        base = len(self.lits)
+        ends = base + zeros - np.arange(len(zeros))
 
-        if len(clause) > 0:
-            self.clauses.append(clause)
+        _extend(self.lits, codes)
+        _extend(self.offsets, ends)
 
+    def _validate(self):
+        if len(self.lits) > 0:
+            if np is not None:
+                max_var = int(np.frombuffer(self.lits, dtype=np.int32)
+                              .max()) >> 1
+            else:
+                max_var = max(self.lits) >> 1
+            if max_var > self.var_count:
+                raise ValueError('Variable {} exceeds the {} declared in the '
+                                 'header'.format(max_var, self.var_count))
+        clause_count = len(self.offsets) - 1
+        if clause_count != self.clause_count:
+            raise ValueError('Found {} clauses, but the header declares {}'
+                             .format(clause_count, self.clause_count))
 
-class CNFFileParser(CNFParser):
-    """Parse DIMACS files"""
-    def __init__(self, filename):
+
+class BulkCNFFileParser(BulkCNFParser):
+    """Bulk-parse a DIMACS file through mmap"""
+    def __init__(self, filename, chunk_size=CHUNK_SIZE):
         self.filename = filename
-        with open(filename, 'r') as f:
-            super(CNFFileParser, self).__init__(f)
+        with open(filename, 'rb') as f:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped.
+                buf = f
+            try:
+                super(BulkCNFFileParser, self).__init__(buf, chunk_size)
+            finally:
+                if buf is not f:
+                    buf.close()
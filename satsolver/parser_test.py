@@ -1,7 +1,24 @@
-from __future__ import print_function, absolute_import
-from cStringIO import StringIO
+import bz2
+import gzip
+import io
+from io import StringIO
+from io import BytesIO
 
-from satsolver.parser import CNFParser
+import pytest
+
+from satsolver import parser as parser_module
+from satsolver.parser import (CNFParser, CNFFileParser, CNFStream,
+                              BulkCNFParser, BulkCNFFileParser, CHUNK_SIZE,
+                              iter_clauses, is_compressed, write_cnf)
+from satsolver.compact import decode
+from satsolver.state import Instance
+
+
+def gzip_bytes(data):
+    buf = BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(data)
+    return buf.getvalue()
 
 
 def test_simple_cnf_parsing():
@@ -18,3 +35,168 @@ def test_simple_cnf_parsing():
     assert set(clauses[0]) == {1, 2, -3}
     assert set(clauses[1]) == {3, 2}
     assert set(clauses[2]) == {1, 2}
+
+
+def bulk_parse(text, chunk_size=CHUNK_SIZE):
+    return BulkCNFParser(BytesIO(text.encode('ascii')), chunk_size)
+
+
+def clauses_of(parser):
+    offsets = parser.offsets
+    return [[decode(code) for code in parser.lits[offsets[i]:offsets[i + 1]]]
+            for i in range(len(offsets) - 1)]
+
+
+def test_bulk_parsing():
+    parser = bulk_parse(
+    '''c a comment
+    p cnf 5 3
+    1 2 -3 0
+    3 2 0
+    c another comment
+    -5 4 0
+    ''')
+    assert parser.var_count == 5
+    assert clauses_of(parser) == [[1, 2, -3], [3, 2], [-5, 4]]
+    assert list(parser.offsets) == [0, 3, 5, 7]
+
+
+def test_bulk_clauses_span_lines():
+    parser = bulk_parse('p cnf 4 2\n1 2\n-3 0 4\n-1 0\n')
+    assert clauses_of(parser) == [[1, 2, -3], [4, -1]]
+
+
+def test_bulk_small_chunks():
+    text = 'p cnf 12 3\n10 -11 12 0\n1 2 3 0\n-12 0\n'
+    for chunk_size in range(1, len(text) + 1):
+        parser = bulk_parse(text, chunk_size)
+        assert clauses_of(parser) == [[10, -11, 12], [1, 2, 3], [-12]]
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+@pytest.mark.parametrize('text', ['p cnf 2 1\n1 -2 0\n  ',
+                                  'p cnf 2 1\n1 -2 0\n\t\n  \n',
+                                  'p cnf 2 1\n  1 -2 0'])
+def test_bulk_trailing_whitespace(monkeypatch, use_numpy, text):
+    if use_numpy and parser_module.np is None:
+        pytest.skip('numpy is not installed')
+    if not use_numpy:
+        monkeypatch.setattr(parser_module, 'np', None)
+    for chunk_size in (4, CHUNK_SIZE):
+        assert clauses_of(bulk_parse(text, chunk_size)) == [[1, -2]]
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_bulk_malformed_literal(monkeypatch, use_numpy):
+    if use_numpy and parser_module.np is None:
+        pytest.skip('numpy is not installed')
+    if not use_numpy:
+        monkeypatch.setattr(parser_module, 'np', None)
+    with pytest.raises(ValueError):
+        bulk_parse('p cnf 2 1\n1 - 2 0\n')
+
+
+def test_bulk_satlib_trailer():
+    parser = bulk_parse('p cnf 2 1\n1 -2 0\n%\n0\n\n')
+    assert clauses_of(parser) == [[1, -2]]
+
+
+def test_bulk_missing_final_zero():
+    parser = bulk_parse('p cnf 2 2\n1 -2 0\n2')
+    assert clauses_of(parser) == [[1, -2], [2]]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, CHUNK_SIZE])
+def test_empty_clause_is_kept(chunk_size):
+    text = 'p cnf 2 3\n1 2 0\n0\n-1 0\n'
+    assert clauses_of(bulk_parse(text, chunk_size)) == [[1, 2], [], [-1]]
+    assert list(CNFStream(StringIO(text))) == [[1, 2], [], [-1]]
+    with pytest.raises(ValueError):
+        bulk_parse('p cnf 2 1\n1 2 0\n0\n')
+
+
+def test_bulk_validates_clause_count():
+    with pytest.raises(ValueError):
+        bulk_parse('p cnf 5 15\n1 2 0\n')
+
+
+def test_bulk_validates_var_count():
+    with pytest.raises(ValueError):
+        bulk_parse('p cnf 2 1\n1 3 0\n')
+
+
+def test_bulk_rejects_bad_tokens():
+    with pytest.raises(ValueError):
+        bulk_parse('p cnf 2 1\n1 x 0\n')
+
+
+def test_bulk_file_parser(tmpdir):
+    path = tmpdir.join('simple.cnf')
+    path.write('p cnf 3 2\n1 -2 0\n2 3 0\n')
+    parser = BulkCNFFileParser(str(path))
+    assert clauses_of(parser) == [[1, -2], [2, 3]]
+
+
+def test_write_cnf_round_trip(tmpdir):
+    path = str(tmpdir.join('written.cnf'))
+    with io.open(path, 'w') as f:
+        write_cnf(f, 3, [[1, -2], [3]], comments=['made by a test'])
+    parser = CNFFileParser(path)
+    assert parser.var_count == 3
+    assert parser.clauses == [[1, -2], [3]]
+
+
+SIMPLE_CNF = b'c comment\np cnf 4 3\n1 -2 0\n2 3\n-4 0\n4 0\n'
+
+
+def test_stream_is_lazy():
+    read = []
+    def lines():
+        for line in SIMPLE_CNF.split(b'\n'):
+            read.append(line)
+            yield line
+    stream = CNFStream(lines())
+    assert stream.var_count == 4
+    assert stream.clause_count == 3
+    clauses = iter(stream)
+    assert next(clauses) == [1, -2]
+    # Nothing past the first clause has been read.
+    assert read[-1] == b'1 -2 0'
+    assert list(clauses) == [[2, 3, -4], [4]]
+
+
+@pytest.mark.parametrize('compress', [gzip_bytes, bz2.compress])
+def test_iter_clauses_compressed(compress):
+    stream = BytesIO(compress(SIMPLE_CNF))
+    assert list(iter_clauses(stream)) == [[1, -2], [2, 3, -4], [4]]
+
+
+def test_iter_clauses_closes_file(tmpdir, monkeypatch):
+    path = tmpdir.join('simple.cnf')
+    path.write(SIMPLE_CNF, mode='wb')
+    opened = []
+    real_open = io.open
+
+    def open_and_record(*args, **kwargs):
+        opened.append(real_open(*args, **kwargs))
+        return opened[-1]
+    monkeypatch.setattr(io, 'open', open_and_record)
+    assert list(iter_clauses(str(path))) == [[1, -2], [2, 3, -4], [4]]
+    assert opened and all(f.closed for f in opened)
+
+
+def test_cnf_file_parser_compressed(tmpdir):
+    path = tmpdir.join('simple.cnf.gz')
+    path.write(gzip_bytes(SIMPLE_CNF), mode='wb')
+    parser = CNFFileParser(str(path))
+    assert parser.var_count == 4
+    assert parser.clauses == [[1, -2], [2, 3, -4], [4]]
+    assert is_compressed(str(path))
+
+
+def test_instance_from_stream():
+    stream = CNFStream(BytesIO(SIMPLE_CNF))
+    inst = Instance(var_count=stream.var_count, clauses=stream)
+    assert inst.clauses == [[1, -2], [2, 3, -4], [4]]
+    assert inst.units == [2]
+    assert inst.watches[2] == [1]
@@ -0,0 +1,192 @@
+"""Portfolio solving: race differently configured solvers on all cores.
+
+Every worker process solves its own copy of the instance. The first answer
+wins and the other workers are terminated. Workers can optionally share
+their short learned clauses through a ClauseExchange.
+"""
+
+import logging
+import multiprocessing
+import signal
+import traceback
+from collections import namedtuple
+
+from satsolver.util import Success, Failure, Unknown
+from satsolver.heuristics import VSIDS
+from satsolver.restarts import make_policy
+from satsolver.solver import Solver
+
+# Configuration of one portfolio worker:
+#   seed: shuffles the initial variable order (None keeps it)
+#   decay: VSIDS activity decay
+#   phase: initial value of decided variables
+#   restarts: restart policy name (see restarts.POLICIES)
+PortfolioConfig = namedtuple('PortfolioConfig',
+                             ['seed', 'decay', 'phase', 'restarts'])
+
+# Decay variants cycled through by default_configs.
+DECAYS = (0.95, 0.99, 0.8)
+
+# Restart policies cycled through by default_configs.
+RESTARTS = ('luby', 'glucose', 'geometric')
+
+# Learned clauses up to this length are shared between workers.
+SHARED_CLAUSE_LENGTH = 8
+
+# Capacity of the clause exchange, in ints.
+EXCHANGE_SIZE = 1 << 16
+
+
+def default_configs(count):
+    """Diverse configurations; the first one is the default solver's."""
+    configs = []
+    for i in range(count):
+        configs.append(PortfolioConfig(seed=i if i > 0 else None,
+                                       decay=DECAYS[i % len(DECAYS)],
+                                       phase=1 - (i // len(DECAYS)) % 2,
+                                       restarts=RESTARTS[i % len(RESTARTS)]))
+    return configs
+
+
+class ClauseExchange(object):
+    """Ring buffer of learned clauses in shared memory.
+
+    Each entry is [sender, length, lit, ...]. Readers keep their own position
+    and skip whatever was overwritten before they got to it.
+    """
+    def __init__(self, size=EXCHANGE_SIZE):
+        self.size = size
+        self.buffer = multiprocessing.Array('i', size)
+        # Total number of ints ever written.
+        self.head = multiprocessing.Value('l', 0, lock=False)
+        self.lock = self.buffer.get_lock()
+
+    def put(self, sender, clause):
+        entry = [sender, len(clause)] + list(clause)
+        if len(entry) > self.size:
+            return
+        with self.lock:
+            head = self.head.value
+            for i, value in enumerate(entry):
+                self.buffer[(head + i) % self.size] = value
+            self.head.value = head + len(entry)
+
+    def get(self, receiver, position):
+        """Read the clauses written since `position` by other senders.
+
+        Returns:
+            tuple(list[list[int]], int): (clauses, new position)
+        """
+        clauses = []
+        with self.lock:
+            head = self.head.value
+            if head - position > self.size:
+                # Lapped: the oldest entries are gone.
+                return clauses, head
+            while position < head:
+                sender = self.buffer[position % self.size]
+                length = self.buffer[(position + 1) % self.size]
+                start = position + 2
+                if sender != receiver:
+                    clauses.append([self.buffer[(start + i) % self.size]
+                                    for i in range(length)])
+                position = start + length
+        return clauses, position
+
+
+def build_solver(instance, config):
+    heuristic = VSIDS(instance, decay=config.decay,
+                      initial_phase=config.phase, seed=config.seed)
+    return Solver(instance, heuristic=heuristic,
+                  restarts=make_policy(config.restarts))
+
+
+def _worker(worker_id, instance, config, results, exchange, limits):
+    # Ctrl-C goes to the coordinator, which stops every worker.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        solver = build_solver(instance, config)
+        if exchange is not None:
+            position = [0]
+
+            def export_clause(clause, lbd):
+                if len(clause) <= SHARED_CLAUSE_LENGTH:
+                    exchange.put(worker_id, clause)
+
+            def import_clauses():
+                clauses, position[0] = exchange.get(worker_id, position[0])
+                return clauses
+
+            solver.export_clause = export_clause
+            solver.import_clauses = import_clauses
+
+        result = solver.solve(**(limits or {}))
+        if result.success:
+            results.put((worker_id, 'sat', instance.solutions[-1]))
+        elif isinstance(result, Unknown):
+            results.put((worker_id, 'unknown', result.reason))
+        else:
+            results.put((worker_id, 'unsat', None))
+    except Exception:
+        results.put((worker_id, 'error', traceback.format_exc()))
+
+
+def solve(instance, workers=None, configs=None, share_clauses=False,
+          limits=None):
+    """Race several solver configurations on an instance.
+
+    Args:
+        instance (Instance): each worker gets its own copy.
+        workers (int): number of processes; defaults to the number of CPUs.
+        configs (list[PortfolioConfig]): defaults to default_configs.
+        share_clauses (bool): exchange short learned clauses between workers.
+        limits (dict): budgets for each worker's Solver.solve, e.g.
+            max_time; memory is limited per worker.
+
+    Returns:
+        Success | Failure | Unknown
+        On success the model is appended to instance.solutions. The result
+        is the configuration that answered first. Unknown if every worker
+        ran out of its budget.
+    """
+    if configs is None:
+        configs = default_configs(workers or multiprocessing.cpu_count())
+    exchange = ClauseExchange() if share_clauses else None
+    results = multiprocessing.Queue()
+
+    processes = []
+    for worker_id, config in enumerate(configs):
+        process = multiprocessing.Process(
+            target=_worker,
+            args=(worker_id, instance, config, results, exchange, limits))
+        process.daemon = True
+        process.start()
+        processes.append(process)
+
+    try:
+        errors = []
+        unknown = []
+        while len(errors) + len(unknown) < len(processes):
+            worker_id, status, payload = results.get()
+            if status == 'error':
+                logging.error('portfolio worker %d failed:\n%s',
+                              worker_id, payload)
+                errors.append(payload)
+                continue
+            if status == 'unknown':
+                unknown.append(payload)
+                continue
+            config = configs[worker_id]
+            if status == 'sat':
+                instance.solutions.append(payload)
+                return Success(result=config)
+            return Failure('Unsat!', result=config)
+        if unknown:
+            return Unknown(unknown[0])
+        raise RuntimeError('All portfolio workers failed')
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
@@ -0,0 +1,58 @@
+from satsolver.state import Instance
+from satsolver.util import Unknown
+from satsolver.portfolio import (ClauseExchange, PortfolioConfig,
+                                 default_configs, solve)
+from satsolver.solver_test import pigeonhole
+
+
+def test_default_configs_differ():
+    configs = default_configs(6)
+    assert len(set(configs)) == 6
+    assert configs[0] == PortfolioConfig(seed=None, decay=0.95, phase=1,
+                                         restarts='luby')
+
+
+def test_clause_exchange():
+    exchange = ClauseExchange(size=16)
+    exchange.put(0, [1, -2])
+    exchange.put(1, [3])
+    clauses, position = exchange.get(0, 0)
+    assert clauses == [[3]]
+    clauses, position = exchange.get(1, 0)
+    assert clauses == [[1, -2]]
+    assert exchange.get(1, position) == ([], position)
+
+
+def test_clause_exchange_lapped():
+    exchange = ClauseExchange(size=8)
+    for i in range(1, 5):
+        exchange.put(0, [i, -i])
+    clauses, position = exchange.get(1, 0)
+    assert clauses == []
+    exchange.put(0, [5])
+    assert exchange.get(1, position)[0] == [[5]]
+
+
+def test_portfolio_sat():
+    clauses = [[1, 2, 3], [-1, -2], [-2, -3], [-1, -3], [2, 3]]
+    inst = Instance(var_count=3, clauses=clauses)
+    result = solve(inst, workers=3)
+    assert result.success
+    assert result.result in default_configs(3)
+    solution = inst.solutions[-1]
+    assert solution[1] == 0
+    assert solution[2] != solution[3]
+
+
+def test_portfolio_unsat_sharing_clauses():
+    var_count, clauses = pigeonhole(4)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    assert not solve(inst, workers=2, share_clauses=True).success
+
+
+def test_portfolio_budget_exhausted():
+    var_count, clauses = pigeonhole(6)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    result = solve(inst, workers=2, limits=dict(max_conflicts=5))
+    assert isinstance(result, Unknown)
+    assert result.reason == 'Conflict budget exhausted'
@@ -0,0 +1,481 @@
+"""CNF preprocessing between parsing and solving.
+
+Preprocessor simplifies a formula with:
+  - top-level unit propagation
+  - pure literal elimination
+  - duplicate literal, duplicate clause and tautology removal
+  - subsumption and self-subsuming resolution
+  - equivalent literal substitution and failed literal probing, on the
+    implication graph of the binary clauses
+  - bounded variable elimination
+
+Each technique runs within its own time budget. Removed clauses that a model
+of the simplified formula might violate are kept on a reconstruction stack,
+so `extend` can turn such a model into one of the original formula.
+"""
+import logging
+import time
+
+from satsolver.util import Success, Failure
+
+# Seconds each technique may run for; None means no limit.
+DEFAULT_BUDGETS = {
+    'units': None,
+    'duplicates': None,
+    'pure': 1.0,
+    'subsumption': 2.0,
+    'equivalences': 1.0,
+    'probing': 1.0,
+    'elimination': 5.0,
+}
+
+# Variables occurring more often than this are never eliminated.
+ELIM_OCCURRENCES = 16
+
+# Resolvents longer than this block the elimination of their variable.
+ELIM_RESOLVENT_LENGTH = 24
+
+
+def _signature(clause):
+    """Bitmask of the clause's variables, for cheap subset tests."""
+    sig = 0
+    for lit in clause:
+        sig |= 1 << (abs(lit) & 63)
+    return sig
+
+
+def _components(graph, deadline=None):
+    """Strongly connected components of more than one literal (Tarjan).
+
+    Iterative, so long implication chains do not hit the recursion limit.
+
+    Yields:
+        set[int]
+    """
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    for root in graph:
+        if root in index:
+            continue
+        if deadline is not None and time.time() >= deadline:
+            return
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(graph[root]))]
+        while work:
+            node, successors = work[-1]
+            for succ in successors:
+                if succ not in index:
+                    index[succ] = low[succ] = len(index)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(graph.get(succ, ()))))
+                    break
+                elif succ in on_stack:
+                    low[node] = min(low[node], index[succ])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = set()
+                    while True:
+                        lit = stack.pop()
+                        on_stack.discard(lit)
+                        component.add(lit)
+                        if lit == node:
+                            break
+                    if len(component) > 1:
+                        yield component
+
+
+class Preprocessor(object):
+    """Simplify a formula before it is handed to an Instance."""
+    def __init__(self, var_count, clauses, budgets=None):
+        """
+        Args:
+            var_count (int):
+            clauses (iterable[list[int]]): consumed one clause at a time, so
+                preprocessing can start while a stream is still being read.
+            budgets (dict[str, float]): overrides DEFAULT_BUDGETS.
+        """
+        self.var_count = var_count
+        self.budgets = dict(DEFAULT_BUDGETS)
+        if budgets:
+            self.budgets.update(budgets)
+
+        # Clause i is clauses[i]; removed clauses are None.
+        self.clauses = []
+        # maps lit -> set of indices of the clauses containing it
+        self.occurs = {}
+        for var in range(1, var_count + 1):
+            self.occurs[var] = set()
+            self.occurs[-var] = set()
+
+        # maps var -> value fixed by unit propagation
+        self.fixed = {}
+        # Reconstruction stack of (pivot literal, removed clause).
+        self.eliminated = []
+        # Indices of the unit clauses still to propagate.
+        self.units = []
+        # False once the formula is known to be UNSAT.
+        self.ok = True
+
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def add_clause(self, clause):
+        """Add a clause, dropping duplicate literals and tautologies."""
+        lits = []
+        seen = set()
+        for lit in clause:
+            if -lit in seen:
+                return
+            if lit not in seen:
+                seen.add(lit)
+                lits.append(lit)
+        if not lits:
+            self.ok = False
+            return
+        clause_index = len(self.clauses)
+        self.clauses.append(lits)
+        for lit in lits:
+            self.occurs[lit].add(clause_index)
+        if len(lits) == 1:
+            self.units.append(clause_index)
+
+    def _remove(self, clause_index):
+        for lit in self.clauses[clause_index]:
+            self.occurs[lit].discard(clause_index)
+        self.clauses[clause_index] = None
+
+    def _strengthen(self, clause_index, lit):
+        """Remove a literal from a clause."""
+        clause = self.clauses[clause_index]
+        clause.remove(lit)
+        self.occurs[lit].discard(clause_index)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.units.append(clause_index)
+
+    def _deadline(self, name):
+        budget = self.budgets.get(name)
+        return None if budget is None else time.time() + budget
+
+    def run(self):
+        """Apply every technique.
+
+        Returns:
+            Success | Failure
+            Failure means the formula is UNSAT.
+        """
+        before = len(self)
+        self.propagate_units()
+        self.remove_duplicates()
+        self.eliminate_pure_literals()
+        self.subsume()
+        self.substitute_equivalences()
+        self.probe()
+        self.propagate_units()
+        self.eliminate_variables()
+        self.propagate_units()
+        self.eliminate_pure_literals()
+        if not self.ok:
+            return Failure('Preprocessing found the formula UNSAT')
+        logging.info('preprocessing: %d -> %d clauses, %d vars fixed, '
+                     '%d clauses on the reconstruction stack',
+                     before, len(self), len(self.fixed), len(self.eliminated))
+        return Success()
+
+    def __len__(self):
+        return sum(1 for clause in self.clauses if clause is not None)
+
+    def remaining_clauses(self):
+        """The simplified formula, over the original variables."""
+        return [list(clause) for clause in self.clauses if clause is not None]
+
+    def propagate_units(self):
+        """Assign unit clauses at the top level and simplify with them."""
+        deadline = self._deadline('units')
+        occurs = self.occurs
+        while self.units and self.ok:
+            if deadline is not None and time.time() >= deadline:
+                break
+            clause_index = self.units.pop()
+            clause = self.clauses[clause_index]
+            if clause is None or len(clause) != 1:
+                continue
+            lit = clause[0]
+            var = abs(lit)
+            value = 1 if lit > 0 else 0
+            if var in self.fixed:
+                if self.fixed[var] != value:
+                    self.ok = False
+                continue
+            self.fixed[var] = value
+            for satisfied in list(occurs[lit]):
+                self._remove(satisfied)
+            for falsified in list(occurs[-lit]):
+                self._strengthen(falsified, -lit)
+
+    def remove_duplicates(self):
+        """Remove clauses with the same literals as an earlier one."""
+        deadline = self._deadline('duplicates')
+        seen = set()
+        for clause_index, clause in enumerate(self.clauses):
+            if deadline is not None and time.time() >= deadline:
+                break
+            if clause is None:
+                continue
+            key = tuple(sorted(clause))
+            if key in seen:
+                self._remove(clause_index)
+            else:
+                seen.add(key)
+
+    def eliminate_pure_literals(self):
+        """Remove the clauses of literals whose negation never occurs."""
+        deadline = self._deadline('pure')
+        occurs = self.occurs
+        candidates = set(range(1, self.var_count + 1))
+        while candidates and self.ok:
+            if deadline is not None and time.time() >= deadline:
+                break
+            var = candidates.pop()
+            if occurs[var] and not occurs[-var]:
+                pure = var
+            elif occurs[-var] and not occurs[var]:
+                pure = -var
+            else:
+                continue
+            for clause_index in list(occurs[pure]):
+                clause = self.clauses[clause_index]
+                self.eliminated.append((pure, clause))
+                self._remove(clause_index)
+                # Removing the clause may leave its other variables pure.
+                candidates.update(abs(lit) for lit in clause)
+            candidates.discard(var)
+
+    def subsume(self):
+        """Backward subsumption and self-subsuming resolution.
+
+        Every clause C removes the clauses it is a subset of, and removes
+        -l from any clause D with C - {l} + {-l} a subset of D.
+        """
+        deadline = self._deadline('subsumption')
+        clauses = self.clauses
+        occurs = self.occurs
+        queue = sorted((i for i, clause in enumerate(clauses)
+                        if clause is not None),
+                       key=lambda i: len(clauses[i]), reverse=True)
+        while queue and self.ok:
+            if deadline is not None and time.time() >= deadline:
+                break
+            clause_index = queue.pop()
+            clause = clauses[clause_index]
+            if clause is None:
+                continue
+            sig = _signature(clause)
+            # Candidates must contain the variable of C's rarest literal.
+            pivot = min(clause,
+                        key=lambda lit: len(occurs[lit]) + len(occurs[-lit]))
+            others = occurs[pivot] | occurs[-pivot]
+            for other_index in others:
+                other = clauses[other_index]
+                if (other_index == clause_index or other is None or
+                        len(other) < len(clause) or
+                        sig & ~_signature(other)):
+                    continue
+                removable = self._subsumes(clause, set(other))
+                if removable is None:
+                    continue
+                if removable == 0:
+                    self._remove(other_index)
+                else:
+                    self._strengthen(other_index, -removable)
+                    # The shorter clause may now subsume others.
+                    queue.append(other_index)
+        self.propagate_units()
+
+    def _subsumes(self, clause, other):
+        """Check clause against the set of another clause's literals.
+
+        Returns:
+            0 if clause is a subset of other; a literal l if it only is with
+            l negated (so -l can be removed from other); None otherwise.
+        """
+        flipped = 0
+        for lit in clause:
+            if lit in other:
+                continue
+            elif flipped == 0 and -lit in other:
+                flipped = lit
+            else:
+                return None
+        return flipped
+
+    def binary_graph(self):
+        """Implication graph of the binary clauses.
+
+        Returns:
+            dict[int, list[int]]: maps lit -> the literals it implies; a
+            clause [a, b] gives -a -> b and -b -> a.
+        """
+        graph = {}
+        for clause in self.clauses:
+            if clause is not None and len(clause) == 2:
+                a, b = clause
+                graph.setdefault(-a, []).append(b)
+                graph.setdefault(-b, []).append(a)
+        return graph
+
+    def substitute_equivalences(self):
+        """Replace equivalent literals by one representative.
+
+        Literals on a cycle of binary implications (a strongly connected
+        component of the graph) are equivalent. Each is replaced by the one
+        with the smallest variable; the formula is UNSAT if a literal is
+        equivalent to its own negation.
+        """
+        deadline = self._deadline('equivalences')
+        if not self.ok:
+            return
+        graph = self.binary_graph()
+        replace = {}
+        for component in _components(graph, deadline):
+            rep = min(component, key=abs)
+            for lit in component:
+                if -lit in component:
+                    self.ok = False
+                    return
+                if abs(lit) != abs(rep) and lit not in replace:
+                    # The mirror component, of the negations, agrees.
+                    replace[lit] = rep
+                    replace[-lit] = -rep
+        if not replace:
+            return
+        occurs = self.occurs
+        rewritten = set()
+        for lit in replace:
+            rewritten.update(occurs[lit])
+        for clause_index in rewritten:
+            clause = self.clauses[clause_index]
+            self._remove(clause_index)
+            self.add_clause([replace.get(lit, lit) for lit in clause])
+        for lit, rep in replace.items():
+            if lit > 0:
+                # lit <-> rep, so extend() can set lit from rep.
+                self.eliminated.append((lit, [lit, -rep]))
+                self.eliminated.append((-lit, [-lit, rep]))
+        self.propagate_units()
+
+    def probe(self):
+        """Failed literal probing on the binary implication graph.
+
+        A literal whose binary implications include some literal and its
+        negation cannot be true, so its negation is added as a unit.
+        """
+        deadline = self._deadline('probing')
+        graph = self.binary_graph()
+        for lit in graph:
+            if not self.ok or (deadline is not None and
+                               time.time() >= deadline):
+                break
+            if abs(lit) in self.fixed:
+                continue
+            implied = set([lit])
+            stack = [lit]
+            failed = False
+            while stack and not failed:
+                for other in graph.get(stack.pop(), ()):
+                    if -other in implied:
+                        failed = True
+                        break
+                    if other not in implied:
+                        implied.add(other)
+                        stack.append(other)
+            if failed:
+                self.add_clause([-lit])
+                self.propagate_units()
+
+    def eliminate_variables(self):
+        """Bounded variable elimination.
+
+        A variable is replaced by all non-tautological resolvents of its
+        positive and negative clauses, as long as that does not add clauses.
+        """
+        deadline = self._deadline('elimination')
+        clauses = self.clauses
+        occurs = self.occurs
+        candidates = sorted(
+            (var for var in range(1, self.var_count + 1)
+             if var not in self.fixed),
+            key=lambda var: len(occurs[var]) + len(occurs[-var]))
+        for var in candidates:
+            if not self.ok or (deadline is not None and
+                               time.time() >= deadline):
+                break
+            pos = list(occurs[var])
+            neg = list(occurs[-var])
+            if not pos and not neg:
+                continue
+            if len(pos) + len(neg) > ELIM_OCCURRENCES:
+                continue
+            resolvents = self._resolvents(var, pos, neg)
+            if resolvents is None:
+                continue
+            for clause_index in pos:
+                self.eliminated.append((var, clauses[clause_index]))
+                self._remove(clause_index)
+            for clause_index in neg:
+                self.eliminated.append((-var, clauses[clause_index]))
+                self._remove(clause_index)
+            for resolvent in resolvents:
+                self.add_clause(resolvent)
+            self.propagate_units()
+
+    def _resolvents(self, var, pos, neg):
+        """Resolvents on var, or None if eliminating var does not pay off."""
+        limit = len(pos) + len(neg)
+        resolvents = []
+        for i in pos:
+            for j in neg:
+                resolvent = set(self.clauses[i])
+                resolvent.discard(var)
+                tautology = False
+                for lit in self.clauses[j]:
+                    if lit == -var:
+                        continue
+                    if -lit in resolvent:
+                        tautology = True
+                        break
+                    resolvent.add(lit)
+                if tautology:
+                    continue
+                if len(resolvent) > ELIM_RESOLVENT_LENGTH:
+                    return None
+                resolvents.append(list(resolvent))
+                if len(resolvents) > limit:
+                    return None
+        return resolvents
+
+    def extend(self, model):
+        """Turn a model of the simplified formula into one of the original.
+
+        Args:
+            model (dict[int, int]): maps var -> 0 or 1 for every variable.
+
+        Returns:
+            dict[int, int]: a new model.
+        """
+        model = dict(model)
+        model.update(self.fixed)
+        for pivot, clause in reversed(self.eliminated):
+            if not any(model[abs(lit)] == (lit > 0) for lit in clause):
+                model[abs(pivot)] = 1 if pivot > 0 else 0
+        return model
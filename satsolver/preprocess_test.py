@@ -0,0 +1,123 @@
+import random
+
+from satsolver.state import Instance
+from satsolver.solver import Solver
+from satsolver.preprocess import Preprocessor
+from satsolver.cube_test import models
+from satsolver.solver_test import pigeonhole
+
+
+def satisfies(model, clauses):
+    return all(any(model[abs(lit)] == (lit > 0) for lit in clause)
+               for clause in clauses)
+
+
+def test_units_propagate():
+    pre = Preprocessor(3, [[1], [-1, 2], [-2, 3, -1], [3, 2]])
+    assert pre.run().success
+    assert pre.fixed == {1: 1, 2: 1, 3: 1}
+    assert pre.remaining_clauses() == []
+
+
+def test_units_conflict():
+    pre = Preprocessor(2, [[1], [-1, 2], [-2]])
+    assert not pre.run().success
+
+
+def test_duplicates_and_tautologies():
+    pre = Preprocessor(3, [[1, 2, 1], [2, 1], [1, -1, 3], [-1, -2]])
+    assert len(pre) == 3
+    pre.remove_duplicates()
+    assert len(pre) == 2
+
+
+def test_pure_literals():
+    pre = Preprocessor(3, [[1, 2], [1, -2], [2, 3], [-2, -3]])
+    pre.eliminate_pure_literals()
+    assert pre.remaining_clauses() == [[2, 3], [-2, -3]]
+    model = pre.extend({1: 0, 2: 1, 3: 0})
+    assert model[1] == 1
+
+
+def test_subsumption():
+    pre = Preprocessor(4, [[1, 2, 3], [1, 2], [1, 2, 3, 4], [3, 4]])
+    pre.subsume()
+    assert sorted(pre.remaining_clauses()) == [[1, 2], [3, 4]]
+
+
+def test_self_subsuming_resolution():
+    # [1, 2] and [-1, 2, 3] resolve to [2, 3], which replaces the latter.
+    pre = Preprocessor(3, [[1, 2], [-1, 2, 3]])
+    pre.subsume()
+    assert sorted(pre.remaining_clauses()) == [[1, 2], [2, 3]]
+
+
+def test_variable_elimination():
+    # 2 only links 1 and 3: [1, 2], [-2, 3] resolve to [1, 3].
+    clauses = [[1, 2], [-2, 3], [-1, -3, 4], [1, -4]]
+    pre = Preprocessor(4, clauses)
+    pre.eliminate_variables()
+    assert all(2 not in map(abs, clause)
+               for clause in pre.remaining_clauses())
+
+
+def test_unsat_is_preserved():
+    var_count, clauses = pigeonhole(4)
+    pre = Preprocessor(var_count, clauses)
+    if pre.run().success:
+        inst = Instance(var_count, pre.remaining_clauses())
+        assert not Solver(inst).solve().success
+
+
+def test_random_formulas_keep_their_models():
+    rng = random.Random(7)
+    for _ in range(200):
+        var_count = rng.randint(3, 8)
+        clauses = [[rng.choice([-1, 1]) * rng.randint(1, var_count)
+                    for _ in range(rng.randint(1, 4))]
+                   for _ in range(rng.randint(1, 4 * var_count))]
+        sat = any(True for _ in models(var_count, clauses))
+
+        pre = Preprocessor(var_count, clauses)
+        if not pre.run().success:
+            assert not sat
+            continue
+        inst = Instance(var_count, pre.remaining_clauses())
+        inst.reconstruction = pre.extend
+        assert Solver(inst).solve().success == sat
+        if sat:
+            assert satisfies(inst.solutions[-1], clauses)
+
+
+def test_budget_zero_skips_work():
+    pre = Preprocessor(3, [[1, 2], [1, 2, 3]],
+                       budgets={'subsumption': 0, 'elimination': 0,
+                                'pure': 0})
+    assert pre.run().success
+    assert len(pre) == 2
+
+
+def test_equivalent_literals_are_substituted():
+    # 1 -> -2 -> 3 -> 1, so -2 and 3 are both replaced by 1.
+    clauses = [[-1, -2], [2, 3], [-3, 1], [2, 4, 5], [-3, -4, 5]]
+    pre = Preprocessor(5, clauses)
+    pre.substitute_equivalences()
+    remaining = pre.remaining_clauses()
+    assert sorted(sorted(clause) for clause in remaining) == [
+        [-4, -1, 5], [-1, 4, 5]]
+    model = pre.extend({1: 1, 2: 0, 3: 0, 4: 1, 5: 1})
+    assert model[2] == 0 and model[3] == 1
+    assert satisfies(model, clauses)
+
+
+def test_equivalent_to_own_negation_is_unsat():
+    pre = Preprocessor(2, [[-1, 2], [-2, -1], [1, 2], [-2, 1]])
+    pre.substitute_equivalences()
+    assert not pre.ok
+
+
+def test_failed_literal_probing():
+    # 1 implies both 3 and -3 over binary clauses, so 1 is false.
+    pre = Preprocessor(4, [[-1, 2], [-2, 3], [-1, -3], [1, 4, 2]])
+    pre.probe()
+    assert pre.fixed[1] == 0
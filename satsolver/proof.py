@@ -0,0 +1,196 @@
+"""DRAT proofs of unsatisfiability.
+
+A Solver given a DratWriter logs every clause it learns and deletes, and the
+empty clause once it finds the formula UNSAT. Standard checkers such as
+drat-trim verify the result; `check_proof` is a small, slow pure-Python
+checker for tests.
+
+Binary DRAT, the default, writes each step as 'a' (added) or 'd' (deleted)
+followed by its literals as variable-length integers (2 * var, plus 1 for
+negative literals) and a terminating 0.
+"""
+import bz2
+import gzip
+import io
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+# Bytes buffered before they are written to the file.
+BUFFER_SIZE = 1 << 16
+
+
+class DratWriter(object):
+    """Buffered DRAT proof writer."""
+    def __init__(self, file_object, binary=True, buffer_size=BUFFER_SIZE):
+        """
+        Args:
+            file_object: opened for writing bytes.
+            binary (bool): binary DRAT, or the text format otherwise.
+        """
+        self.file_object = file_object
+        self.binary = binary
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+
+    def add(self, clause):
+        self._write(b'a', clause)
+
+    def delete(self, clause):
+        self._write(b'd', clause)
+
+    def _write(self, kind, clause):
+        buf = self.buffer
+        if self.binary:
+            buf += kind
+            for lit in clause:
+                code = 2 * lit if lit > 0 else -2 * lit + 1
+                while code > 127:
+                    buf.append(code & 127 | 128)
+                    code >>= 7
+                buf.append(code)
+            buf.append(0)
+        else:
+            if kind == b'd':
+                buf += b'd '
+            for lit in clause:
+                buf += str(lit).encode('ascii')
+                buf += b' '
+            buf += b'0\n'
+        if len(buf) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file_object.write(bytes(self.buffer))
+        del self.buffer[:]
+
+    def close(self):
+        self.flush()
+        self.file_object.close()
+
+
+def open_proof(filename, binary=True):
+    """DratWriter for a file, compressed if it ends in .gz, .bz2 or .xz."""
+    if filename.endswith('.gz'):
+        file_object = gzip.open(filename, 'wb')
+    elif filename.endswith('.bz2'):
+        file_object = bz2.BZ2File(filename, 'wb')
+    elif filename.endswith('.xz'):
+        if lzma is None:
+            raise ValueError('xz compression needs the lzma module')
+        file_object = lzma.open(filename, 'wb')
+    else:
+        file_object = io.open(filename, 'wb')
+    return DratWriter(file_object, binary)
+
+
+def parse_proof(data, binary=True):
+    """Steps of a DRAT proof.
+
+    Returns:
+        list[tuple(str, list[int])]: ('a' or 'd', clause) per step.
+    """
+    steps = []
+    if binary:
+        data = bytearray(data)
+        i = 0
+        while i < len(data):
+            kind = chr(data[i])
+            if kind not in 'ad':
+                raise ValueError('Bad proof step at byte {}'.format(i))
+            i += 1
+            clause = []
+            while True:
+                code, shift = 0, 0
+                while data[i] & 128:
+                    code |= (data[i] & 127) << shift
+                    shift += 7
+                    i += 1
+                code |= data[i] << shift
+                i += 1
+                if code == 0:
+                    break
+                clause.append(-(code >> 1) if code & 1 else code >> 1)
+            steps.append((kind, clause))
+    else:
+        for line in data.decode('ascii').splitlines():
+            tokens = line.split()
+            if not tokens or tokens[0] == 'c':
+                continue
+            kind = 'a'
+            if tokens[0] == 'd':
+                kind = 'd'
+                tokens = tokens[1:]
+            steps.append((kind, [int(token) for token in tokens[:-1]]))
+    return steps
+
+
+def _propagates_to_conflict(clauses, assumed):
+    """Unit propagate `assumed` (a set of true literals) to a conflict."""
+    assumed = set(assumed)
+    changed = True
+    while changed:
+        changed = False
+        for clause in clauses:
+            unassigned = None
+            count = 0
+            for lit in clause:
+                if lit in assumed:
+                    break
+                if -lit not in assumed:
+                    unassigned = lit
+                    count += 1
+                    if count > 1:
+                        break
+            else:
+                if count == 0:
+                    return True
+                assumed.add(unassigned)
+                changed = True
+    return False
+
+
+def check_proof(clauses, data, binary=True):
+    """Check a DRAT proof of unsatisfiability.
+
+    Each added clause must be RUP (its negation propagates to a conflict) or
+    RAT on its first literal; the proof must end up deriving the empty
+    clause. Quadratic at best, so only suitable for small formulas.
+
+    Args:
+        clauses (list[list[int]]): the formula.
+        data (bytes): the proof.
+
+    Returns:
+        bool
+    """
+    formula = [list(clause) for clause in clauses]
+    for kind, clause in parse_proof(data, binary):
+        if kind == 'd':
+            key = sorted(clause)
+            for i, existing in enumerate(formula):
+                if sorted(existing) == key:
+                    del formula[i]
+                    break
+            continue
+        negated = [-lit for lit in clause]
+        if not _propagates_to_conflict(formula, negated):
+            if not clause:
+                return False
+            pivot = clause[0]
+            for other in formula:
+                if -pivot not in other:
+                    continue
+                # The negation of the resolvent of clause and other.
+                assumed = set(negated)
+                assumed.update(-lit for lit in other if lit != -pivot)
+                tautology = any(-lit in assumed for lit in assumed)
+                if not tautology and not _propagates_to_conflict(formula,
+                                                                 assumed):
+                    return False
+        if not clause:
+            return True
+        formula.append(clause)
+    return False
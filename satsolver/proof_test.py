@@ -0,0 +1,93 @@
+import bz2
+import io
+import random
+
+from satsolver.state import Instance
+from satsolver.compact import CompactInstance
+from satsolver.solver import Solver
+from satsolver.proof import DratWriter, check_proof, open_proof, parse_proof
+from satsolver.cube_test import models
+from satsolver.solver_test import pigeonhole
+
+
+def prove(cls, var_count, clauses, binary=True, **solver_args):
+    out = io.BytesIO()
+    proof = DratWriter(out, binary=binary, buffer_size=16)
+    inst = cls(var_count, [list(clause) for clause in clauses])
+    result = Solver(inst, proof=proof, **solver_args).solve()
+    proof.flush()
+    return result, out.getvalue()
+
+
+def test_binary_encoding():
+    out = io.BytesIO()
+    proof = DratWriter(out)
+    proof.add([1, -63, 64])
+    proof.delete([-1])
+    proof.flush()
+    assert out.getvalue() == b'a\x02\x7f\x80\x01\x00d\x03\x00'
+    assert parse_proof(out.getvalue()) == [('a', [1, -63, 64]), ('d', [-1])]
+
+
+def test_text_format():
+    out = io.BytesIO()
+    proof = DratWriter(out, binary=False)
+    proof.add([1, -2])
+    proof.delete([3])
+    proof.add([])
+    proof.flush()
+    assert out.getvalue() == b'1 -2 0\nd 3 0\n0\n'
+    assert parse_proof(out.getvalue(), binary=False) == [
+        ('a', [1, -2]), ('d', [3]), ('a', [])]
+
+
+def test_pigeonhole_proofs_check():
+    var_count, clauses = pigeonhole(4)
+    for cls in (Instance, CompactInstance):
+        for binary in (True, False):
+            # A tiny learned clause budget makes the solver delete clauses.
+            result, data = prove(cls, var_count, clauses, binary,
+                                 max_learnts=4)
+            assert not result.success
+            assert b'd' in data
+            assert check_proof(clauses, data, binary)
+
+
+def test_random_unsat_proofs_check():
+    rng = random.Random(11)
+    checked = 0
+    while checked < 30:
+        var_count = rng.randint(3, 7)
+        clauses = [[rng.choice([-1, 1]) * v
+                    for v in rng.sample(range(1, var_count + 1), 3)]
+                   for _ in range(rng.randint(6 * var_count, 9 * var_count))]
+        if any(True for _ in models(var_count, clauses)):
+            continue
+        result, data = prove(CompactInstance, var_count, clauses)
+        assert not result.success
+        assert check_proof(clauses, data)
+        checked += 1
+
+
+def test_checker_rejects_bad_proofs():
+    clauses = [[1, 2], [-1, 2], [1, -2], [-1, -2]]
+    out = io.BytesIO()
+    proof = DratWriter(out)
+    proof.add([])
+    proof.flush()
+    # The empty clause does not follow by unit propagation alone.
+    assert not check_proof(clauses, out.getvalue())
+    out = io.BytesIO()
+    proof = DratWriter(out)
+    proof.add([1])
+    proof.add([])
+    proof.flush()
+    assert check_proof(clauses, out.getvalue())
+
+
+def test_compressed_proof(tmpdir):
+    path = str(tmpdir.join('proof.drat.bz2'))
+    proof = open_proof(path)
+    proof.add([1, 2])
+    proof.close()
+    assert parse_proof(bz2.BZ2File(path).read()) == [('a', [1, 2])]
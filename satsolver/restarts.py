@@ -0,0 +1,148 @@
+"""Restart policies for Solver.
+
+A restart backtracks towards level 0 and lets the decision heuristic pick a
+fresh set of decisions, keeping learned clauses and variable activities. The
+solver tells its policy about every conflict through `conflict` and asks
+`should_restart` before each decision; `restarted` is called after every
+restart.
+"""
+from collections import deque
+
+
+class RestartPolicy(object):
+    """Base restart policy; never restarts."""
+    def conflict(self, lbd, trail_size):
+        """Called after every conflict.
+
+        Args:
+            lbd (int): LBD of the clause learned from it.
+            trail_size (int): number of assignments when it happened.
+        """
+        pass
+
+    def should_restart(self):
+        return False
+
+    def restarted(self):
+        pass
+
+
+def luby(i):
+    """The i-th term (0-indexed) of the Luby sequence 1 1 2 1 1 2 4 ..."""
+    size, exponent = 1, 0
+    while size < i + 1:
+        exponent += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) >> 1
+        exponent -= 1
+        i = i % size
+    return 1 << exponent
+
+
+class Luby(RestartPolicy):
+    """Restart after unit * luby(i) conflicts for the i-th restart."""
+    def __init__(self, unit=100):
+        self.unit = unit
+        self.restarts = 0
+        self.conflicts = 0
+
+    def conflict(self, lbd, trail_size):
+        self.conflicts += 1
+
+    def should_restart(self):
+        return self.conflicts >= self.unit * luby(self.restarts)
+
+    def restarted(self):
+        self.restarts += 1
+        self.conflicts = 0
+
+
+class Geometric(RestartPolicy):
+    """Restart after `first` conflicts, growing by `factor` each time."""
+    def __init__(self, first=100, factor=1.5):
+        self.limit = first
+        self.factor = factor
+        self.conflicts = 0
+
+    def conflict(self, lbd, trail_size):
+        self.conflicts += 1
+
+    def should_restart(self):
+        return self.conflicts >= self.limit
+
+    def restarted(self):
+        self.limit *= self.factor
+        self.conflicts = 0
+
+
+class Glucose(RestartPolicy):
+    """Dynamic restarts on the moving average of learned clause LBDs.
+
+    Restart once the LBDs of the last `window` conflicts average more than
+    the overall average divided by `margin`: the solver is producing worse
+    clauses than usual. A restart is blocked when the trail is `blocking`
+    times longer than its recent average, since the solver may then be close
+    to a model.
+    """
+    def __init__(self, window=50, margin=0.8, trail_window=5000,
+                 blocking=1.4, blocking_after=10000):
+        self.margin = margin
+        self.blocking = blocking
+        self.blocking_after = blocking_after
+        self.lbds = deque(maxlen=window)
+        self.lbd_sum = 0
+        self.trail_sizes = deque(maxlen=trail_window)
+        self.trail_sum = 0
+        self.conflicts = 0
+        self.lbd_total = 0
+
+    def conflict(self, lbd, trail_size):
+        self.conflicts += 1
+        self.lbd_total += lbd
+
+        trail_sizes = self.trail_sizes
+        if len(trail_sizes) == trail_sizes.maxlen:
+            self.trail_sum -= trail_sizes[0]
+        trail_sizes.append(trail_size)
+        self.trail_sum += trail_size
+        if (self.conflicts > self.blocking_after and
+                len(self.lbds) == self.lbds.maxlen and
+                len(trail_sizes) == trail_sizes.maxlen and
+                trail_size > self.blocking * self.trail_sum / len(trail_sizes)):
+            self._clear()
+
+        lbds = self.lbds
+        if len(lbds) == lbds.maxlen:
+            self.lbd_sum -= lbds[0]
+        lbds.append(lbd)
+        self.lbd_sum += lbd
+
+    def should_restart(self):
+        lbds = self.lbds
+        return (len(lbds) == lbds.maxlen and
+                self.lbd_sum * self.margin / len(lbds) >
+                float(self.lbd_total) / self.conflicts)
+
+    def restarted(self):
+        self._clear()
+
+    def _clear(self):
+        self.lbds.clear()
+        self.lbd_sum = 0
+
+
+POLICIES = {
+    'none': RestartPolicy,
+    'luby': Luby,
+    'geometric': Geometric,
+    'glucose': Glucose,
+}
+
+
+def make_policy(name):
+    """Restart policy by its name in POLICIES."""
+    try:
+        return POLICIES[name]()
+    except KeyError:
+        raise ValueError('Unknown restart policy {}'.format(name))
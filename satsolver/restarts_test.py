@@ -0,0 +1,57 @@
+from satsolver.restarts import Luby, Geometric, Glucose, luby, make_policy
+
+
+def test_luby_sequence():
+    assert [luby(i) for i in range(15)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1,
+                                            1, 2, 4, 8]
+
+
+def test_luby_policy():
+    policy = Luby(unit=2)
+    schedule = []
+    for _ in range(5):
+        conflicts = 0
+        while not policy.should_restart():
+            policy.conflict(3, 10)
+            conflicts += 1
+        policy.restarted()
+        schedule.append(conflicts)
+    assert schedule == [2, 2, 4, 2, 2]
+
+
+def test_geometric_policy():
+    policy = Geometric(first=2, factor=2)
+    for _ in range(2):
+        policy.conflict(3, 10)
+    assert policy.should_restart()
+    policy.restarted()
+    for _ in range(3):
+        policy.conflict(3, 10)
+    assert not policy.should_restart()
+
+
+def test_glucose_restarts_on_worse_lbds():
+    policy = Glucose(window=4)
+    for _ in range(20):
+        policy.conflict(2, 10)
+        assert not policy.should_restart()
+    for _ in range(4):
+        policy.conflict(8, 10)
+    assert policy.should_restart()
+    policy.restarted()
+    assert not policy.should_restart()
+
+
+def test_glucose_blocks_near_a_model():
+    policy = Glucose(window=4, trail_window=4, blocking_after=0)
+    for _ in range(20):
+        policy.conflict(2, 10)
+    for _ in range(3):
+        policy.conflict(8, 10)
+    # A much longer trail than usual clears the LBD window.
+    policy.conflict(8, 100)
+    assert not policy.should_restart()
+
+
+def test_make_policy():
+    assert isinstance(make_policy('glucose'), Glucose)
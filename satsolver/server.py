@@ -0,0 +1,223 @@
+"""Long-lived solving server.
+
+`satsolver --server` reads DIMACS problems back to back from stdin and
+answers each in SAT competition format as soon as it is read;
+`satsolver --server SOCKET` does the same for every client of a Unix socket.
+One process serves any number of problems, so small queries do not pay for
+interpreter startup.
+
+A problem ends once the clauses its header declares are read, or at a '%'
+line, so no separator is needed:
+
+    $ printf 'p cnf 2 2\\n1 2 0\\n-1 0\\np cnf 1 2\\n1 0\\n-1 0\\n' |
+          satsolver --server
+    s SATISFIABLE
+    v -1 2 0
+    s UNSATISFIABLE
+
+A problem that cannot be parsed is answered with a `c error` comment and
+`s UNKNOWN`.
+"""
+import os
+import socket
+import socketserver
+
+from satsolver.util import Unknown
+from satsolver.compact import CompactInstance
+from satsolver.preprocess import Preprocessor
+from satsolver.restarts import make_policy
+from satsolver.solver import Solver
+from satsolver.output import write_result
+
+
+class Problem(object):
+    """One formula read by read_problems."""
+    def __init__(self, var_count, clause_count, error=None):
+        self.var_count = var_count
+        # As declared in the header.
+        self.clause_count = clause_count
+        self.clauses = []
+        # Why the problem could not be read, if it could not.
+        self.error = error
+
+
+def read_problems(lines):
+    """Split a stream of DIMACS text into problems.
+
+    Lines are only read up to the end of each problem, so a problem can be
+    answered before the next one is sent.
+
+    Args:
+        lines (iterable): lines as str or bytes, e.g. a file object.
+
+    Yields:
+        Problem
+    """
+    problem = None
+    clause = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('ascii', 'replace')
+        elms = line.split()
+        if not elms or elms[0][:1] in ('c', '#'):
+            continue
+        if problem is None:
+            if elms[0] == 'p':
+                problem = _header(elms)
+                if problem.clause_count == 0:
+                    yield problem
+                    problem = None
+            elif elms[0][:1] != '%' and elms != ['0']:
+                # Some benchmarks end in a '%' line and a stray 0.
+                yield Problem(0, 0, 'Expected a cnf header, got "{}"'
+                              .format(line.strip()))
+            continue
+        if elms[0][:1] == '%':
+            clause = []
+        else:
+            for token in elms:
+                try:
+                    lit = int(token)
+                except ValueError:
+                    problem.error = 'Could not parse "{}"'.format(token)
+                    continue
+                if lit == 0:
+                    problem.clauses.append(clause)
+                    clause = []
+                elif abs(lit) > problem.var_count:
+                    problem.error = ('Variable {} exceeds the {} declared in '
+                                     'the header'.format(abs(lit),
+                                                         problem.var_count))
+                else:
+                    clause.append(lit)
+            if len(problem.clauses) < problem.clause_count:
+                continue
+        yield problem
+        problem = None
+    if problem is not None:
+        if clause:
+            problem.clauses.append(clause)
+        yield problem
+
+
+def _header(elms):
+    try:
+        if len(elms) != 4 or elms[1] != 'cnf':
+            raise ValueError
+        return Problem(int(elms[2]), int(elms[3]))
+    except ValueError:
+        return Problem(0, 0, 'Unrecognized cnf header: "{}"'
+                       .format(' '.join(elms)))
+
+
+def answer(problem, file_object, restarts='luby', preprocess=False,
+           budgets=None, verify=True, limits=None):
+    """Solve a problem and write the result in competition format.
+
+    Args:
+        problem (Problem):
+        file_object: a text file.
+        restarts (str): restart policy name, see restarts.POLICIES.
+        preprocess (bool): simplify the formula first.
+        budgets (dict[str, float]): preprocessing budgets.
+        verify (bool): re-check models against the clauses.
+        limits (dict): budgets for Solver.solve, e.g. max_time.
+
+    Returns:
+        Success | Failure | Unknown
+    """
+    if problem.error is not None:
+        result = Unknown(problem.error)
+        file_object.write('c error: {}\n'.format(problem.error))
+        write_result(file_object, result)
+        return result
+    var_count, clauses = problem.var_count, problem.clauses
+    reconstruction = None
+    if preprocess:
+        preprocessor = Preprocessor(var_count, clauses, budgets)
+        result = preprocessor.run()
+        if not result.success:
+            write_result(file_object, result)
+            return result
+        clauses = preprocessor.remaining_clauses()
+        reconstruction = preprocessor.extend
+    inst = CompactInstance(var_count=var_count, clauses=clauses)
+    inst.reconstruction = reconstruction
+    solver = Solver(inst, restarts=make_policy(restarts))
+    solver.verify_models = verify
+    result = solver.solve(**(limits or {}))
+    model = inst.solutions[-1] if result.success else None
+    write_result(file_object, result, model)
+    return result
+
+
+def serve_stream(lines, file_object, **options):
+    """Answer every problem read from `lines`, flushing after each.
+
+    Args:
+        lines (iterable): see read_problems.
+        file_object: a text file the answers are written to.
+        options: see answer.
+    """
+    for problem in read_problems(lines):
+        answer(problem, file_object, **options)
+        file_object.flush()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        out = _TextWriter(self.wfile)
+        serve_stream(self.rfile, out, **self.server.options)
+
+
+class _TextWriter(object):
+    """Text-file facade over a socket's binary file."""
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text):
+        self.wfile.write(text.encode('ascii'))
+
+    def flush(self):
+        self.wfile.flush()
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server; each client gets its own thread."""
+    daemon_threads = True
+
+    def __init__(self, path, **options):
+        """
+        Args:
+            path (str): where to create the socket. A stale socket left
+                there is replaced.
+            options: see answer.
+        """
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except socket.error:
+                os.unlink(path)
+            else:
+                raise ValueError('{} is already being served'.format(path))
+            finally:
+                probe.close()
+        self.options = options
+        socketserver.UnixStreamServer.__init__(self, path, _Handler)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def serve_socket(path, **options):
+    """Serve clients of a Unix socket until interrupted."""
+    server = Server(path, **options)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
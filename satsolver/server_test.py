@@ -0,0 +1,66 @@
+import io
+import os
+import socket
+import tempfile
+import threading
+
+from satsolver.server import Server, read_problems, serve_stream
+
+PROBLEMS = (
+    'c two problems back to back\n'
+    'p cnf 2 2\n'
+    '1 2 0\n'
+    '-1 0\n'
+    'p cnf 1 2\n'
+    '1 0 -1\n'
+    '0\n'
+)
+
+
+def test_read_problems():
+    problems = list(read_problems(io.StringIO(PROBLEMS + 'p cnf 0 0\n')))
+    assert [p.clauses for p in problems] == [[[1, 2], [-1]], [[1], [-1]], []]
+    assert all(p.error is None for p in problems)
+
+
+def test_read_problems_stops_at_percent():
+    lines = ['p cnf 2 5\n', '1 2 0\n', '%\n', '0\n', 'p cnf 1 1\n', '1 0\n']
+    problems = list(read_problems(lines))
+    assert [p.clauses for p in problems] == [[[1, 2]], [[1]]]
+
+
+def test_read_problems_reports_errors():
+    lines = [b'p cnf 2 1\n', b'1 3 0\n', b'p dnf 1 1\n', b'p cnf 1 1\n',
+             b'1 0\n']
+    problems = list(read_problems(lines))
+    assert 'Variable 3 exceeds' in problems[0].error
+    assert 'Unrecognized cnf header' in problems[1].error
+    assert problems[2].error is None
+
+
+def test_serve_stream():
+    out = io.StringIO()
+    serve_stream(io.StringIO(PROBLEMS + 'p cnf 1 1\n1 x 0\n'), out)
+    assert out.getvalue() == ('s SATISFIABLE\nv -1 2 0\n'
+                              's UNSATISFIABLE\n'
+                              'c error: Could not parse "x"\ns UNKNOWN\n')
+
+
+def test_serve_socket():
+    path = os.path.join(tempfile.mkdtemp(), 'satsolver.sock')
+    server = Server(path, preprocess=True)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(path)
+        client.sendall(PROBLEMS.encode('ascii'))
+        client.shutdown(socket.SHUT_WR)
+        answers = client.makefile('rb').read()
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+    assert answers == b's SATISFIABLE\nv -1 2 0\ns UNSATISFIABLE\n'
+    assert not os.path.exists(path)
@@ -1,12 +1,12 @@
-from __future__ import print_function
-
-import argparse
-import logging
+import sys
+import threading
+import time
 from collections import namedtuple
 
-import satsolver.parser as parser
-from satsolver.util import Success, Failure
-from satsolver.state import Instance
+from satsolver.util import Success, Failure, Unknown
+from satsolver.state import debug_log, decode
+from satsolver.heuristics import VSIDS, Recipe
+from satsolver.restarts import Luby
 
 
 class Node(object):
@@ -21,275 +21,650 @@ class Node(object):
 
 
 class ImplicationGraph(object):
-    """Implication Graph"""
-    def __init__(self):
-        self.nodes = set()
-        self.lits = set() # set of literals in nodes
+    """Implication Graph
+
+    The graph is kept on the instance rather than rebuilt per decision: every
+    assigned variable on the trail is a node at its decision level, and the
+    edges into an implied node come from the other literals of its reason
+    clause. It is updated for free as the trail grows and shrinks.
+    """
+    def __init__(self, instance):
+        self.instance = instance
+
+    @property
+    def nodes(self):
+        return [self.node(abs(lit)) for lit in self.instance.trail]
 
-        # map lit -> nodes w/assignments
-        # dict[int, list[Node]]
-        self.nodes_by_lit = {}
+    def node(self, var):
+        return Node(var, self.instance.asgs[var], self.instance.levels[var])
 
-        self.fwd_edges = {}
+    def antecedents(self, var):
+        """Literals whose assignment implied `var` (all of them false).
 
-        # maps (x -> y) tuple edge to clause
-        self.edge_annot = {}
+        Returns:
+            list[int]: empty for decisions.
+        """
+        return self.instance.antecedents(var)
 
-    def add_node(self, node):
-        self.nodes.add(node)
-        self.lits.add(node.lit)
-        self.fwd_edges[node] = []
-        self.nodes_by_lit[node.lit] = node
+    def first_uip(self, conflict, on_clause=None, on_var=None):
+        """Cut the graph at the first unique implication point.
 
-    def del_node(self, node):
-        self.lits.remove(node.lit)
-        self.nodes.remove(node)
-        del self.fwd_edges[node]
-        del self.nodes_by_lit[node.lit]
+        Resolves the conflicting clause with the reasons of the current
+        level's literals, latest first, until a single literal of the current
+        level remains.
 
-    def add_edge(self, src, dst, reason):
-        self.fwd_edges[src].append(dst)
-        self.edge_annot[src, dst] = reason
+        Args:
+            conflict (int): index of the conflicting clause.
+            on_clause (callable): called with the index of every clause used,
+                except binary reasons, which are kept inline.
+            on_var (callable): called with every variable resolved on or
+                added to the clause.
+
+        Returns:
+            tuple(list[int], set[int]): (learnt, seen)
+            The learnt clause has the negated UIP first. `seen` holds the
+            variables of its other literals.
+        """
+        instance = self.instance
+        if instance.kernel is not None:
+            return instance.kernel.first_uip(instance, conflict, on_clause,
+                                             on_var)
+        clauses = instance.clauses
+        levels = instance.levels
+        reasons = instance.reasons
+        trail = instance.trail
+        current_level = instance.decision_level
+
+        seen = set()
+        learnt = [None]
+        pending = 0  # current level literals still to be resolved
+        index = len(trail) - 1
+        clause_index = conflict
+        clause = clauses[conflict]
+        skip = 0
+        while True:
+            if on_clause is not None and clause_index >= 0:
+                on_clause(clause_index)
+            for lit in clause[skip:]:
+                var = abs(lit)
+                if var not in seen and levels[var] > 0:
+                    seen.add(var)
+                    if on_var is not None:
+                        on_var(var)
+                    if levels[var] >= current_level:
+                        pending += 1
+                    else:
+                        learnt.append(lit)
+
+            # Next literal of the current level to resolve on.
+            while abs(trail[index]) not in seen:
+                index -= 1
+            uip = trail[index]
+            index -= 1
+            var = abs(uip)
+            seen.remove(var)
+            pending -= 1
+            if pending == 0:
+                break
+            clause_index = reasons[var]
+            if clause_index < 0:
+                # A binary reason: just the other, false literal.
+                clause = (decode(~clause_index),)
+                skip = 0
+            else:
+                clause = clauses[clause_index]
+                # A reason's implied literal is clause[0]; skip it.
+                skip = 1
+
+        learnt[0] = -uip
+        return learnt, seen
+
+    def minimize(self, learnt, seen):
+        """Drop literals implied by the rest of a learnt clause.
+
+        A literal is redundant if every path back from it through the graph
+        ends in a literal of the clause (or a level 0 assignment).
+        """
+        levels = self.instance.levels
+        clause_levels = set(levels[abs(lit)] for lit in learnt[1:])
+        kept = [learnt[0]]
+        for lit in learnt[1:]:
+            if (self.instance.reasons[abs(lit)] is None or
+                    not self._redundant(abs(lit), seen, clause_levels)):
+                kept.append(lit)
+        return kept
+
+    def _redundant(self, var, seen, clause_levels):
+        levels = self.instance.levels
+        reasons = self.instance.reasons
+        stack = [var]
+        added = []
+        while stack:
+            for lit in self.antecedents(stack.pop()):
+                antecedent = abs(lit)
+                if antecedent in seen or levels[antecedent] == 0:
+                    continue
+                if (reasons[antecedent] is None or
+                        levels[antecedent] not in clause_levels):
+                    # Reaches a decision outside the clause.
+                    for v in added:
+                        seen.remove(v)
+                    return False
+                seen.add(antecedent)
+                added.append(antecedent)
+                stack.append(antecedent)
+        return True
 
 
-Decision = namedtuple('Decision', ['level', 'lit', 'value'])
 Implication = namedtuple('Implication', ['clause', 'lit', 'value'])
 
-class Solver(object):
-    """Main Solver"""
-    def __init__(self, instance, recipe=None):
+# Learned clauses with at most this many distinct decision levels ("glue"
+# clauses) are never deleted.
+GLUE_LBD = 2
 
-        self.instance = instance
+CLAUSE_ACTIVITY_DECAY = 0.999
 
-        # Pick variables in this order, if given.
-        self.recipe = recipe
-        self.recipe_index = 0
+# How much the learned clause budget grows after each reduction.
+LEARNTS_GROWTH = 1.1
 
-    # def new_var(self):
-    #     pass
+# Time, memory and interrupts are checked every this many search steps.
+BUDGET_CHECK_INTERVAL = 64
 
-    # def add_clause(self, lits):
-    #     pass
 
-    # def simplify_db(self):
-    #     pass
+def peak_memory():
+    """Peak resident set size of this process, in megabytes."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere.
+    return peak / (1024.0 * 1024 if sys.platform == 'darwin' else 1024.0)
 
-    def solve(self):
-        result = self.decide([], 1)
-        return result
 
-    def determine_next_var(self):
-        """Choose the next variable to assign.
+class Solver(object):
+    """Main Solver"""
+    def __init__(self, instance, recipe=None, max_learnts=None,
+                 heuristic=None, restarts=None, stats=None, proof=None):
+        """
+        Args:
+            instance (Instance):
+            recipe (list[tuple(variable, value)]): decisions to make first.
+            max_learnts (int): initial learned clause budget.
+            heuristic (Heuristic): decision heuristic; VSIDS by default.
+            restarts (RestartPolicy): Luby restarts by default.
+            stats (SolverStats): record statistics of the search in it.
+            proof (DratWriter): log a DRAT proof to it.
+        """
+
+        self.instance = instance
+        self.igraph = ImplicationGraph(instance)
 
-        It will run the recipe if given, otherwise select a random unassigned
-        variable.
+        if heuristic is None:
+            heuristic = VSIDS(instance)
+        # Pick variables in this order, if given.
+        if recipe is not None:
+            heuristic = Recipe(instance, recipe, heuristic)
+        self.heuristic = heuristic
+        self.restarts = restarts if restarts is not None else Luby()
+        self.stats = stats
+        self.proof = proof
+
+        # Learned clause bookkeeping, keyed on clause index: activity is
+        # bumped whenever a clause takes part in a conflict; LBD is the number
+        # of distinct decision levels in the clause when it was learned.
+        self.clause_activity = {}
+        self.clause_lbd = {}
+        self.clause_inc = 1.0
+
+        # Once this many learned clauses are kept, the less useful half is
+        # deleted and the budget grows by LEARNTS_GROWTH.
+        if max_learnts is None:
+            max_learnts = max(len(instance.clauses) // 3, 1000)
+        self.max_learnts = max_learnts
+
+        # False once the clauses are known to be UNSAT without assumptions.
+        self.ok = True
+
+        # Optional hooks for sharing clauses with other solvers on the same
+        # formula: export_clause is called with every learned clause and its
+        # LBD; import_clauses is polled at decision level 0 for clauses to
+        # add.
+        self.export_clause = None
+        self.import_clauses = None
+
+        # Whether solve stores the models it finds on the instance.
+        self.save_solutions = True
+        # Whether solve checks models against every clause. Propagation
+        # already guarantees they hold, so this only guards against bugs.
+        self.verify_models = True
+
+        # Set by interrupt(), from any thread.
+        self._interrupt = threading.Event()
+
+    def new_var(self):
+        """Add a fresh variable to the instance.
 
         Returns:
-            tuple(variable, value)
+            int: the new variable.
         """
-        if self.recipe is not None:
-            if len(self.recipe) > 0:
-                next_var_and_value = self.recipe[0]
-                self.recipe = self.recipe[1:]
-                return next_var_and_value
+        var = self.instance.new_var()
+        self.heuristic.new_var(var)
+        return var
 
-        # Otherwise, choose a variable randomly.
-        next_var = next(iter(self.instance.unasg_vars))
+    def add_clause(self, lits):
+        """Add a clause between calls to solve.
 
-        return next_var, 1
-
-    def bcp(self, decision_level, igraph):
-        """Boolean Constrain Propagation
+        Learned clauses and heuristic state are kept, since they remain
+        implied by the larger formula.
 
         Returns:
             Success | Failure
-            Success result:
-                {lit: Implication}
-            Failure means UNSAT
-
+            Failure means the clauses are now UNSAT.
         """
-        any_unit = True
+        if not self.ok:
+            return Failure('Unsat!')
+        instance = self.instance
+        for lit in lits:
+            if not 0 < abs(lit) <= instance.var_count:
+                raise ValueError('Unknown variable in clause {}'.format(lits))
+
+        self.backtrack(0)
+        # Literals false at level 0 go last, so they are never watched unless
+        # the clause is unit or empty.
+        clause = sorted(lits, key=lambda lit: instance.resolve(lit) == 0)
+        clause_index = instance.add_clause(clause)
+        if not clause or instance.resolve(clause[0]) == 0:
+            self.ok = False
+        elif len(clause) == 1 or instance.resolve(clause[1]) == 0:
+            if instance.resolve(clause[0]) is None:
+                instance.assign(clause[0], clause_index)
+            self.ok = instance.propagate() is None
+        return Success() if self.ok else Failure('Unsat!')
+
+    def interrupt(self):
+        """Make a running (or the next) call to solve return Unknown.
+
+        Safe to call from another thread or a signal handler.
+        """
+        self._interrupt.set()
 
-        implications = {} # Keyed on int
-        while any_unit:
-            any_unit = False
-            for clause_index, clause in enumerate(self.instance.clauses):
-                r = self.instance.is_unit(clause)
-                if not r.success: return r
-                is_unit, implied = r.result
-
-                if is_unit:
-                    lit = abs(implied)
-                    if implied > 0:
-                        r = self.instance.set_lit(lit, 1)
-                        if not r.success: return r
-                        implications[lit] = Implication(clause_index, lit, 1)
-                        value = 1
-                    else:
-                        r = self.instance.set_lit(lit, 0)
-                        if not r.success: return r
-                        implications[lit] = Implication(clause_index, lit, 0)
-                        value = 0
-
-                    logging.debug('implied=%d -> %d', lit, value)
-
-                    # Create a node in the ImplicationGraph if it doesn't yet exist.
-                    if not lit in igraph.nodes_by_lit:
-                        lit_node = Node(lit, value, decision_level)
-                        igraph.add_node(lit_node)
-
-                    # Create any edges
-                    for implicating_lit in clause:
-                        implicating_pair = self.instance.get_value(implicating_lit)
-                        implicating_lit, implicating_value = implicating_pair
-                        if implicating_lit != lit:
-                            # create the implicating lit if needed
-                            if implicating_lit not in igraph.lits:
-                                inode = Node(implicating_lit, implicating_value,
-                                            decision_level)
-                                igraph.add_node(inode)
-                            else:
-                                inode = igraph.nodes_by_lit[implicating_lit]
-
-                            # create an edge for this node
-                            lit_node = igraph.nodes_by_lit[lit]
-                            igraph.add_edge(inode, lit_node, clause)
-                            logging.debug('add edge %s->%s because of %s',
-                                        inode, lit_node, clause)
-
-                    any_unit = True
+    def solve(self, assumptions=(), max_conflicts=None, max_time=None,
+              max_propagations=None, max_memory=None):
+        """Run the search loop until the instance is solved.
 
-        return Success(implications)
+        Assignments live on the instance's trail, one decision level per
+        decision. Every conflict is analyzed into a learned clause; the solver
+        jumps straight back to the level at which that clause becomes unit and
+        asserts it.
 
+        The solver can be called again after adding variables and clauses;
+        everything it learned carries over.
 
-    def decide(self, decisions, level):
-        """
         Args:
-            decisions (list[Decision]):
-            level (int):
+            assumptions (list[int]): literals that must hold for this call
+                only. They are decided first, one per level.
+            max_conflicts (int): give up after this many conflicts.
+            max_time (float): give up after this many seconds.
+            max_propagations (int): give up after this many implied
+                literals.
+            max_memory (float): give up once the process's peak RSS is more
+                megabytes than this.
 
         Returns:
-            Success | Failure
-
+            Success | Failure | Unknown
+            Failure's result is the final conflict: a clause made of negated
+            assumptions that the formula implies (empty if it is UNSAT
+            without assumptions). Unknown means a budget ran out or the
+            solver was interrupted; its result is a dict of statistics of
+            the search so far.
         """
-        # choose a variable to decide
-
-        print('.', end='')
-        logging.debug('______________________________')
-        logging.debug('[level: %d]', level)
-
-
-        # Choose a variable to set.
-        next_var, next_value = self.determine_next_var()
-
-        # Create a new copy of the decisions.
-        decisions = list(decisions)
-        decisions.append(Decision(level, next_var, next_value))
+        instance = self.instance
+        start = time.time()
+        deadline = None if max_time is None else start + max_time
+        conflicts = 0
+        propagations = 0
+        countdown = BUDGET_CHECK_INTERVAL
+        self.backtrack(0)
+        if not self.ok or instance.assign_units() is not None:
+            return self._unsat()
+
+        stats = self.stats
+        propagate = instance.propagate
+        analyze = self.analyze
+        determine_next_var = self.determine_next_var
+        if stats is not None:
+            propagate = stats.counted_propagate(instance)
+            analyze = stats.timed('analysis', analyze)
+            determine_next_var = stats.timed('decision', determine_next_var)
+        debug = instance.diagnostics
+
+        while True:
+            if max_propagations is None:
+                conflict = propagate()
+            else:
+                before = len(instance.trail)
+                conflict = propagate()
+                propagations += len(instance.trail) - before
+                if propagations > max_propagations:
+                    return self._unknown('Propagation budget exhausted',
+                                         start, conflicts, propagations)
+
+            countdown -= 1
+            if countdown == 0:
+                countdown = BUDGET_CHECK_INTERVAL
+                reason = self._check_limits(deadline, max_memory)
+                if reason is not None:
+                    return self._unknown(reason, start, conflicts,
+                                         propagations)
+
+            if conflict is not None:
+                if instance.decision_level == 0:
+                    return self._unsat()
+                conflicts += 1
+                if stats is not None:
+                    stats.conflict()
+                if max_conflicts is not None and conflicts > max_conflicts:
+                    return self._unknown('Conflict budget exhausted',
+                                         start, conflicts, propagations)
+                trail_size = len(instance.trail)
+                learnt, backjump_level = analyze(conflict)
+                if debug:
+                    debug_log('conflict on %d: learnt %s, backjump to %d',
+                              conflict, learnt, backjump_level)
+                self.backtrack(backjump_level)
+                lbd = self.learn(learnt)
+                self.restarts.conflict(lbd, trail_size)
+                self.decay_clause_activity()
+                self.heuristic.decay()
+                if len(instance.learnts) >= self.max_learnts:
+                    self.reduce_db()
+                    self.max_learnts = int(self.max_learnts * LEARNTS_GROWTH)
+                continue
+
+            if self.restarts.should_restart():
+                self.restart()
+
+            if instance.decision_level == 0 and self.import_clauses:
+                for clause in self.import_clauses():
+                    self.add_clause(clause)
+                if not self.ok:
+                    return self._unsat()
+
+            next_lit = None
+            while instance.decision_level < len(assumptions):
+                lit = assumptions[instance.decision_level]
+                value = instance.resolve(lit)
+                if value == 1:
+                    # Already holds; open an empty level to stay in step.
+                    instance.new_decision_level()
+                elif value == 0:
+                    return Failure('Unsat under assumptions',
+                                   result=self.analyze_final(lit))
+                else:
+                    next_lit = lit
+                    break
+
+            if next_lit is None:
+                if len(instance.trail) == instance.var_count:
+                    # If all variables have been assigned, store this as a
+                    # solution.
+                    if self.verify_models and not instance.verify():
+                        raise ValueError('All variables assigned, but UNSAT')
+                    if self.save_solutions:
+                        instance.save_solution()
+                    return Success()
+
+                next_var, next_value = determine_next_var()
+                next_lit = next_var if next_value else -next_var
+
+            instance.new_decision_level()
+            if stats is not None:
+                stats.decisions += 1
+            if debug:
+                debug_log('[level: %d] decide %d',
+                          instance.decision_level, next_lit)
+            instance.assign(next_lit)
+
+    def _unsat(self):
+        self.ok = False
+        if self.proof is not None:
+            self.proof.add([])
+        return Failure('Unsat!', result=[])
+
+    def _check_limits(self, deadline, max_memory):
+        """Reason to stop searching, or None."""
+        if self._interrupt.is_set():
+            self._interrupt.clear()
+            return 'Interrupted'
+        if deadline is not None and time.time() > deadline:
+            return 'Time budget exhausted'
+        if max_memory is not None and peak_memory() > max_memory:
+            return 'Memory budget exhausted'
+        return None
+
+    def _unknown(self, reason, start, conflicts, propagations):
+        # Counts of this call only; propagations are only counted under a
+        # propagation budget. SolverStats, if any, cover every call.
+        partial = {
+            'conflicts': conflicts,
+            'propagations': propagations,
+            'elapsed': time.time() - start,
+        }
+        if self.stats is not None:
+            partial['stats'] = self.stats.as_dict()
+        return Unknown(reason, result=partial)
+
+    def analyze_final(self, lit):
+        """Find the assumptions that force an assumed literal false.
 
-        logging.debug('try_assignment(level=%d, %d->%d)', level, next_var,
-                    next_value)
-        result = self.try_assignment(level, decisions, next_var, next_value)
+        Returns:
+            list[int]: a clause of negated assumptions, starting with -lit.
+        """
+        instance = self.instance
+        levels = instance.levels
+        reasons = instance.reasons
+        trail = instance.trail
+
+        conflict = [-lit]
+        if levels[abs(lit)] == 0:
+            return conflict
+        seen = set([abs(lit)])
+        for i in range(len(trail) - 1, instance.trail_lim[0] - 1, -1):
+            var = abs(trail[i])
+            if var not in seen:
+                continue
+            if reasons[var] is None:
+                conflict.append(-trail[i])
+            else:
+                for antecedent in instance.antecedents(var):
+                    if levels[abs(antecedent)] > 0:
+                        seen.add(abs(antecedent))
+        return conflict
+
+    def analyze(self, conflict):
+        """Learn a clause from a conflict.
 
-        if not result.success:
-            logging.debug('caused unsat: try_assignment(level=%d, %d->%d)',
-                        level, next_var, next_value)
-            # try the other branch
+        Args:
+            conflict (int): index of the conflicting clause.
 
-            inverted_value = 1 - next_value
+        Returns:
+            tuple(list[int], int): (clause, level)
+            The first UIP clause, minimized, with the negated UIP first; level
+            is the highest decision level among the rest of the clause (0 if
+            there are none), and its literal of that level comes second.
+        """
+        levels = self.instance.levels
+        learnt, seen = self.igraph.first_uip(conflict,
+                                             self.bump_clause_activity,
+                                             self.heuristic.bump)
+        learnt = self.igraph.minimize(learnt, seen)
 
-            # remove last decision
-            decisions = decisions[:-1]
+        backjump_level = 0
+        for i in range(1, len(learnt)):
+            level = levels[abs(learnt[i])]
+            if level > backjump_level:
+                backjump_level = level
+                learnt[1], learnt[i] = learnt[i], learnt[1]
+        return learnt, backjump_level
 
-            # add new decision
-            decisions.append(Decision(level, next_var, inverted_value))
+    def learn(self, learnt):
+        """Store a learned clause and assert its first literal.
 
-            r = self.try_assignment(level, decisions, next_var, inverted_value)
-            # If we reached UNSAT here, then there's no solution here, so propagate
-            # this issue up.
-            if not r.success:
-                return r
+        Must be called after backjumping, while the clause is unit.
 
+        Returns:
+            int: the clause's LBD.
+        """
+        levels = self.instance.levels
+        clause_index = self.instance.add_clause(learnt, learnt=True)
+        lbd = len(set(levels[abs(lit)] for lit in learnt[1:])) + 1
+        self.clause_activity[clause_index] = self.clause_inc
+        self.clause_lbd[clause_index] = lbd
+        self.instance.assign(learnt[0], clause_index)
+        if self.stats is not None:
+            self.stats.learned += 1
+        if self.proof is not None:
+            self.proof.add(learnt)
+        if self.export_clause is not None:
+            self.export_clause(learnt, lbd)
+        return lbd
+
+    def bump_clause_activity(self, clause_index):
+        activity = self.clause_activity
+        if clause_index not in activity:
+            return
+        activity[clause_index] += self.clause_inc
+        if activity[clause_index] > 1e20:
+            for learnt in activity:
+                activity[learnt] *= 1e-20
+            self.clause_inc *= 1e-20
+
+    def decay_clause_activity(self):
+        self.clause_inc /= CLAUSE_ACTIVITY_DECAY
+
+    def reduce_db(self):
+        """Delete the less useful half of the learned clauses.
+
+        Glue clauses and clauses that are the reason for a current assignment
+        are kept; the rest are ranked by LBD, then activity.
+        """
+        instance = self.instance
+        activity = self.clause_activity
+        lbd = self.clause_lbd
+        candidates = [c for c in instance.learnts
+                      if lbd[c] > GLUE_LBD and not instance.is_locked(c)]
+        candidates.sort(key=lambda c: (-lbd[c], activity[c]))
+        victims = candidates[:len(instance.learnts) // 2]
+        if self.proof is not None:
+            for clause_index in victims:
+                self.proof.delete(instance.clauses[clause_index])
+        instance.delete_clauses(victims)
+        for clause_index in victims:
+            del activity[clause_index]
+            del lbd[clause_index]
+        if self.stats is not None:
+            self.stats.deleted += len(victims)
+        if self.instance.diagnostics:
+            debug_log('reduce_db: deleted %d learned clauses', len(victims))
+
+    def restart(self):
+        """Give the heuristic a fresh start.
+
+        Learned clauses and variable activities are kept. So are the
+        decisions the heuristic would make again right away (trail reuse),
+        unless clauses wait to be imported at level 0.
+        """
+        if self.import_clauses is not None:
+            level = 0
         else:
-            # If all variables have been assigned, store this as a solution.
-            if len(self.instance.unasg_vars) == 0:
-                if self.instance.verify():
-                    self.instance.save_solution()
-                    print('satisfied!')
-                else:
-                    raise ValueError('All variables assigned, but UNSAT')
-
-        return Success()
+            level = self.heuristic.restart_level()
+        if self.instance.diagnostics:
+            debug_log('restart to level %d', level)
+        self.backtrack(level)
+        self.restarts.restarted()
+        if self.stats is not None:
+            self.stats.restarts += 1
 
+    def determine_next_var(self):
+        """Choose the next variable to assign.
 
-    def try_assignment(self, level, decisions, lit, value):
-        logging.debug('try_assignment: lit = %d -- setting to %d', lit, value)
+        It will run the recipe if given, otherwise ask the decision
+        heuristic.
 
-        # assign it True
-        r = self.instance.set_lit(lit, value)
-        if not r.success:
-            return r
+        Returns:
+            tuple(variable, value)
+        """
+        return self.heuristic.next_decision()
+
+    def backtrack(self, level):
+        """Backtrack the instance, handing unassigned variables back to the
+        heuristic."""
+        instance = self.instance
+        if level < instance.decision_level:
+            unassigned = self.heuristic.unassigned
+            for lit in instance.trail[instance.trail_lim[level]:]:
+                unassigned(abs(lit), 1 if lit > 0 else 0)
+            instance.backtrack(level)
+
+    def bcp(self):
+        """Boolean Constrain Propagation
 
-        igraph = ImplicationGraph()
+        Propagates the pending assignments through the instance's watched
+        literals, so only clauses watching a newly falsified literal are
+        visited. Implied literals join the implication graph through their
+        reasons.
 
-        # build the graph
-        for decision in decisions:
-            # create a node for each decision
-            node = Node(decision.lit, decision.value, decision.level)
-            igraph.add_node(node)
-            logging.debug('adding node %s', node)
+        Returns:
+            Success | Failure
+            Success result:
+                {lit: Implication}
+            Failure means UNSAT
 
-        logging.debug('running bcp...')
-        r = self.bcp(level, igraph)
-        if not r.success: # Meaning UNSAT:
-            logging.debug('decision led to UNSAT. unsetting')
-            self.instance.unset_lit(lit)
-            # If it's UNSAT, we need to backtrack
-            return Failure('Unsat!')
+        """
+        instance = self.instance
+        trail = instance.trail
+        first_implied = len(trail)
 
-        # Otherwise it was a Success
-        implications = r.result
+        conflict = instance.propagate()
+        if conflict is not None:
+            instance.conflict.clause = instance.clauses[conflict]
+            return instance._failure()
 
-        if len(self.instance.unasg_vars) > 0:
-            # increase the decision level
-            r = self.decide(decisions, level+1)
-            self.instance.unset_lit(lit)
-            return r
+        implications = {} # Keyed on int
+        for implied in trail[first_implied:]:
+            lit = abs(implied)
+            value = 1 if implied > 0 else 0
+            clause_index = instance.reasons[lit]
+            implications[lit] = Implication(clause_index, lit, value)
+        if instance.diagnostics:
+            debug_log('bcp: implied %s', trail[first_implied:])
 
-        # otherwise, return igraph
-        return Success(result=(igraph, None))
+        return Success(implications)
 
 
-def solve(instance):
+def solve(instance, restarts=None, stats=None, **limits):
     """
     Args:
         instance (Instance): parsed SAT instance
+        restarts (RestartPolicy): see Solver.
+        stats (SolverStats): see Solver.
+        limits: budgets for Solver.solve, e.g. max_time.
 
     Returns:
-        Success | Failure
+        Success | Failure | Unknown
     """
 
-    solver = Solver(instance)
-    result = solver.solve()
-    if not result.success:
-        print('Unsatisfiable')
-
+    solver = Solver(instance, restarts=restarts, stats=stats)
+    result = solver.solve(**limits)
+    _report(result)
     return result
 
 
-def main():
-    cmdline_parser = argparse.ArgumentParser()
-    cmdline_parser.add_argument('filename', action='store', type=str)
-    args = cmdline_parser.parse_args()
-
-    file_parser = parser.CNFFileParser(args.filename)
-    inst = Instance(var_count=file_parser.var_count, clauses=file_parser.clauses)
+def _report(result):
+    if isinstance(result, Unknown):
+        print('Unknown: {}'.format(result.reason))
+    elif not result.success:
+        print('Unsatisfiable')
 
-    result = solve(inst)
-    if result.success:
-        # Print the solutions
-        print('Satisfying solutions:')
-        for solution in inst.solutions:
-            print(solution)
 
 if __name__ == '__main__':
+    from satsolver.cli import main
     main()
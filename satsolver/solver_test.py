@@ -1,7 +1,13 @@
+import threading
+
 import pytest
 
+from satsolver import state
 from satsolver.state import Instance
 from satsolver.solver import Solver, ImplicationGraph
+from satsolver.restarts import Luby
+from satsolver.stats import SolverStats
+from satsolver.util import Unknown
 
 # -- is_unit --
 
@@ -85,6 +91,32 @@ def test_is_unit_inv_one1_oneNone_one0():
     assert is_unit
     assert implied == 3
 
+def test_clause_status_codes():
+    clauses = [[1, -2, 3]]
+    inst = Instance(var_count=3, clauses=clauses)
+    assert inst.clause_status(clauses[0]) == state.UNRESOLVED
+    assert inst.try_set(1, 0) == state.OK
+    assert inst.try_set(2, 1) == state.OK
+    assert inst.clause_status(clauses[0]) == state.UNIT
+    assert inst.implied == 3
+    assert inst.try_set(3, 0) == state.OK
+    assert inst.clause_status(clauses[0]) == state.CONFLICT
+    assert inst.conflict.clause is clauses[0]
+    assert inst.try_set(3, 1) == state.CONFLICT
+    assert (inst.conflict.lit, inst.conflict.value) == (3, 1)
+    inst.undo(2)
+    assert inst.try_set(3, 1) == state.OK
+    assert inst.clause_status(clauses[0]) == state.SATISFIED
+
+def test_failures_explained_only_in_diagnostic_mode(monkeypatch):
+    inst = Instance(var_count=1, clauses=[])
+    inst.set_lit(1, 1)
+    assert inst.set_lit(1, 0).reason == ''
+    monkeypatch.setattr(Instance, 'diagnostics', True)
+    r = inst.set_lit(1, 0)
+    assert not r.success
+    assert r.reason == 'Conflict! Tried 1=0 but its already 1'
+
 # -- bcp --
 
 def test_bcp_simplest():
@@ -92,7 +124,7 @@ def test_bcp_simplest():
     inst = Instance(var_count=2, clauses=clauses)
     # if var 1 is 1, then var 2 must be 1
     inst.set_lit(1, 0)
-    Solver(inst).bcp(0, ImplicationGraph())
+    Solver(inst).bcp()
     assert inst.asgs[2] == 1
 
 
@@ -101,7 +133,7 @@ def test_bcp_2cascade():
     clauses = [[1, 2], [-2, 3]]
     inst = Instance(var_count=3, clauses=clauses)
     inst.set_lit(1, 0)
-    Solver(inst).bcp(0, ImplicationGraph())
+    Solver(inst).bcp()
     assert inst.asgs[2] == 1
     assert inst.asgs[3] == 1
 
@@ -113,7 +145,7 @@ def test_bcp_3cascade():
     inst = Instance(var_count=6, clauses=clauses)
     inst.set_lit(1, 0)
     inst.set_lits([4, 5], 0)
-    Solver(inst).bcp(0, ImplicationGraph())
+    Solver(inst).bcp()
     assert inst.asgs[2] == 1
     assert inst.asgs[3] == 1
     assert inst.asgs[6] == 0
@@ -123,7 +155,7 @@ def test_bcp_detect_conflict():
     inst = Instance(var_count=6, clauses=clauses)
     inst.set_lit(1, 0) # will imply 2 == 1
     inst.set_lit(3, 0) # now the second clause is UNSAT
-    r = Solver(inst).bcp(0, ImplicationGraph())
+    r = Solver(inst).bcp()
     assert not r.success
 
 def test_bcp_detect_unsat():
@@ -131,9 +163,52 @@ def test_bcp_detect_unsat():
     #
     inst = Instance(var_count=6, clauses=clauses)
     inst.set_lit(1, 0) # will imply 2 == 1
-    r = Solver(inst).bcp(0, ImplicationGraph())
+    r = Solver(inst).bcp()
     assert not r.success
 
+def test_bcp_moves_watch():
+    clauses = [[1, 2, 3]]
+    inst = Instance(var_count=3, clauses=clauses)
+    assert inst.watches[1] == [0]
+    assert inst.watches[2] == [0]
+    inst.set_lit(1, 0)
+    Solver(inst).bcp()
+    # Nothing is implied yet, but the clause now watches 3 instead of 1.
+    assert inst.asgs[2] is None
+    assert inst.watches[1] == []
+    assert inst.watches[3] == [0]
+
+
+def test_bcp_binary_implication_lists():
+    clauses = [[1, 2], [-2, 3, 4]]
+    inst = Instance(var_count=4, clauses=clauses)
+    assert inst.binaries[1] == [(2, 0)]
+    assert inst.binaries[2] == [(1, 0)]
+    assert inst.watches[1] == []
+    inst.set_lit(1, 0)
+    Solver(inst).bcp()
+    assert inst.asgs[2] == 1
+    # The reason is the other literal, inline, not the clause.
+    assert inst.reasons[2] < 0
+    assert inst.antecedents(2) == [1]
+    inst.delete_clauses([0])
+    assert inst.binaries[1] == inst.binaries[2] == []
+
+
+def test_bcp_after_undo():
+    clauses = [[1, 2], [-2, 3]]
+    inst = Instance(var_count=3, clauses=clauses)
+    inst.set_lit(1, 0)
+    Solver(inst).bcp()
+    assert inst.asgs[3] == 1
+    inst.undo(0)
+    assert inst.asgs == {1: None, 2: None, 3: None}
+    assert inst.trail == []
+    inst.set_lit(3, 0)
+    Solver(inst).bcp()
+    assert inst.asgs[2] == 0
+    assert inst.asgs[1] == 1
+
 # -------
 
 def test_solver():
@@ -154,6 +229,201 @@ def test_bcp_igraph():
     # TODO: Add some assertions.
 
 
+def test_solver_sat():
+    clauses = [[1, 2, 3], [-1, -2], [-2, -3], [-1, -3], [2, 3]]
+    inst = Instance(var_count=3, clauses=clauses)
+    assert Solver(inst).solve().success
+    assert len(inst.solutions) == 1
+    solution = inst.solutions[0]
+    assert solution[1] == 0
+    assert solution[2] != solution[3]
+
+
+def test_solver_unsat():
+    clauses = [[1, 2], [1, -2], [-1, 2], [-1, -2]]
+    inst = Instance(var_count=2, clauses=clauses)
+    assert not Solver(inst).solve().success
+
+
+def test_solver_unit_clauses():
+    clauses = [[1], [-1, 2], [-2, 3, 4]]
+    inst = Instance(var_count=4, clauses=clauses)
+    assert Solver(inst).solve().success
+    solution = inst.solutions[0]
+    assert solution[1] == 1
+    assert solution[2] == 1
+
+
+def test_solver_deep_search():
+    # Every decision opens a new level; the search must not recurse.
+    var_count = 3000
+    clauses = [[i, i + 1] for i in range(1, var_count)]
+    recipe = [(i, 1) for i in range(1, var_count + 1)]
+    inst = Instance(var_count=var_count, clauses=clauses)
+    assert Solver(inst, recipe=recipe).solve().success
+
+
+def decide_all(inst, lits):
+    """Decide each literal on a new level, propagating in between."""
+    conflict = None
+    for lit in lits:
+        inst.new_decision_level()
+        inst.assign(lit)
+        conflict = inst.propagate()
+    return conflict
+
+
+def test_analyze_backjumps_over_unrelated_levels():
+    clauses = [[-1, -3, 4], [-1, -3, -4]]
+    inst = Instance(var_count=4, clauses=clauses)
+    conflict = decide_all(inst, [1, 2, 3])
+    assert conflict is not None
+    learnt, level = Solver(inst).analyze(conflict)
+    assert learnt == [-3, -1]
+    # Level 2 (the decision on 2) played no part, so jump straight to 1.
+    assert level == 1
+
+
+def test_analyze_first_uip():
+    clauses = [[-2, 3], [-3, 4], [-3, 5], [-4, -5, -1]]
+    inst = Instance(var_count=5, clauses=clauses)
+    conflict = decide_all(inst, [1, 2])
+    learnt, level = Solver(inst).analyze(conflict)
+    # 3 is the first UIP of level 2, not the decision on 2.
+    assert learnt == [-3, -1]
+    assert level == 1
+
+
+def test_analyze_minimizes():
+    clauses = [[-1, 6], [-6, -1, -2, -3], [-2, 3]]
+    inst = Instance(var_count=6, clauses=clauses)
+    conflict = decide_all(inst, [1, 2])
+    learnt, level = Solver(inst).analyze(conflict)
+    # -6 is implied by -1, so it is dropped from the clause.
+    assert learnt == [-2, -1]
+    assert level == 1
+
+
+def test_implication_graph_antecedents():
+    clauses = [[-1, 2], [-2, -3, 4]]
+    inst = Instance(var_count=4, clauses=clauses)
+    decide_all(inst, [1, 3])
+    igraph = ImplicationGraph(inst)
+    assert igraph.antecedents(1) == []
+    assert igraph.antecedents(2) == [-1]
+    assert sorted(igraph.antecedents(4)) == [-3, -2]
+    assert [node.lit for node in igraph.nodes] == [1, 2, 3, 4]
+    assert igraph.node(4).level == 2
+
+
+def pigeonhole(holes):
+    """Clauses putting holes + 1 pigeons into holes, which is UNSAT."""
+    var = lambda pigeon, hole: pigeon * holes + hole + 1
+    clauses = [[var(p, h) for h in range(holes)] for p in range(holes + 1)]
+    for h in range(holes):
+        for p in range(holes + 1):
+            for q in range(p + 1, holes + 1):
+                clauses.append([-var(p, h), -var(q, h)])
+    return (holes + 1) * holes, clauses
+
+
+def test_solver_learnts_within_budget():
+    var_count, clauses = pigeonhole(4)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    solver = Solver(inst, max_learnts=10)
+    assert not solver.solve().success
+    assert solver.max_learnts > 10
+    assert len(inst.learnts) < solver.max_learnts
+    assert None in inst.clauses
+
+
+def test_incremental_add_clause():
+    inst = Instance(var_count=2, clauses=[[1, 2]])
+    solver = Solver(inst)
+    assert solver.solve().success
+    assert solver.add_clause([-1]).success
+    assert solver.solve().success
+    assert inst.solutions[-1][1] == 0
+    assert inst.solutions[-1][2] == 1
+    assert not solver.add_clause([-2]).success
+    assert not solver.solve().success
+
+
+def test_incremental_new_var():
+    inst = Instance(var_count=1, clauses=[[1]])
+    solver = Solver(inst)
+    var = solver.new_var()
+    assert var == 2
+    solver.add_clause([-1, -var])
+    assert solver.solve().success
+    assert inst.solutions[-1] == {1: 1, 2: 0}
+
+
+def test_incremental_keeps_learnts():
+    var_count, clauses = pigeonhole(3)
+    # Every clause only applies while the selector is assumed.
+    selector = var_count + 1
+    clauses = [clause + [-selector] for clause in clauses]
+    inst = Instance(var_count=selector, clauses=clauses)
+    solver = Solver(inst)
+    r = solver.solve(assumptions=[selector])
+    assert not r.success
+    assert r.result == [-selector]
+    learnts = len(inst.learnts)
+    assert learnts > 0
+    assert solver.solve().success
+    assert len(inst.learnts) >= learnts
+
+
+def test_solve_under_assumptions():
+    clauses = [[-1, 2], [-2, 3], [-4, -3]]
+    inst = Instance(var_count=5, clauses=clauses)
+    solver = Solver(inst)
+    assert solver.solve(assumptions=[1, 5]).success
+    assert inst.solutions[-1][3] == 1
+    r = solver.solve(assumptions=[5, 1, 4])
+    assert not r.success
+    # 5 played no part in the conflict.
+    assert sorted(r.result) == [-4, -1]
+    # Assumptions only hold for one call.
+    assert solver.solve(assumptions=[4]).success
+    assert inst.solutions[-1][1] == 0
+
+
+def test_solve_under_contradictory_assumptions():
+    inst = Instance(var_count=2, clauses=[[1, 2]])
+    solver = Solver(inst)
+    r = solver.solve(assumptions=[-1, -2])
+    assert not r.success
+    assert sorted(r.result) == [1, 2]
+    assert solver.solve().success
+
+
+def test_delete_clauses():
+    clauses = [[1, 2, 3]]
+    inst = Instance(var_count=3, clauses=clauses)
+    learnt = inst.add_clause([-1, -2, 3], learnt=True)
+    assert inst.learnts == [learnt]
+    assert inst.watches[-1] == [learnt]
+    inst.delete_clauses([learnt])
+    assert inst.learnts == []
+    assert inst.watches[-1] == []
+    assert inst.clauses[learnt] is None
+
+
+def test_backtrack():
+    clauses = [[-1, 2], [-3, 4]]
+    inst = Instance(var_count=4, clauses=clauses)
+    assert decide_all(inst, [1, 3]) is None
+    assert inst.decision_level == 2
+    assert inst.levels[4] == 2
+    inst.backtrack(1)
+    assert inst.decision_level == 1
+    assert inst.trail == [1, 2]
+    assert inst.asgs[3] is None
+    assert inst.asgs[4] is None
+
+
 def test_verify_sat():
     clauses = [[1, -2], [4, 5, -6]]
     inst = Instance(var_count=6, clauses=clauses)
@@ -168,3 +438,86 @@ def test_verify_unsat():
     inst.set_lits([2, 4], 1)
     inst.set_lits([1, 3, 5, 6], 0)
     assert not inst.verify()
+
+
+def test_restarts_keep_learned_clauses():
+    var_count, clauses = pigeonhole(5)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    solver = Solver(inst, restarts=Luby(unit=1))
+    assert not solver.solve().success
+    assert solver.restarts.restarts > 0
+
+
+def test_restart_reuses_trail():
+    clauses = [[-1, 2], [-3, 4], [5, 6]]
+    inst = Instance(var_count=6, clauses=clauses)
+    solver = Solver(inst)
+    for var in [1, 1, 1, 3, 5, 5]:
+        solver.heuristic.bump(var)
+    assert decide_all(inst, [1, 3]) is None
+    # 5 is more active than the decision at level 2, so only level 1 stays.
+    solver.restart()
+    assert inst.decision_level == 1
+    assert inst.trail == [1, 2]
+
+
+def test_conflict_budget():
+    var_count, clauses = pigeonhole(5)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    solver = Solver(inst, stats=SolverStats())
+    r = solver.solve(max_conflicts=10)
+    assert isinstance(r, Unknown)
+    assert r.result['conflicts'] == 11
+    assert r.result['stats']['conflicts'] == 11
+    # Learned clauses carry over to the next call.
+    assert not solver.solve().success
+
+
+def test_propagation_budget():
+    var_count, clauses = pigeonhole(5)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    r = Solver(inst).solve(max_propagations=20)
+    assert isinstance(r, Unknown)
+    assert r.reason == 'Propagation budget exhausted'
+    assert r.result['propagations'] > 20
+
+
+@pytest.mark.parametrize('limits', [{'max_time': 0}, {'max_memory': 0}])
+def test_time_and_memory_budgets(limits):
+    var_count, clauses = pigeonhole(6)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    r = Solver(inst).solve(**limits)
+    assert isinstance(r, Unknown)
+    assert r.result['elapsed'] >= 0
+
+
+def test_interrupt():
+    var_count, clauses = pigeonhole(5)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    solver = Solver(inst)
+    solver.interrupt()
+    r = solver.solve()
+    assert isinstance(r, Unknown)
+    assert r.reason == 'Interrupted'
+    # The interrupt only stops one call.
+    assert not solver.solve().success
+
+
+def test_interrupt_from_another_thread():
+    var_count, clauses = pigeonhole(9)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    solver = Solver(inst)
+    timer = threading.Timer(0.1, solver.interrupt)
+    timer.start()
+    r = solver.solve()
+    timer.join()
+    assert isinstance(r, Unknown)
+
+
+@pytest.mark.parametrize('preprocess', [False, True])
+def test_empty_clause_in_file_is_unsat(tmpdir, capsys, preprocess):
+    from satsolver import cli
+    path = tmpdir.join('empty.cnf')
+    path.write('p cnf 2 2\n1 2 0\n0\n')
+    cli.main([str(path)] + (['--preprocess'] if preprocess else []))
+    assert capsys.readouterr().out == 'Unsatisfiable\n'
@@ -1,22 +1,168 @@
-import logging
-
 from satsolver.util import Success, Failure
 
+# Status codes returned by the hot-path calls (try_set, clause_status), so
+# they allocate nothing. Details of a CONFLICT go to Instance.conflict.
+OK = 0
+CONFLICT = 1
+SATISFIED = 2
+UNIT = 3
+UNRESOLVED = 4
+
+# Shared by every successful call that has no result to return.
+SUCCESS = Success()
+
+
+class ConflictRecord(object):
+    """The last conflict a hot-path call ran into, overwritten in place.
+
+    Either `clause` is set (a conflicting clause), or `lit`, `value` and
+    `current` are (an assignment that contradicts the current one).
+    """
+    __slots__ = ('clause', 'lit', 'value', 'current')
+
+    def __init__(self):
+        self.clause = None
+        self.lit = 0
+        self.value = None
+        self.current = None
+
+    def describe(self):
+        """Human-readable reason, only built in diagnostic mode."""
+        if self.clause is not None:
+            return 'UNSAT on clause {}'.format(self.clause)
+        return ('Conflict! Tried {}={} but its already {}'
+                .format(self.lit, self.value, self.current))
+
+
+def debug_log(msg, *args):
+    """logging.debug, for diagnostic mode; logging is only imported then."""
+    import logging
+    logging.debug(msg, *args)
+
+
+def encode(lit):
+    """DIMACS literal -> literal code, 2 * var + sign (1 if negated)."""
+    return (-lit << 1) | 1 if lit < 0 else lit << 1
+
+
+def decode(code):
+    """Literal code -> DIMACS literal."""
+    return -(code >> 1) if code & 1 else code >> 1
+
 
 class Instance(object):
     """Primary state for Solver"""
+    # Build reasons for failures and log conflicts; off, the public calls
+    # return bare Failures so conflicts cost no string formatting.
+    diagnostics = False
+    # Compiled propagate and first_uip for this kind of instance, if any
+    # (see compact).
+    kernel = None
+
     def __init__(self, var_count, clauses):
+        """
+        Args:
+            var_count (int):
+            clauses (iterable[list[int]]): consumed one clause at a time, so
+                this can be a stream that is still being read (see
+                parser.CNFStream).
+        """
         self.var_count = var_count
-        self.clauses = clauses
+        self.clauses = []
 
         # maps variables -> 0, 1, or None. Note that SAT variables are 1-indexed.
-        self.asgs = {i + 1: None for i in xrange(var_count)}
+        self.asgs = {i + 1: None for i in range(var_count)}
 
         self.asg_vars = set()
         self.unasg_vars = set(i + 1 for i in range(var_count))
 
+        # Literals made true, in assignment order. The trail doubles as the
+        # propagation queue: trail[qhead:] has not been propagated yet.
+        self.trail = []
+        self.qhead = 0
+
+        # trail_lim[level - 1] is where decision level `level` starts in the
+        # trail. Level 0 holds assignments made before any decision.
+        self.trail_lim = []
+
+        # maps var -> decision level it was assigned at.
+        self.levels = {}
+
+        # maps var -> what implied it: None for decisions, the index of a
+        # clause whose first literal it is, or, for binary clauses, the
+        # clause's other (false) literal inline, as ~encode(lit) < 0.
+        self.reasons = {}
+
+        # Two watched literals: maps lit -> indices of the clauses watching it.
+        # A clause of three or more literals always watches clause[0] and
+        # clause[1]; single-literal clauses are kept in `units` instead.
+        self.watches = {}
+        # Binary clauses are implication lists instead: maps lit -> list of
+        # (other literal, clause index) for the binary clauses containing it,
+        # so once lit is false each other literal is implied directly.
+        self.binaries = {}
+        for i in range(1, var_count + 1):
+            self.watches[i] = []
+            self.watches[-i] = []
+            self.binaries[i] = []
+            self.binaries[-i] = []
+        self.units = []
+
+        # Filled in by the hot-path calls that return CONFLICT.
+        self.conflict = ConflictRecord()
+        # The implied literal, after clause_status returns UNIT.
+        self.implied = 0
+
+        # Learned clauses are appended to `clauses` like any other clause, so
+        # propagation sees them; their indices are kept here, oldest first.
+        # A deleted clause leaves None behind so clause indices stay stable.
+        self.learnts = []
+
+        for clause in clauses:
+            self.add_clause(clause)
+
         # Store any valid satisfying assignments here.
         self.solutions = []
+        # Maps a model of these clauses to one of the formula they were
+        # simplified from (see preprocess.Preprocessor.extend), if any.
+        self.reconstruction = None
+
+    def new_var(self):
+        """Add a variable, unassigned.
+
+        Returns:
+            int: the new variable.
+        """
+        self.var_count += 1
+        var = self.var_count
+        self.asgs[var] = None
+        self.unasg_vars.add(var)
+        self.watches[var] = []
+        self.watches[-var] = []
+        self.binaries[var] = []
+        self.binaries[-var] = []
+        return var
+
+    def watch_clause(self, clause_index):
+        """Start watching the first two literals of a clause."""
+        clause = self.clauses[clause_index]
+        if len(clause) < 2:
+            self.units.append(clause_index)
+        elif len(clause) == 2:
+            self.binaries[clause[0]].append((clause[1], clause_index))
+            self.binaries[clause[1]].append((clause[0], clause_index))
+        else:
+            self.watches[clause[0]].append(clause_index)
+            self.watches[clause[1]].append(clause_index)
+
+    def antecedents(self, var):
+        """The false literals that implied `var`; empty for decisions."""
+        reason = self.reasons[var]
+        if reason is None:
+            return []
+        elif reason < 0:
+            return [decode(~reason)]
+        return self.clauses[reason][1:]
 
     def resolve(self, lit):
         """Resolve the value of a literal if set, None otherwise.
@@ -34,6 +180,33 @@ class Instance(object):
             else:
                 return val
 
+    def clause_status(self, clause):
+        """Classify a clause under the current assignment.
+
+        Returns:
+            int: SATISFIED, UNIT (with the implied literal in `implied`),
+            UNRESOLVED (two or more unassigned literals) or CONFLICT (with
+            the clause in `conflict`).
+        """
+        unassigned = 0
+        for lit in clause:
+            val = self.resolve(lit)
+            if val is None:
+                if unassigned:
+                    # No need to look further unless a literal is true.
+                    unassigned = None
+                elif unassigned is not None:
+                    unassigned = lit
+            elif val == 1:
+                return SATISFIED
+        if unassigned is None:
+            return UNRESOLVED
+        elif unassigned:
+            self.implied = unassigned
+            return UNIT
+        self.conflict.clause = clause
+        return CONFLICT
+
     def is_unit(self, clause):
         """Determine if a clause is unit (has one unassigned variable).
 
@@ -46,82 +219,264 @@ class Instance(object):
             Note that the literal may be negated, thus the implied value is
             False.
         """
-        default_ret = (False, -1)
-        count0 = 0
-        count_unasg = 0
-        last_unit = -1 # Which literal is now implied
+        status = self.clause_status(clause)
+        if status == UNIT:
+            return Success((True, self.implied))
+        elif status == CONFLICT:
+            return self._failure()
+        return Success((False, -1))
 
-        for lit in clause:
-            val = self.resolve(lit)
-            if val == 0:
-                count0 += 1
-            elif val == 1:
-                # Any True assignment fails unit
-                return Success(default_ret)
-            elif val is None:
-                count_unasg += 1
-                last_unit = lit
-                if count_unasg > 1:
-                    break
-        if count0 == len(clause):
-            logging.debug('is_unit: detected UNSAT: %s', clause)
-            reason = 'is_unit detected UNSAT on clause {}'.format(clause)
-            return Failure(reason)
+    def _failure(self):
+        """Failure for the last CONFLICT, with a reason in diagnostic mode."""
+        if not self.diagnostics:
+            return Failure()
+        reason = self.conflict.describe()
+        debug_log(reason)
+        return Failure(reason)
+
+    def assign(self, lit, reason=None):
+        """Make a (possibly negated) literal true and queue it for propagation.
+
+        The literal must be unassigned.
+        """
+        var = abs(lit)
+        self.asgs[var] = 1 if lit > 0 else 0
+        self.unasg_vars.remove(var)
+        self.asg_vars.add(var)
+        self.levels[var] = len(self.trail_lim)
+        self.reasons[var] = reason
+        self.trail.append(lit)
 
-        result = (count_unasg == 1, last_unit)
-        return Success(result)
+    @property
+    def decision_level(self):
+        return len(self.trail_lim)
+
+    def new_decision_level(self):
+        """Open a new decision level at the end of the trail."""
+        self.trail_lim.append(len(self.trail))
+
+    def try_set(self, lit, value):
+        """Assign a variable with a value unless it already has one.
+
+        Returns:
+            int: OK, or CONFLICT (recorded in `conflict`) if the variable has
+            the other value.
+        """
+        current_value = self.resolve(lit)
+        if current_value is None:
+            self.assign(lit if value else -lit)
+        elif current_value != value:
+            conflict = self.conflict
+            conflict.clause = None
+            conflict.lit = lit
+            conflict.value = value
+            conflict.current = current_value
+            return CONFLICT
+        return OK
 
     def set_lit(self, lit, value):
         """Assign a literal with a value."""
         assert lit > 0
-        current_value = self.asgs[lit]
-        if current_value == None:
-            logging.debug('new assignment %d = %d', lit, value)
-            self.asgs[lit] = value
-            self.unasg_vars.remove(lit)
-            self.asg_vars.add(lit)
-        else:
-            if current_value != value:
-                reason = ('Conflict! Tried {}={} but its already {}'
-                          .format(lit, value, current_value))
-                logging.error(reason)
-                return Failure(reason)
-        return Success()
+        if self.try_set(lit, value) == CONFLICT:
+            return self._failure()
+        return SUCCESS
 
     def unset_lit(self, lit):
         self.asgs[lit] = None
         self.unasg_vars.add(lit)
         self.asg_vars.remove(lit)
 
+    def undo(self, trail_len):
+        """Unassign everything after the first `trail_len` trail entries.
+
+        Watches stay valid when the trail is unwound, so this never touches
+        the watch lists.
+        """
+        trail = self.trail
+        for lit in trail[trail_len:]:
+            self.unset_lit(abs(lit))
+        del trail[trail_len:]
+        self.qhead = min(self.qhead, trail_len)
+
+    def backtrack(self, level):
+        """Unassign everything above decision level `level`."""
+        if level < len(self.trail_lim):
+            self.undo(self.trail_lim[level])
+            del self.trail_lim[level:]
+
+    def add_clause(self, clause, learnt=False):
+        """Add a clause implied by the formula and start watching it.
+
+        Callers adding a clause during search must order it so that its first
+        two literals are valid watches.
+
+        Returns:
+            int: index of the new clause.
+        """
+        self.clauses.append(clause)
+        clause_index = len(self.clauses) - 1
+        self.watch_clause(clause_index)
+        if learnt:
+            self.learnts.append(clause_index)
+        return clause_index
+
+    def is_locked(self, clause_index):
+        """Whether a clause is the reason for a current assignment."""
+        var = abs(self.clauses[clause_index][0])
+        return (self.asgs[var] is not None and
+                self.reasons[var] == clause_index)
+
+    def delete_clauses(self, clause_indices):
+        """Delete learned clauses, which must not be locked."""
+        deleted = set(clause_indices)
+        if not deleted:
+            return
+        watched = set()
+        binary = set()
+        for clause_index in deleted:
+            clause = self.clauses[clause_index]
+            if len(clause) < 2:
+                self.units.remove(clause_index)
+            elif len(clause) == 2:
+                binary.update(clause)
+            else:
+                watched.update(clause[:2])
+            self.clauses[clause_index] = None
+        for lit in watched:
+            self.watches[lit] = [c for c in self.watches[lit]
+                                 if c not in deleted]
+        for lit in binary:
+            self.binaries[lit] = [(other, c) for other, c in self.binaries[lit]
+                                  if c not in deleted]
+        self.learnts = [c for c in self.learnts if c not in deleted]
+
+    def assign_units(self):
+        """Assign all single-literal clauses.
+
+        Returns:
+            int | None: index of a clause that cannot be satisfied, or None.
+        """
+        for clause_index in self.units:
+            clause = self.clauses[clause_index]
+            if len(clause) == 0:
+                return clause_index
+            val = self.resolve(clause[0])
+            if val == 0:
+                return clause_index
+            elif val is None:
+                self.assign(clause[0], clause_index)
+        return None
+
+    def propagate(self):
+        """Propagate all queued assignments using the watched literals.
+
+        Binary clauses are followed first, straight from the implication
+        lists. Otherwise only clauses watching a newly falsified literal are
+        visited. Every implied literal is assigned, with its reason recorded
+        in `reasons`, and queued in turn.
+
+        Returns:
+            int | None: index of a conflicting clause, or None.
+        """
+        asgs = self.asgs
+        clauses = self.clauses
+        watches = self.watches
+        binaries = self.binaries
+        trail = self.trail
+
+        while self.qhead < len(trail):
+            false_lit = -trail[self.qhead]
+            self.qhead += 1
+
+            reason = None
+            for other, clause_index in binaries[false_lit]:
+                val = asgs[other] if other > 0 else asgs[-other]
+                if val is None:
+                    if reason is None:
+                        reason = ~encode(false_lit)
+                    self.assign(other, reason)
+                elif (val == 1) != (other > 0):
+                    self.qhead = len(trail)
+                    return clause_index
+
+            watchers = watches[false_lit]
+            n = len(watchers)
+            i = j = 0
+            while i < n:
+                clause_index = watchers[i]
+                i += 1
+                clause = clauses[clause_index]
+
+                # Keep the falsified watch in clause[1].
+                if clause[0] == false_lit:
+                    clause[0] = clause[1]
+                    clause[1] = false_lit
+                first = clause[0]
+                first_val = asgs[first] if first > 0 else asgs[-first]
+                if first_val is not None and (first_val == 1) == (first > 0):
+                    # Clause already satisfied by the other watch.
+                    watchers[j] = clause_index
+                    j += 1
+                    continue
+
+                # Look for a replacement watch that is not false.
+                for k in range(2, len(clause)):
+                    lit = clause[k]
+                    val = asgs[lit] if lit > 0 else asgs[-lit]
+                    if val is None or (val == 1) == (lit > 0):
+                        clause[1] = lit
+                        clause[k] = false_lit
+                        watches[lit].append(clause_index)
+                        break
+                else:
+                    # No replacement: the clause is unit or conflicting.
+                    watchers[j] = clause_index
+                    j += 1
+                    if first_val is not None:
+                        while i < n:
+                            watchers[j] = watchers[i]
+                            i += 1
+                            j += 1
+                        del watchers[j:]
+                        self.qhead = len(trail)
+                        return clause_index
+                    self.assign(first, clause_index)
+            del watchers[j:]
+        return None
+
     def set_lits(self, lits, value):
         """Set multiple literals at once. Useful for testing."""
         for lit in lits:
-            r = self.set_lit(lit, value)
-            if not r.success:
-                return r
-        return Success()
+            if self.try_set(lit, value) == CONFLICT:
+                return self._failure()
+        return SUCCESS
 
     def verify(self):
         if len(self.unasg_vars) != 0:
             raise Exception('cannot verify! unassigned vars: {}'
                             .format(self.unasg_vars))
 
-        # decisions is a list of Decisions
+        asgs = self.asgs
         for clause in self.clauses:
-            clause_sat = False
-            for i in clause:
-                v = self.resolve(i)
-                if v == 1:
-                    clause_sat = True
+            if clause is None:
+                continue
+            for lit in clause:
+                if asgs[abs(lit)] == (lit > 0):
                     break
-            if not clause_sat:
+            else:
                 return False
 
         # otherwise it's sat
         return True
 
     def save_solution(self):
-        self.solutions.append(dict(self.asgs))
+        self.add_solution(dict(self.asgs))
+
+    def add_solution(self, model):
+        """Store a model, over the original variables if preprocessed."""
+        if self.reconstruction is not None:
+            model = self.reconstruction(model)
+        self.solutions.append(model)
 
 
     def get_value(self, lit):
@@ -0,0 +1,96 @@
+"""Search statistics for Solver.
+
+A Solver only records statistics when it is given a SolverStats; without
+one its search loop does no counting or timing at all.
+"""
+import time
+
+
+class SolverStats(object):
+    """Counters and timings of a solver's search.
+
+    Counters accumulate over every call to Solver.solve. Time is measured
+    per phase: unit propagation ('bcp'), conflict analysis ('analysis') and
+    picking decisions ('decision').
+    """
+    def __init__(self, progress=None, interval=1000, clock=time.time):
+        """
+        Args:
+            progress (callable): called with this object every `interval`
+                conflicts.
+            interval (int):
+            clock (callable): returns the time in seconds.
+        """
+        self.progress = progress
+        self.interval = interval
+        self.clock = clock
+        self.start = clock()
+
+        self.decisions = 0
+        self.propagations = 0
+        self.conflicts = 0
+        self.restarts = 0
+        self.learned = 0
+        self.deleted = 0
+        self.peak_trail = 0
+        self.times = {'bcp': 0.0, 'analysis': 0.0, 'decision': 0.0}
+
+    @property
+    def elapsed(self):
+        return self.clock() - self.start
+
+    @property
+    def propagations_per_second(self):
+        elapsed = self.elapsed
+        return self.propagations / elapsed if elapsed > 0 else 0.0
+
+    def conflict(self):
+        self.conflicts += 1
+        if (self.progress is not None and
+                self.conflicts % self.interval == 0):
+            self.progress(self)
+
+    def timed(self, phase, func):
+        """Wrap func so the time spent in it counts towards `phase`."""
+        clock = self.clock
+        times = self.times
+
+        def timed_func(*args):
+            start = clock()
+            try:
+                return func(*args)
+            finally:
+                times[phase] += clock() - start
+        return timed_func
+
+    def counted_propagate(self, instance):
+        """Timed instance.propagate that also counts implied literals."""
+        propagate = instance.propagate
+        clock = self.clock
+        times = self.times
+
+        def timed_propagate():
+            before = len(instance.trail)
+            start = clock()
+            conflict = propagate()
+            times['bcp'] += clock() - start
+            after = len(instance.trail)
+            self.propagations += after - before
+            if after > self.peak_trail:
+                self.peak_trail = after
+            return conflict
+        return timed_propagate
+
+    def as_dict(self):
+        return {
+            'decisions': self.decisions,
+            'propagations': self.propagations,
+            'propagations_per_second': self.propagations_per_second,
+            'conflicts': self.conflicts,
+            'restarts': self.restarts,
+            'learned_clauses': self.learned,
+            'deleted_clauses': self.deleted,
+            'peak_trail': self.peak_trail,
+            'elapsed': self.elapsed,
+            'times': dict(self.times),
+        }
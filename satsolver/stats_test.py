@@ -0,0 +1,38 @@
+from satsolver.state import Instance
+from satsolver.solver import Solver
+from satsolver.stats import SolverStats
+from satsolver.restarts import Luby
+from satsolver.solver_test import pigeonhole
+
+
+def test_counts_search():
+    var_count, clauses = pigeonhole(4)
+    inst = Instance(var_count=var_count, clauses=clauses)
+    reports = []
+    stats = SolverStats(progress=reports.append, interval=5)
+    solver = Solver(inst, restarts=Luby(unit=1), stats=stats)
+    assert not solver.solve().success
+    assert stats.conflicts > 5
+    assert stats.decisions > 0
+    assert stats.propagations > 0
+    assert stats.restarts > 0
+    assert stats.learned == stats.conflicts
+    assert 0 < stats.peak_trail <= var_count
+    assert len(reports) == stats.conflicts // 5
+    assert reports[0] is stats
+
+
+def test_timed_phases():
+    ticks = iter(range(100))
+    stats = SolverStats(clock=lambda: next(ticks))
+    double = stats.timed('analysis', lambda x: 2 * x)
+    assert double(3) == 6
+    assert stats.times['analysis'] == 1
+    assert stats.as_dict()['times']['bcp'] == 0
+
+
+def test_no_stats_by_default():
+    inst = Instance(var_count=2, clauses=[[1, 2], [-1, 2]])
+    solver = Solver(inst)
+    assert solver.stats is None
+    assert solver.solve().success
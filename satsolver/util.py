@@ -23,3 +23,14 @@ class Success(Result):
 
     def __repr__(self):
         return '<Success>'
+
+
+class Unknown(Result):
+    """Neither SAT nor UNSAT: the solver stopped early, e.g. on a budget."""
+    def __init__(self, reason='', result=None):
+        self.result = result
+        self.reason = reason
+        self.success = False
+
+    def __repr__(self):
+        return '<Unknown reason="{}">'.format(self.reason[:20])
@@ -1,4 +1,4 @@
-from satsolver.util import Result, Failure, Success
+from satsolver.util import Result, Failure, Success, Unknown
 
 
 def test_result():
@@ -29,3 +29,10 @@ def test_failure_with_reason():
     fai = Failure('within reason')
     assert not fai.success
     assert fai.reason == 'within reason'
+
+
+def test_unknown():
+    unk = Unknown('out of budget')
+    assert not unk.success
+    assert unk.reason == 'out of budget'
+    assert not isinstance(unk, Failure)
@@ -0,0 +1,18 @@
+from setuptools import Extension, setup
+
+setup(
+    name='satsolver',
+    version='0.1.0',
+    description='A simple conflict-driven SAT solver',
+    url='https://github.com/kunalarya/simple-sat-solver',
+    license='Apache-2.0',
+    packages=['satsolver'],
+    # Optional: without a C compiler the pure-Python propagation is used.
+    ext_modules=[Extension('satsolver._kernel', ['satsolver/_kernel.c'],
+                           optional=True)],
+    python_requires='>=3.6',
+    extras_require={'numpy': ['numpy']},
+    entry_points={
+        'console_scripts': ['satsolver = satsolver.cli:main'],
+    },
+)